@@ -0,0 +1,182 @@
+# ==============================================================================
+# 📄 ARCHIVO: analytics.py
+# 🔍 ROL: Estadísticas de la clase por sala, mantenidas de forma incremental
+# ==============================================================================
+# Igual que el ranking, las estadísticas viven junto al estado en memoria de la
+# sala y se actualizan con cada jugada en O(1): se resta lo que el jugador
+# aportaba y se suma lo nuevo. Nunca se recorre la colección players para
+# responder una consulta.
+#
+# Secciones:
+#   summary         -> nº de alumnos, endeudados, sumas y promedios
+#   debt_histogram  -> alumnos por tramo de deuda tóxica
+#   laps_histogram  -> alumnos por vueltas completadas
+#   squares         -> por casilla: caídas, compras y pases (se guardan en GameSession)
+#
+# El dueño de la sala difunde cada STATS_PUSH_MS solo las secciones que
+# cambiaron (y de "squares" solo las casillas tocadas).
+
+import os
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+from board import CompiledBoard, DEFAULT_BOARD
+from messages import encode
+from money import fmt
+
+STATS_PUSH_MS = float(os.getenv("STATS_PUSH_MS", "1000"))
+
+# Límites inferiores (centavos) de los tramos de deuda; el tramo 0 es "sin deuda"
+DEBT_EDGES = (1, 100000, 500000, 1000000, 5000000)
+
+# Índices de los contadores por casilla (y su nombre en GameSession.square_stats)
+HITS, BUYS, PASSES = 0, 1, 2
+COUNTER_NAMES = ("hits", "buys", "passes")
+
+
+class SessionStats:
+    def __init__(self, squares: Optional[Dict[str, Dict[str, int]]] = None, tablero: CompiledBoard = DEFAULT_BOARD):
+        self.tablero = tablero   # Tipo y título de cada casilla
+        self.players = 0
+        self.in_debt = 0
+        self.totals = {"cash": 0, "toxic_debt": 0, "passive_income": 0, "net_worth": 0, "laps": 0}
+        self.debt_counts = [0] * (len(DEBT_EDGES) + 1)
+        self.laps = Counter()
+        self.squares: Dict[int, List[int]] = {int(k): [v.get(n, 0) for n in COUNTER_NAMES] for k, v in (squares or {}).items()}
+        self.version = 0
+        self._last: Dict[str, tuple] = {}          # player_id -> lo que aporta a las sumas
+        self._changed: Set[str] = set()            # Secciones cambiadas desde el último delta
+        self._squares_changed: Set[int] = set()
+        self._increments: Dict[int, List[int]] = {}  # Contadores aún no guardados en Mongo
+        self._json: Optional[str] = None
+
+    @classmethod
+    def from_players(cls, jugadores: Iterable, squares: Optional[Dict[str, Dict[str, int]]] = None,
+                     tablero: CompiledBoard = DEFAULT_BOARD) -> "SessionStats":
+        stats = cls(squares, tablero)
+        for jugador in jugadores:
+            stats.update(jugador)
+        return stats
+
+    # --- MANTENIMIENTO ---
+    def update(self, jugador):
+        f = jugador.financials
+        nuevo = (f.cash, f.toxic_debt, f.passive_income, f.net_worth, jugador.laps_completed)
+        pid = str(jugador.id)
+        viejo = self._last.get(pid)
+        if viejo == nuevo: return
+        self._last[pid] = nuevo
+
+        if viejo is None:
+            self.players += 1
+            viejo = (0, 0, 0, 0, None)
+        else:
+            self.debt_counts[bisect_right(DEBT_EDGES, viejo[1])] -= 1
+            self.in_debt -= viejo[1] > 0
+            self.laps[viejo[4]] -= 1
+            if not self.laps[viejo[4]]: del self.laps[viejo[4]]
+        self.debt_counts[bisect_right(DEBT_EDGES, nuevo[1])] += 1
+        self.in_debt += nuevo[1] > 0
+        self.laps[nuevo[4]] += 1
+
+        for campo, antes, ahora in zip(("cash", "toxic_debt", "passive_income", "net_worth"), viejo, nuevo):
+            self.totals[campo] += ahora - antes
+        self.totals["laps"] += nuevo[4] - (viejo[4] or 0)
+
+        self._changed.add("summary")
+        if viejo[1] != nuevo[1]: self._changed.add("debt_histogram")
+        if viejo[4] != nuevo[4]: self._changed.add("laps_histogram")
+        self._touch()
+
+    def record(self, casilla: int, contador: int):
+        """Suma 1 a un contador de la casilla (HITS / BUYS / PASSES)."""
+        self.squares.setdefault(casilla, [0, 0, 0])[contador] += 1
+        self._increments.setdefault(casilla, [0, 0, 0])[contador] += 1
+        self._squares_changed.add(casilla)
+        self._changed.add("squares")
+        self._touch()
+
+    def _touch(self):
+        self.version += 1
+        self._json = None
+
+    # --- PERSISTENCIA (solo los contadores por casilla; el resto sale de los jugadores) ---
+    def take_increments(self) -> Dict[str, int]:
+        """Incrementos pendientes como operación $inc sobre GameSession.square_stats."""
+        incs = {f"square_stats.{casilla}.{nombre}": n for casilla, valores in self._increments.items()
+                for nombre, n in zip(COUNTER_NAMES, valores) if n}
+        self._increments = {}
+        return incs
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self._changed)
+
+    @property
+    def has_increments(self) -> bool:
+        return bool(self._increments)
+
+    def restore_increments(self, incs: Dict[str, int]):
+        for clave, n in incs.items():
+            _, casilla, nombre = clave.split(".")
+            self._increments.setdefault(int(casilla), [0, 0, 0])[COUNTER_NAMES.index(nombre)] += n
+
+    # --- LECTURA ---
+    def _section(self, nombre: str):
+        if nombre == "summary":
+            n = self.players or 1
+            return {
+                "players": self.players,
+                "in_debt": self.in_debt,
+                "totals": {**{k: fmt(v) for k, v in self.totals.items() if k != "laps"}, "laps": self.totals["laps"]},
+                "averages": {"net_worth": fmt(int(self.totals["net_worth"] / n)), "passive_income": fmt(int(self.totals["passive_income"] / n)),
+                             "laps": round(self.totals["laps"] / n, 2)},
+            }
+        if nombre == "debt_histogram":
+            minimos = (0,) + DEBT_EDGES
+            return [{"min": fmt(lo), "count": c} for lo, c in zip(minimos, self.debt_counts)]
+        if nombre == "laps_histogram":
+            return {str(vueltas): c for vueltas, c in sorted(self.laps.items())}
+        raise KeyError(nombre)
+
+    def _square(self, casilla: int) -> dict:
+        evento = self.tablero.casillas[casilla] if casilla < len(self.tablero.casillas) else None
+        tipo = evento.tipo if evento else "NEUTRO"
+        hits, buys, passes = self.squares[casilla]
+        return {"tipo": tipo, "titulo": evento.titulo if tipo != "NEUTRO" else None, "hits": hits, "buys": buys, "passes": passes}
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            **{s: self._section(s) for s in ("summary", "debt_histogram", "laps_histogram")},
+            "squares": {str(c): self._square(c) for c in sorted(self.squares)},
+        }
+
+    def json(self) -> str:
+        """Estadísticas completas serializadas (se recalculan solo si algo cambió)."""
+        if self._json is None:
+            self._json = encode(self.to_dict())
+        return self._json
+
+    def delta(self) -> Optional[dict]:
+        """Secciones que cambiaron desde el último delta (None si nada)."""
+        if not self._changed: return None
+        cambios = {"version": self.version}
+        for seccion in self._changed:
+            if seccion == "squares":
+                cambios["squares"] = {str(c): self._square(c) for c in self._squares_changed}
+            else:
+                cambios[seccion] = self._section(seccion)
+        self._changed.clear()
+        self._squares_changed.clear()
+        return cambios
+
+
+def merge_delta(stats: dict, delta: dict):
+    """Aplica un delta de SessionStats.delta() sobre unas estadísticas completas (lado receptor)."""
+    for seccion, valor in delta.items():
+        if seccion == "squares":
+            stats.setdefault("squares", {}).update(valor)
+        else:
+            stats[seccion] = valor
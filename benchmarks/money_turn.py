@@ -0,0 +1,143 @@
+# ==============================================================================
+# 📄 ARCHIVO: benchmarks/money_turn.py
+# 🔍 ROL: Microbenchmark del dinero por turno: Decimal/Decimal128 vs centavos int
+# ==============================================================================
+# Compara, por operación, la versión anterior (Decimal en memoria, Decimal128 en
+# Mongo, str() para el payload) con la actual (money.py):
+#   - turno:    payday + interés + gasto LOBO_NEGRO + patrimonio + 5 montos a texto
+#   - lectura:  BSON -> FinancialState validado (lo que hace Beanie al cargar)
+#   - escritura: FinancialState -> BSON (lo que hace el volcado write-behind)
+# La versión anterior está congelada aquí abajo solo como referencia.
+# En "turno" la ganancia es modesta (~1.2-1.35x): ambas versiones pagan el
+# __setattr__ de pydantic al reponer el estado inicial, y fmt() sigue siendo
+# Python frente al str() en C de Decimal.
+#
+# Uso:
+#   python benchmarks/money_turn.py --number 100000
+
+import argparse
+import sys
+import timeit
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+from typing import Annotated
+
+import bson
+from bson import Decimal128
+from pydantic import BaseModel, BeforeValidator, Field
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from game_engine import ASSET_MULTIPLIER
+from models import FinancialState, Player
+from money import fmt, to_cents
+
+
+# --- REFERENCIA: modelo y reglas con Decimal (antes de money.py) ---
+def _convert_decimal(v):
+    if isinstance(v, Decimal128): return v.to_decimal()
+    return v
+
+_PyDecimal = Annotated[Decimal, BeforeValidator(_convert_decimal)]
+
+
+class _FinancialStateDecimal(BaseModel):
+    cash: _PyDecimal = Field(default=Decimal("0.00"), max_digits=20, decimal_places=2)
+    net_worth: _PyDecimal = Field(default=Decimal("0.00"), alias="netWorth")
+    toxic_debt: _PyDecimal = Field(default=Decimal("0.00"), alias="toxicDebt")
+    passive_income: _PyDecimal = Field(default=Decimal("0.00"), alias="passiveIncome")
+    model_config = {"populate_by_name": True}
+
+
+def _turno_decimal(f: _FinancialStateDecimal, salario: Decimal, costo: int, meta: Decimal):
+    f.cash += salario + f.passive_income
+    if f.toxic_debt > 0:
+        f.toxic_debt += (f.toxic_debt * Decimal("0.05")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    c = Decimal(costo)
+    if f.cash >= c:
+        f.cash -= c
+    else:
+        f.toxic_debt += c - f.cash
+        f.cash = Decimal(0)
+    f.net_worth = f.cash + f.passive_income * Decimal("10") - f.toxic_debt
+    return (str(f.cash), str(f.toxic_debt), str(f.net_worth), str(f.passive_income), str(meta), f.net_worth >= meta)
+
+
+# --- ACTUAL: centavos int con las reglas de models.py / game_engine.py ---
+class _Jugador:
+    calculate_net_worth = Player.calculate_net_worth
+    apply_payday_logic = Player.apply_payday_logic
+
+    def __init__(self, financials: FinancialState):
+        self.financials = financials
+
+
+def _turno_centavos(j: _Jugador, salario: int, costo: int, meta: int):
+    # Mismos pasos que la referencia: payday, gasto y UN cálculo de patrimonio
+    j.apply_payday_logic(salary_amount=salario)
+    f = j.financials
+    f.charge(to_cents(costo))
+    j.calculate_net_worth(assets_value=f.passive_income * ASSET_MULTIPLIER)
+    return (fmt(f.cash), fmt(f.toxic_debt), fmt(f.net_worth), fmt(f.passive_income), fmt(meta), f.net_worth >= meta)
+
+
+def medir(fn, number: int) -> float:
+    """ns por llamada (mejor de 5 repeticiones)."""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e9
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Costo por turno: Decimal vs centavos int")
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    doc_decimal = {"cash": Decimal128("1234.50"), "netWorth": Decimal128("-2675.00"),
+                   "toxicDebt": Decimal128("3675.00"), "passiveIncome": Decimal128("350.00")}
+    doc_centavos = {"cash": 123450, "netWorth": -267500, "toxicDebt": 367500, "passiveIncome": 35000}
+    bson_decimal, bson_centavos = bson.encode(doc_decimal), bson.encode(doc_centavos)
+
+    f_dec = _FinancialStateDecimal.model_validate(doc_decimal)
+    jugador = _Jugador(FinancialState.model_validate(doc_centavos))
+    salario_dec, meta_dec = Decimal("2500.00"), Decimal("1000000.00")
+
+    # Mismo resultado en ambas versiones (incluido el redondeo del interés)
+    ref = _turno_decimal(_FinancialStateDecimal.model_validate(doc_decimal), salario_dec, 800, meta_dec)
+    act = _turno_centavos(_Jugador(FinancialState.model_validate(doc_centavos)), 250000, 800, 100000000)
+    assert ref == act, (ref, act)
+
+    def _a_bson_decimal(f):
+        return bson.encode({"cash": Decimal128(f.cash), "netWorth": Decimal128(f.net_worth),
+                            "toxicDebt": Decimal128(f.toxic_debt), "passiveIncome": Decimal128(f.passive_income)})
+
+    def _a_bson_centavos(f):
+        return bson.encode({"cash": f.cash, "netWorth": f.net_worth, "toxicDebt": f.toxic_debt, "passiveIncome": f.passive_income})
+
+    # Cada turno parte del mismo estado para que la deuda no crezca sin límite
+    inicio_dec = (f_dec.cash, f_dec.toxic_debt)
+    inicio_cent = (jugador.financials.cash, jugador.financials.toxic_debt)
+
+    def turno_decimal():
+        f_dec.cash, f_dec.toxic_debt = inicio_dec
+        return _turno_decimal(f_dec, salario_dec, 800, meta_dec)
+
+    def turno_centavos():
+        jugador.financials.cash, jugador.financials.toxic_debt = inicio_cent
+        return _turno_centavos(jugador, 250000, 800, 100000000)
+
+    filas = [
+        ("turno", turno_decimal, turno_centavos),
+        ("lectura", lambda: _FinancialStateDecimal.model_validate(bson.decode(bson_decimal)),
+                    lambda: FinancialState.model_validate(bson.decode(bson_centavos))),
+        ("escritura", lambda: _a_bson_decimal(f_dec), lambda: _a_bson_centavos(jugador.financials)),
+        ("doc viejo", lambda: _FinancialStateDecimal.model_validate(bson.decode(bson_decimal)),
+                      lambda: FinancialState.model_validate(bson.decode(bson_decimal))),
+    ]
+    print(f"{'operación':<10} {'Decimal (ns)':>13} {'centavos (ns)':>14} {'mejora':>7}")
+    for nombre, antes, ahora in filas:
+        t_antes, t_ahora = medir(antes, args.number), medir(ahora, args.number)
+        print(f"{nombre:<10} {t_antes:>13.0f} {t_ahora:>14.0f} {t_antes / t_ahora:>6.2f}x")
+    print(f"BSON por documento financiero: {len(bson_decimal)} B (Decimal128) vs {len(bson_centavos)} B (Int)")
+
+
+if __name__ == "__main__":
+    main()
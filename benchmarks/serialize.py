@@ -0,0 +1,120 @@
+# ==============================================================================
+# 📄 ARCHIVO: benchmarks/serialize.py
+# 🔍 ROL: Microbenchmark de la codificación de frames salientes: json.dumps vs messages.py
+# ==============================================================================
+# Compara, por frame, el camino anterior (json.dumps del dict completo, con
+# event_data y event_queue como dicts) con el actual (messages.encode: orjson y
+# sub-payloads de la casilla ya codificados):
+#   - UPDATE_PLAYER / VICTORY / DECISION_NEEDED / CHAT / SESSION_RESET: el frame
+#     que journal.append codifica una vez por evento (lo comparten todos)
+#   - fila ranking: las dos versiones (is_me false/true) que se recodifican
+#     cuando cambia un jugador (Leaderboard.update)
+#   - LEADERBOARD: frame completo de 30 filas armado con filas ya codificadas
+# Antes de medir se comprueba que ambos caminos producen el mismo JSON (ya
+# parseado) y que cada frame nuevo cumple su esquema (messages.validate_frame).
+#
+# Uso:
+#   python benchmarks/serialize.py --number 100000
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from board import BUILTIN_BOARDS, DEFAULT_BOARD_ID
+from dice import DiceStream
+from game_engine import mensaje_chat, resolver_buy, resolver_roll
+from leaderboard import Leaderboard, render_frame
+from messages import Fragment, encode, loads, orjson, validate_frame
+from replay import _Jugador
+
+SALARIO, META = 250000, 100000000
+
+
+# --- REFERENCIA: codificación anterior a messages.py ---
+def _frame_viejo(msg: dict) -> str:
+    return json.dumps(msg)
+
+
+def _filas_viejas(data: dict):
+    return json.dumps({**data, "is_me": False}), json.dumps({**data, "is_me": True})
+
+
+def _ranking_viejo(snapshot, player_id) -> str:
+    filas = [fila_me if pid == player_id else fila for pid, fila, fila_me in snapshot]
+    return '{"type": "LEADERBOARD", "payload": [' + ", ".join(filas) + "]}"
+
+
+def _muestras(board_id: str) -> dict:
+    """Un mensaje real de cada tipo, generado con el motor (primer caso que aparezca)."""
+    tablero = BUILTIN_BOARDS[board_id]
+    dados = DiceStream(7)
+    jugador = _Jugador("6ad2df3b56fbc7747ea8df24", "Alumna Número 1")
+    muestras = {}
+    while len(muestras) < 3:
+        mensajes = resolver_roll(jugador, dados.roll(), SALARIO, META, tablero)
+        for msg in mensajes:
+            if msg["type"] == "UPDATE_PLAYER" and msg["payload"]["event_queue"]:
+                muestras.setdefault("UPDATE_PLAYER", msg)
+            elif msg["type"] == "DECISION_NEEDED":
+                muestras.setdefault("DECISION_NEEDED", msg)
+                muestras.setdefault("UPDATE_PLAYER compra", resolver_buy(jugador, META, tablero)[0])
+    jugador.financials.cash = META
+    muestras["VICTORY"] = resolver_buy(jugador, 1, tablero)[0]
+    muestras["CHAT"] = mensaje_chat(jugador, "¿alguien más cayó en la boda? 😅")
+    muestras["SESSION_RESET"] = {"type": "SESSION_RESET", "payload": {"dice_cursor": 123}, "message": "🔄 El profesor reinició la partida"}
+    for msg in muestras.values():
+        msg["seq"] = 1234
+    return muestras
+
+
+def medir(fn, number: int) -> float:
+    """ns por llamada (mejor de 5 repeticiones)."""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e9
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Costo de codificar cada frame saliente: json.dumps vs messages.py")
+    parser.add_argument("--number", type=int, default=100000)
+    parser.add_argument("--board", choices=sorted(BUILTIN_BOARDS), default=DEFAULT_BOARD_ID)
+    args = parser.parse_args(argv)
+
+    print(f"codificador: {'orjson ' + orjson.__version__ if orjson else 'pydantic_core'}"
+          f"{'' if Fragment else ' (sin Fragment: los sub-payloads se recodifican)'}")
+    filas = []
+    for tipo, msg in _muestras(args.board).items():
+        viejo = loads(encode(msg))   # Mismo mensaje con dicts planos, como lo armaba el motor antes
+        nuevo = encode(msg)
+        assert json.loads(_frame_viejo(viejo)) == loads(nuevo), tipo
+        validate_frame(nuevo)
+        filas.append((tipo, lambda v=viejo: _frame_viejo(v), lambda m=msg: encode(m), len(_frame_viejo(viejo).encode()), len(nuevo.encode())))
+
+    # Ranking de 30 alumnos (el destinatario es el décimo)
+    ranking = Leaderboard()
+    for i in range(30):
+        jugador = _Jugador(f"6ad2df3b56fbc7747ea8{i:04x}", f"Alumno {i}")
+        jugador.financials.cash = (i * 7919) % 500000
+        jugador.calculate_net_worth(assets_value=0)
+        ranking.update(jugador)
+    data = ranking.rows()[0]
+    snapshot, yo = ranking.snapshot(), ranking.top_ids()[9]
+    snapshot_viejo = [(pid, *_filas_viejas(d)) for pid, d in zip(ranking.top_ids(), ranking.rows())]
+    assert json.loads(_ranking_viejo(snapshot_viejo, yo)) == loads(render_frame(snapshot, yo))
+    validate_frame(render_frame(snapshot, yo))
+    filas.append(("fila ranking", lambda: _filas_viejas(data),
+                  lambda: (encode({**data, "is_me": False}), encode({**data, "is_me": True})),
+                  sum(len(f.encode()) for f in _filas_viejas(data)), sum(len(f.encode()) for f in ranking.snapshot()[0][1:])))
+    filas.append(("LEADERBOARD 30", lambda: _ranking_viejo(snapshot_viejo, yo), lambda: render_frame(snapshot, yo),
+                  len(_ranking_viejo(snapshot_viejo, yo).encode()), len(render_frame(snapshot, yo).encode())))
+
+    print(f"{'frame':<21} {'json (ns)':>10} {'actual (ns)':>12} {'mejora':>7} {'bytes antes':>12} {'ahora':>6}")
+    for nombre, antes, ahora, bytes_antes, bytes_ahora in filas:
+        t_antes, t_ahora = medir(antes, args.number), medir(ahora, args.number)
+        print(f"{nombre:<21} {t_antes:>10.0f} {t_ahora:>12.0f} {t_antes / t_ahora:>6.2f}x {bytes_antes:>12} {bytes_ahora:>6}")
+
+
+if __name__ == "__main__":
+    main()
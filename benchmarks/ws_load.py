@@ -0,0 +1,346 @@
+# ==============================================================================
+# 📄 ARCHIVO: benchmarks/ws_load.py
+# 🔍 ROL: Prueba de carga del backend (HTTP + WebSocket) con Mongo simulado
+# ==============================================================================
+# Levanta la app FastAPI en este mismo proceso (uvicorn en 127.0.0.1, puerto
+# libre) contra mongomock-motor, crea N salas con M jugadores por /sessions y
+# /players y los conecta a /ws/{player_id}. Cada cliente juega en bucle
+# ROLL -> (BUY | PASS si hay decisión) con algo de CHAT y se mide:
+#   - latencia por tipo de mensaje (envío -> primer frame de respuesta propio)
+#   - fan-out (envío -> el último jugador de la sala recibió el mismo "seq")
+#   - throughput (acciones/s y frames recibidos/s)
+#   - llamadas a Mongo por acción (incluye los volcados write-behind)
+#
+# Uso:
+#   python benchmarks/ws_load.py --sessions 10 --players 20 --actions 30
+#   python benchmarks/ws_load.py --save default          # guarda baselines/default.json
+#   python benchmarks/ws_load.py --baseline default      # compara y sale con 1 si hay regresión
+#
+# Requiere las dependencias de requirements-bench.txt (mongomock-motor, httpx,
+# uvicorn, websockets): solo para el benchmark, no para producción.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+RAIZ = Path(__file__).resolve().parent.parent
+BASELINES = Path(__file__).resolve().parent / "baselines"
+sys.path.insert(0, str(RAIZ))
+
+# Un solo proceso: el bus local basta (se puede forzar otro con BROADCAST_BUS)
+os.environ.setdefault("BROADCAST_BUS", "local")
+
+# Operaciones de colección que cuentan como "llamada a la BD"
+OPERACIONES_DB = (
+    "find", "find_one", "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "bulk_write", "aggregate", "count_documents", "find_one_and_update",
+)
+llamadas_db: Counter = Counter()
+tiempo_db: Counter = Counter()   # segundos dentro de mongomock por operación (bloquea el loop)
+
+
+# --- MONGO SIMULADO ---
+def instalar_mongo_simulado():
+    """Sustituye init_db por mongomock-motor y cuenta las operaciones por colección."""
+    import mongomock.collection as mc
+    from beanie import init_beanie
+    from mongomock_motor import AsyncMongoMockClient
+    import database
+    import main
+
+    # pymongo 4.x pasa argumentos que mongomock todavía no conoce
+    bulk_write_original = mc.Collection.bulk_write
+    def bulk_write(self, requests, ordered=True, bypass_document_validation=False, session=None, comment=None, **kwargs):
+        return bulk_write_original(self, requests, ordered=ordered, bypass_document_validation=bypass_document_validation, session=session)
+    mc.Collection.bulk_write = bulk_write
+    add_update_original = mc.BulkOperationBuilder.add_update
+    def add_update(self, *args, sort=None, **kwargs):
+        return add_update_original(self, *args, **kwargs)
+    mc.BulkOperationBuilder.add_update = add_update
+
+    def contar(nombre):
+        original = getattr(mc.Collection, nombre)
+        def envoltura(self, *args, **kwargs):
+            llamadas_db[nombre] += 1
+            t0 = time.perf_counter()
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                tiempo_db[nombre] += time.perf_counter() - t0
+        return envoltura
+    for nombre in OPERACIONES_DB:
+        setattr(mc.Collection, nombre, contar(nombre))
+
+    async def init_db_simulado():
+        client = AsyncMongoMockClient()
+        # Sin índices: mongomock valida los únicos recorriendo toda la colección en cada
+        # insert (y en el mismo loop), así se mediría al simulador y no a la app
+        await init_beanie(database=client["lobos_bench"], document_models=database.DOCUMENT_MODELS, skip_indexes=True)
+
+    database.init_db = init_db_simulado
+    main.init_db = init_db_simulado
+    return main.app
+
+
+# --- MÉTRICAS ---
+def percentil(valores: List[float], q: float) -> Optional[float]:
+    if not valores: return None
+    orden = sorted(valores)
+    return round(orden[min(len(orden) - 1, int(q / 100 * len(orden)))], 2)
+
+
+def distribucion(valores: List[float]) -> dict:
+    return {"n": len(valores), "p50": percentil(valores, 50), "p95": percentil(valores, 95), "p99": percentil(valores, 99)}
+
+
+class Sala:
+    def __init__(self, code: str):
+        self.code = code
+        self.clientes: List["ClienteBench"] = []
+        self.llegadas: Dict[int, list] = {}   # seq -> [última llegada, nº de receptores]
+
+
+class ClienteBench:
+    def __init__(self, sala: Sala, player_id: str, nickname: str):
+        self.sala = sala
+        self.player_id = player_id
+        self.nickname = nickname
+        self.ws = None
+        self.frames = 0
+        self.decision_pendiente = False
+        self._espera: Optional[asyncio.Future] = None
+        self._comando = ""
+
+    def _es_respuesta(self, frame: dict) -> bool:
+        tipo = frame.get("type")
+        if self._comando == "CHAT":
+            return tipo == "CHAT" and frame.get("message", "").startswith(f"💬 {self.nickname}:")
+        payload = frame.get("payload")
+        if not isinstance(payload, dict) or payload.get("player_id") != self.player_id: return False
+        return tipo in ("UPDATE_PLAYER", "VICTORY", "DECISION_NEEDED") if self._comando == "ROLL" else tipo in ("UPDATE_PLAYER", "VICTORY")
+
+    async def leer(self):
+        async for raw in self.ws:
+            ahora = time.perf_counter()
+            msg = json.loads(raw)
+            frames = msg["frames"] if msg.get("type") == "BATCH" else [msg]
+            respuesta = None
+            for frame in frames:
+                self.frames += 1
+                seq = frame.get("seq")
+                if seq is not None:
+                    llegada = self.sala.llegadas.setdefault(seq, [ahora, 0])
+                    llegada[0] = max(llegada[0], ahora); llegada[1] += 1
+                if frame.get("type") == "DECISION_NEEDED" and frame["payload"].get("player_id") == self.player_id:
+                    self.decision_pendiente = True
+                if respuesta is None and self._espera and self._es_respuesta(frame):
+                    respuesta = frame
+            if respuesta is not None and not self._espera.done():
+                self._espera.set_result((respuesta.get("seq"), ahora))
+
+    async def pedir(self, comando: str, texto: str, timeout: float):
+        self._comando = comando
+        self._espera = asyncio.get_running_loop().create_future()
+        t0 = time.perf_counter()
+        await self.ws.send(texto)
+        seq, t1 = await asyncio.wait_for(self._espera, timeout)
+        self._espera = None
+        return t0, t1, seq
+
+
+async def jugar(cliente: ClienteBench, acciones: int, chat_ratio: float, pensar_ms: float, timeout: float, registro: list):
+    rng = random.Random(cliente.player_id)
+    for i in range(acciones):
+        if cliente.decision_pendiente:
+            comando = texto = rng.choice(("BUY", "PASS"))
+            cliente.decision_pendiente = False
+        elif rng.random() < chat_ratio:
+            comando, texto = "CHAT", f"hola {i}"
+        else:
+            comando = texto = "ROLL"
+        try:
+            t0, t1, seq = await cliente.pedir(comando, texto, timeout)
+        except asyncio.TimeoutError:
+            registro.append((comando, cliente.sala, None, None, None))
+            continue
+        registro.append((comando, cliente.sala, t0, t1, seq))
+        if pensar_ms: await asyncio.sleep(rng.uniform(0, 2 * pensar_ms) / 1000)
+
+
+# --- EJECUCIÓN ---
+async def ejecutar(args) -> dict:
+    import httpx
+    import uvicorn
+    import websockets
+
+    app = instalar_mongo_simulado()
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="on"))
+    tarea_servidor = asyncio.create_task(servidor.serve())
+    while not servidor.started:
+        await asyncio.sleep(0.01)
+    puerto = servidor.servers[0].sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{puerto}"
+
+    salas: List[Sala] = []
+    setup = defaultdict(list)
+    async with httpx.AsyncClient(base_url=base, timeout=args.timeout) as http:
+        async def post(ruta, cuerpo):
+            t0 = time.perf_counter()
+            r = await http.post(ruta, json=cuerpo)
+            setup[ruta].append((time.perf_counter() - t0) * 1000)
+            r.raise_for_status()
+            return r.json()
+
+        async def crear_sala(i):
+            sala = Sala(f"BENCH{i:04d}")
+            await post("/sessions", {"code": sala.code})
+            for j in range(args.players):
+                nick = f"Lobo{j:03d}"
+                jugador = await post("/players", {"nickname": nick, "game_code": sala.code})
+                sala.clientes.append(ClienteBench(sala, jugador["_id"], nick))
+            salas.append(sala)
+
+        await asyncio.gather(*(crear_sala(i) for i in range(args.sessions)))
+
+    clientes = [c for s in salas for c in s.clientes]
+    consulta = "?leaderboard=delta" if args.leaderboard == "delta" else ""
+    t0 = time.perf_counter()
+    for c in clientes:
+        c.ws = await websockets.connect(f"ws://127.0.0.1:{puerto}/ws/{c.player_id}{consulta}", max_queue=None)
+    conexion_ms = (time.perf_counter() - t0) * 1000
+    lectores = [asyncio.create_task(c.leer()) for c in clientes]
+    await asyncio.sleep(0.2)  # JOIN + ranking inicial fuera de la medición
+
+    llamadas_db.clear(); tiempo_db.clear()
+    registro: list = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(jugar(c, args.actions, args.chat_ratio, args.think_ms, args.timeout, registro) for c in clientes))
+    duracion = time.perf_counter() - inicio
+    frames = sum(c.frames for c in clientes)
+    await asyncio.sleep(0.1)  # últimos fan-outs en vuelo
+
+    # Al cerrar se vuelca lo pendiente del write-behind: también es costo de las acciones
+    for c in clientes:
+        await c.ws.close()
+    for tarea in lectores:
+        tarea.cancel()
+    servidor.should_exit = True
+    await tarea_servidor
+    db_total = sum(llamadas_db.values())
+    db_por_operacion = {op: {"llamadas": n, "ms": round(tiempo_db[op] * 1000, 1)} for op, n in llamadas_db.items()}
+    from connection_manager import manager
+
+    latencias = defaultdict(list)
+    fanout = []
+    completas = [r for r in registro if r[2] is not None]
+    for comando, sala, t_envio, t_resp, seq in completas:
+        latencias[comando].append((t_resp - t_envio) * 1000)
+        llegada = sala.llegadas.get(seq)
+        if llegada and llegada[1] >= len(sala.clientes):
+            fanout.append((llegada[0] - t_envio) * 1000)
+
+    return {
+        "config": {k: getattr(args, k) for k in ("sessions", "players", "actions", "chat_ratio", "think_ms", "leaderboard")},
+        "entorno": {"python": platform.python_version(), "maquina": platform.machine(),
+                    "tick_ms": os.getenv("ACTOR_TICK_MS", "50"), "bus": os.environ["BROADCAST_BUS"]},
+        "setup_ms": {"conexion_total": round(conexion_ms, 1), **{ruta: distribucion(v) for ruta, v in setup.items()}},
+        "latencia_ms": {tipo: distribucion(v) for tipo, v in sorted(latencias.items())},
+        "fanout_ms": distribucion(fanout),
+        "timeouts": len(registro) - len(completas),
+        "frames_descartados": manager.dropped_total,
+        "clientes_expulsados": manager.evicted_total,
+        "acciones_por_segundo": round(len(completas) / duracion, 1),
+        "frames_por_segundo": round(frames / duracion, 1),
+        "db_por_accion": round(db_total / max(len(completas), 1), 3),
+        "db_por_operacion": db_por_operacion,
+        "duracion_s": round(duracion, 2),
+    }
+
+
+# --- BASELINES ---
+# (métrica, mayor es mejor)
+METRICAS_COMPARADAS = [
+    (("latencia_ms", "ROLL", "p95"), False), (("latencia_ms", "BUY", "p95"), False),
+    (("latencia_ms", "PASS", "p95"), False), (("latencia_ms", "CHAT", "p95"), False),
+    (("fanout_ms", "p95"), False), (("acciones_por_segundo",), True), (("db_por_accion",), False),
+]
+
+
+def _valor(resultado: dict, ruta: tuple):
+    for clave in ruta:
+        if not isinstance(resultado, dict) or clave not in resultado: return None
+        resultado = resultado[clave]
+    return resultado
+
+
+def comparar(actual: dict, base: dict, tolerancia: float) -> List[str]:
+    """Imprime la comparación y devuelve las métricas que empeoraron más que la tolerancia."""
+    regresiones = []
+    for ruta, mayor_es_mejor in METRICAS_COMPARADAS:
+        nuevo, viejo = _valor(actual, ruta), _valor(base, ruta)
+        if nuevo is None or not viejo: continue
+        cambio = (nuevo - viejo) / viejo
+        peor = -cambio if mayor_es_mejor else cambio
+        marca = "❌" if peor > tolerancia else "✅"
+        nombre = ".".join(ruta)
+        print(f"  {marca} {nombre:<22} {viejo:>10} -> {nuevo:>10} ({cambio:+.1%})")
+        if peor > tolerancia: regresiones.append(nombre)
+    return regresiones
+
+
+def imprimir(res: dict):
+    c = res["config"]
+    print(f"🐺 {c['sessions']} salas x {c['players']} jugadores x {c['actions']} acciones ({res['duracion_s']} s)")
+    for tipo, d in res["latencia_ms"].items():
+        print(f"  {tipo:<5} n={d['n']:<6} p50 {d['p50']} ms  p95 {d['p95']} ms  p99 {d['p99']} ms")
+    f = res["fanout_ms"]
+    print(f"  fan-out p50 {f['p50']} ms  p95 {f['p95']} ms  p99 {f['p99']} ms")
+    print(f"  {res['acciones_por_segundo']} acciones/s | {res['frames_por_segundo']} frames/s | "
+          f"{res['db_por_accion']} llamadas BD/acción")
+    print(f"  BD: " + ", ".join(f"{op} {d['llamadas']}x {d['ms']} ms" for op, d in res["db_por_operacion"].items()))
+    print(f"  timeouts {res['timeouts']} | frames descartados {res['frames_descartados']} | expulsados {res['clientes_expulsados']}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga WebSocket de La Senda de los Lobos")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--actions", type=int, default=30, help="Acciones por jugador")
+    parser.add_argument("--chat-ratio", type=float, default=0.1)
+    parser.add_argument("--think-ms", type=float, default=0, help="Pausa media entre acciones de un jugador")
+    parser.add_argument("--leaderboard", choices=("full", "delta"), default="full")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--save", metavar="NOMBRE", help="Guarda el resultado en baselines/NOMBRE.json")
+    parser.add_argument("--baseline", metavar="NOMBRE", help="Compara contra baselines/NOMBRE.json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento máximo permitido (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    resultado = asyncio.run(ejecutar(args))
+    imprimir(resultado)
+
+    if args.save:
+        BASELINES.mkdir(exist_ok=True)
+        destino = BASELINES / f"{args.save}.json"
+        destino.write_text(json.dumps(resultado, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"💾 Baseline guardado en {destino}")
+
+    if args.baseline:
+        base = json.loads((BASELINES / f"{args.baseline}.json").read_text(encoding="utf-8"))
+        if base.get("config") != resultado["config"]:
+            print("⚠️ La configuración difiere del baseline; la comparación es orientativa")
+        regresiones = comparar(resultado, base, args.tolerance)
+        if regresiones:
+            print(f"❌ Regresión en: {', '.join(regresiones)}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
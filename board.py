@@ -1,13 +1,45 @@
 # ==============================================================================
 # 📄 ARCHIVO: board.py
-# 🔍 ROL: Configuración del Tablero y Eventos
+# 🔍 ROL: Tableros como datos: definiciones, compilación y caché por board_id
 # ==============================================================================
-import random
+# Cada sala juega en un tablero (GameSession.board_id). Hay tableros de fábrica
+# por nivel (BUILTIN_DEFINITIONS) y el profesor puede subir los suyos
+# (POST /boards o "board" en POST /sessions); se guardan en la colección
+# "boards" y nunca cambian: un board_id identifica siempre el mismo contenido.
+#
+# Una definición validada (schemas.BoardCreate) se compila UNA vez en un
+# CompiledBoard: una tupla indexada por casilla con el evento ya armado (montos
+# en centavos, event_data y entradas de event_queue ya codificadas). En el
+# turno, buscar el evento es `tablero.casillas[pos]`: O(1) y sin crear objetos.
+# Las casillas vacías reciben un mensaje neutro fijo (antes era uno al azar
+# en cada consulta).
+#
+# Los tableros compilados se comparten entre salas y viven en un LRU de
+# BOARD_CACHE_SIZE entradas (los de fábrica no se expulsan nunca).
 
-# Tamaño del tablero circular
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from messages import cached, dumps
+from models import BoardDefinition, BoardLayout, BoardSquare, GameSession, NeutralMessage
+from money import fmt, to_cents
+from schemas import BoardCreate
+
+BOARD_CACHE_SIZE = int(os.getenv("BOARD_CACHE_SIZE", "64"))
+
+DEFAULT_BOARD_ID = "clasico"
+
+logger = logging.getLogger(__name__)
+
+# Tamaño del tablero clásico
 CASILLAS_TOTALES = 30
 
-# Mapa de Eventos: Clave = Número de Casilla
+# Mapa de Eventos del tablero clásico: Clave = Número de Casilla (montos en dólares)
 BOARD_MAP = {
     # 🔴 TRAMPAS (Gastos/Deuda)
     3:  {"tipo": "LOBO_NEGRO", "titulo": "iPhone 15 Pro", "costo": 1200, "descripcion": "Compra impulsiva a crédito."},
@@ -34,10 +66,180 @@ MENSAJES_NEUTROS = [
     {"titulo": "Ahorro", "descripcion": "Evitaste comprar café caro."},
 ]
 
-def obtener_evento(posicion):
-    """Retorna el evento de la casilla o uno neutro aleatorio."""
-    evento = BOARD_MAP.get(posicion)
-    if evento: return evento
-    
-    m = random.choice(MENSAJES_NEUTROS)
-    return {"tipo": "NEUTRO", "titulo": m["titulo"], "descripcion": m["descripcion"], "costo": 0}
\ No newline at end of file
+# Tableros de fábrica por nivel (mismo formato que POST /boards)
+BUILTIN_DEFINITIONS = {
+    "clasico": {
+        "nombre": "La Senda Clásica", "nivel": "secundaria", "casillas_totales": CASILLAS_TOTALES,
+        "eventos": [{"casilla": c, **evt} for c, evt in BOARD_MAP.items()],
+    },
+    "basico": {
+        "nombre": "Mi Primera Alcancía", "nivel": "primaria", "casillas_totales": 20,
+        "eventos": [
+            {"casilla": 3, "tipo": "LOBO_NEGRO", "titulo": "Videojuego", "costo": 60, "descripcion": "Compraste un juego sin pensarlo."},
+            {"casilla": 8, "tipo": "LOBO_NEGRO", "titulo": "Zapatillas", "costo": 120, "descripcion": "Solo porque eran de marca."},
+            {"casilla": 13, "tipo": "LOBO_NEGRO", "titulo": "Pantalla Rota", "costo": 200, "descripcion": "El celular se cayó sin funda."},
+            {"casilla": 17, "tipo": "LOBO_NEGRO", "titulo": "Golosinas", "costo": 80, "descripcion": "Dulces todos los días."},
+            {"casilla": 5, "tipo": "LOBO_BLANCO", "titulo": "Limonada", "costo": 50, "flujo_extra": 15, "descripcion": "Puesto de limonada en el parque."},
+            {"casilla": 10, "tipo": "LOBO_BLANCO", "titulo": "Lavado de Autos", "costo": 150, "flujo_extra": 40, "descripcion": "Los sábados con tus amigos."},
+            {"casilla": 15, "tipo": "LOBO_BLANCO", "titulo": "Tutorías", "costo": 100, "flujo_extra": 30, "descripcion": "Ayudas a otros con matemáticas."},
+            {"casilla": 19, "tipo": "LOBO_BLANCO", "titulo": "Huerto", "costo": 250, "flujo_extra": 70, "descripcion": "Vendes verduras a los vecinos."},
+        ],
+    },
+    "avanzado": {
+        "nombre": "Mercados y Deuda", "nivel": "universidad", "casillas_totales": 40,
+        "eventos": [
+            {"casilla": 3, "tipo": "LOBO_NEGRO", "titulo": "Auto Financiado", "costo": 4000, "descripcion": "Enganche y primera cuota."},
+            {"casilla": 8, "tipo": "LOBO_NEGRO", "titulo": "Viaje a Crédito", "costo": 2500, "descripcion": "Vacaciones a 12 meses."},
+            {"casilla": 13, "tipo": "LOBO_NEGRO", "titulo": "Préstamo Rápido", "costo": 1800, "descripcion": "Comisiones e intereses abusivos."},
+            {"casilla": 19, "tipo": "LOBO_NEGRO", "titulo": "Opciones 0DTE", "costo": 5000, "descripcion": "Apalancamiento sin cobertura."},
+            {"casilla": 24, "tipo": "LOBO_NEGRO", "titulo": "Hospital", "costo": 3500, "descripcion": "Sin seguro de gastos médicos."},
+            {"casilla": 31, "tipo": "LOBO_NEGRO", "titulo": "Mudanza", "costo": 1200, "descripcion": "Depósito y muebles nuevos."},
+            {"casilla": 37, "tipo": "LOBO_NEGRO", "titulo": "Multa Fiscal", "costo": 2200, "descripcion": "Declaraste tarde."},
+            {"casilla": 5, "tipo": "LOBO_BLANCO", "titulo": "Fondo Indexado", "costo": 2000, "flujo_extra": 300, "descripcion": "Aportación a un ETF diversificado."},
+            {"casilla": 10, "tipo": "LOBO_BLANCO", "titulo": "Bonos", "costo": 3000, "flujo_extra": 350, "descripcion": "Deuda gubernamental a plazo."},
+            {"casilla": 15, "tipo": "LOBO_BLANCO", "titulo": "Departamento", "costo": 12000, "flujo_extra": 1800, "descripcion": "Renta residencial."},
+            {"casilla": 21, "tipo": "LOBO_BLANCO", "titulo": "Franquicia", "costo": 8000, "flujo_extra": 1300, "descripcion": "Cafetería con marca conocida."},
+            {"casilla": 27, "tipo": "LOBO_BLANCO", "titulo": "Curso Online", "costo": 1500, "flujo_extra": 250, "descripcion": "Ventas de tu propio curso."},
+            {"casilla": 33, "tipo": "LOBO_BLANCO", "titulo": "Fibras REIT", "costo": 5000, "flujo_extra": 700, "descripcion": "Bienes raíces comerciales."},
+            {"casilla": 39, "tipo": "LOBO_BLANCO", "titulo": "Startup Fintech", "costo": 15000, "flujo_extra": 3000, "descripcion": "Ronda semilla."},
+        ],
+    },
+}
+
+
+def _dolares(cents: int):
+    """Monto tal como lo ven los clientes en event_data/monto: 1200 o "12.50"."""
+    return cents // 100 if cents % 100 == 0 else fmt(cents)
+
+
+class Casilla:
+    """Evento precompilado de una casilla. Lo comparten todas las salas del tablero: no mutar."""
+
+    __slots__ = ("numero", "tipo", "titulo", "descripcion", "costo", "flujo", "inversion", "gasto",
+                 "data", "evento", "cola_gasto", "cola_compra", "cola_sin_fondos")
+
+    def __init__(self, numero: int, tipo: str, titulo: str, descripcion: str, costo: int = 0, flujo: int = 0):
+        self.numero, self.tipo, self.titulo, self.descripcion = numero, tipo, titulo, descripcion
+        self.costo, self.flujo = costo, flujo    # centavos
+        self.inversion = tipo == "LOBO_BLANCO"
+        self.gasto = tipo == "LOBO_NEGRO"
+
+        # event_data de DECISION_NEEDED (misma forma que los dicts de BOARD_MAP); `evento` es su JSON ya codificado
+        self.data = {"tipo": tipo, "titulo": titulo, "costo": _dolares(costo)}
+        if self.inversion: self.data["flujo_extra"] = _dolares(flujo)
+        self.data["descripcion"] = descripcion
+        self.evento = cached(self.data)
+
+        # Entradas de event_queue que produce la casilla (codificadas una vez, ver messages.py)
+        monto = f"-${_dolares(costo)}"
+        self.cola_gasto = cached({"tipo": tipo, "titulo": titulo, "descripcion": descripcion, "monto": monto}) if self.gasto else None
+        self.cola_compra = cached({"tipo": tipo, "titulo": titulo, "descripcion": "Inversión Exitosa", "monto": monto}) if self.inversion else None
+        self.cola_sin_fondos = cached({"tipo": tipo, "titulo": titulo, "descripcion": "Fondos insuficientes", "monto": None}) if self.inversion else None
+
+
+class CompiledBoard:
+    """Tablero inmutable listo para el turno: casillas[pos] para pos en 0..size."""
+
+    __slots__ = ("board_id", "layout", "nombre", "nivel", "size", "casillas", "json")
+
+    def __init__(self, board_id: str, layout: BoardLayout):
+        self.board_id, self.layout = board_id, layout   # layout: definición de origen (replay.py)
+        self.nombre, self.nivel = layout.nombre, layout.nivel
+        self.size = layout.casillas_totales
+        eventos = {e.casilla: e for e in layout.eventos}
+        neutros = layout.neutros or [NeutralMessage(**m) for m in MENSAJES_NEUTROS]
+
+        casillas = []
+        for numero in range(self.size + 1):
+            e = eventos.get(numero)
+            if e:
+                casillas.append(Casilla(numero, e.tipo, e.titulo, e.descripcion, e.costo, e.flujo_extra))
+            else:
+                m = neutros[numero % len(neutros)]
+                casillas.append(Casilla(numero, "NEUTRO", m.titulo, m.descripcion))
+        self.casillas: Tuple[Casilla, ...] = tuple(casillas)
+
+        # Tablero completo para los clientes (GET /boards/{id}), serializado una vez
+        self.json = dumps({
+            "board_id": board_id, "nombre": self.nombre, "nivel": self.nivel, "casillas_totales": self.size,
+            "eventos": [{"casilla": c.numero, **c.data} for c in self.casillas if c.tipo != "NEUTRO"],
+        })
+
+    def summary(self) -> dict:
+        return {"board_id": self.board_id, "nombre": self.nombre, "nivel": self.nivel, "casillas_totales": self.size}
+
+
+def to_layout(entrada: BoardCreate) -> BoardLayout:
+    """Definición validada (dólares) -> forma guardada en Mongo (centavos)."""
+    return BoardLayout(
+        nombre=entrada.nombre, nivel=entrada.nivel, casillas_totales=entrada.casillas_totales,
+        eventos=[BoardSquare(casilla=e.casilla, tipo=e.tipo, titulo=e.titulo, descripcion=e.descripcion,
+                             costo=to_cents(e.costo), flujo_extra=to_cents(e.flujo_extra or 0))
+                 for e in sorted(entrada.eventos, key=lambda e: e.casilla)],
+        neutros=[NeutralMessage(titulo=m.titulo, descripcion=m.descripcion) for m in entrada.neutros],
+    )
+
+
+BUILTIN_BOARDS: Dict[str, CompiledBoard] = {
+    board_id: CompiledBoard(board_id, to_layout(BoardCreate.model_validate(definicion)))
+    for board_id, definicion in BUILTIN_DEFINITIONS.items()
+}
+DEFAULT_BOARD = BUILTIN_BOARDS[DEFAULT_BOARD_ID]
+
+
+class BoardCache:
+    def __init__(self, maxsize: int = BOARD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lru: "OrderedDict[str, CompiledBoard]" = OrderedDict()
+
+    async def get(self, board_id: str) -> Optional[CompiledBoard]:
+        tablero = BUILTIN_BOARDS.get(board_id)
+        if tablero: return tablero
+        tablero = self._lru.get(board_id)
+        if tablero:
+            self._lru.move_to_end(board_id)
+            return tablero
+        doc = await BoardDefinition.find_one(BoardDefinition.board_id == board_id)
+        return self._put(CompiledBoard(board_id, doc.layout)) if doc else None
+
+    async def for_session(self, board_id: Optional[str]) -> CompiledBoard:
+        """Tablero de una sala (el clásico si la sala es anterior a los tableros o el suyo no existe)."""
+        tablero = await self.get(board_id or DEFAULT_BOARD_ID)
+        if tablero: return tablero
+        logger.warning(f"--- ⚠️ BOARD: '{board_id}' no existe, se usa '{DEFAULT_BOARD_ID}' ---")
+        return DEFAULT_BOARD
+
+    async def register(self, entrada: BoardCreate) -> Tuple[CompiledBoard, bool]:
+        """Guarda un tablero subido: (tablero, True si se guardó ahora). Sin board_id se deriva del contenido (subir dos veces el mismo lo reutiliza)."""
+        layout = to_layout(entrada)
+        board_id = entrada.board_id or "u-" + hashlib.sha1(layout.model_dump_json().encode()).hexdigest()[:12]
+        if board_id in BUILTIN_BOARDS: raise ValueError("Ese board_id es de un tablero de fábrica")
+        try:
+            await BoardDefinition(board_id=board_id, layout=layout).create()
+            creado = True
+        except DuplicateKeyError:
+            # Los tableros son inmutables: el mismo id solo vale con el mismo contenido
+            existente = await BoardDefinition.find_one(BoardDefinition.board_id == board_id)
+            if not existente or existente.layout != layout: raise ValueError("board_id en uso con otro contenido")
+            creado = False
+        return self._put(CompiledBoard(board_id, layout)), creado
+
+    async def discard(self, board_id: str):
+        """Borra un tablero recién registrado cuya sala no llegó a crearse (si ninguna otra sala lo usa)."""
+        if board_id in BUILTIN_BOARDS: return
+        if await GameSession.find_one(GameSession.board_id == board_id): return
+        await BoardDefinition.find(BoardDefinition.board_id == board_id).delete()
+        self._lru.pop(board_id, None)
+
+    def _put(self, tablero: CompiledBoard) -> CompiledBoard:
+        self._lru[tablero.board_id] = tablero
+        self._lru.move_to_end(tablero.board_id)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+        return tablero
+
+    def stats(self) -> dict:
+        return {"builtin": len(BUILTIN_BOARDS), "cached": len(self._lru), "maxsize": self.maxsize}
+
+
+boards = BoardCache()
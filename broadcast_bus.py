@@ -0,0 +1,403 @@
+# ==============================================================================
+# 📄 ARCHIVO: broadcast_bus.py
+# 🔍 ROL: Bus de difusión entre procesos (uvicorn --workers N / varios nodos)
+# ==============================================================================
+# Cada sala tiene un proceso "dueño" que ejecuta su actor (estado autoritativo).
+# Los demás procesos solo tienen sockets: reenvían los comandos al dueño y
+# reciben por el bus el resultado de cada tick para entregarlo localmente.
+#
+#   BROADCAST_BUS=local  -> un solo proceso (por defecto)
+#   BROADCAST_BUS=unix   -> varios workers en la misma máquina (hub en un Unix socket)
+#   BROADCAST_BUS=mongo  -> varios nodos vía change streams (requiere replica set)
+
+import asyncio
+import fcntl
+import logging
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from messages import dumps, loads
+
+BUS_BACKEND = os.getenv("BROADCAST_BUS", "local")
+BUS_SOCKET_PATH = os.getenv("BUS_SOCKET_PATH", "/tmp/lobos_bus.sock")
+BUS_LEASE_SECONDS = float(os.getenv("BUS_LEASE_SECONDS", "15"))
+
+STREAM_LIMIT = 2 ** 22  # Tamaño máx. de una línea del protocolo del hub
+
+logger = logging.getLogger(__name__)
+
+# on_envelope(session_id, envelope) / on_command(session_id, player_id, kind, raw) / on_lost(session_id)
+EnvelopeHandler = Callable[[str, dict], Awaitable[None]]
+CommandHandler = Callable[[str, str, str, str], Awaitable[None]]
+LostHandler = Callable[[str], Awaitable[None]]
+
+
+class BroadcastBus(ABC):
+    """Interfaz común de los backends."""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.on_envelope: Optional[EnvelopeHandler] = None
+        self.on_command: Optional[CommandHandler] = None
+        self.on_lost: Optional[LostHandler] = None
+
+    async def start(self, on_envelope: EnvelopeHandler, on_command: CommandHandler, on_lost: Optional[LostHandler] = None):
+        """on_lost: la sala dejó de ser de este proceso sin soltarla (lease vencido): hay que detener su actor."""
+        self.on_envelope = on_envelope
+        self.on_command = on_command
+        self.on_lost = on_lost
+
+    async def close(self):
+        pass
+
+    async def subscribe(self, session_id: str):
+        """Este proceso tiene sockets de la sala: quiere recibir sus envelopes."""
+
+    async def unsubscribe(self, session_id: str):
+        pass
+
+    @abstractmethod
+    async def publish(self, session_id: str, envelope: dict):
+        """Difunde el resultado de un tick a todos los procesos suscritos a la sala."""
+
+    @abstractmethod
+    async def send_command(self, session_id: str, player_id: str, kind: str, raw: str = ""):
+        """Entrega un comando al dueño de la sala (lo reclama si aún no tiene dueño)."""
+
+    async def release(self, session_id: str):
+        """El dueño suelta la sala (quedó inactiva)."""
+
+
+class LocalBus(BroadcastBus):
+    """Un solo proceso: todo se entrega en memoria."""
+
+    async def publish(self, session_id: str, envelope: dict):
+        await self.on_envelope(session_id, envelope)
+
+    async def send_command(self, session_id: str, player_id: str, kind: str, raw: str = ""):
+        await self.on_command(session_id, player_id, kind, raw)
+
+
+class UnixSocketBus(BroadcastBus):
+    """
+    Varios workers en un mismo host. El primero que obtiene el lock del archivo
+    se convierte en hub (servidor en un Unix socket); todos, incluido él, se
+    conectan como clientes. El hub asigna cada sala al primer worker que envía
+    un comando para ella y enruta los comandos al dueño y los envelopes a los
+    suscriptores. Protocolo: una línea JSON por mensaje.
+
+    Soltar una sala es atómico en el hub: el dueño informa cuántos comandos de
+    esa sala recibió ("seen") y el hub solo la suelta si no le reenvió ninguno
+    más. Si hay comandos en camino, el dueño los procesará y vuelve a cargar la
+    sala, así que la conserva (nunca hay dos dueños).
+    """
+
+    def __init__(self, path: str = BUS_SOCKET_PATH):
+        super().__init__()
+        self.path = path
+        self._lock_file = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Estado del hub (solo en el proceso que lo aloja)
+        self._hub_workers: Dict[str, asyncio.StreamWriter] = {}
+        self._hub_owners: Dict[str, str] = {}
+        self._hub_pending: Dict[str, int] = {}   # session_id -> comandos reenviados al dueño y no confirmados
+        self._hub_subs: Dict[str, Set[str]] = {}
+        # Estado del cliente
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._subs: Set[str] = set()
+        self._owned: Set[str] = set()
+        self._received: Dict[str, int] = {}   # session_id -> comandos recibidos del hub desde el último release
+        self._closing = False
+
+    # --- CLIENTE ---
+    async def start(self, on_envelope: EnvelopeHandler, on_command: CommandHandler, on_lost: Optional[LostHandler] = None):
+        await super().start(on_envelope, on_command, on_lost)
+        reader = await self._connect()
+        self._listener = asyncio.create_task(self._listen(reader))
+
+    async def close(self):
+        self._closing = True
+        if self._listener: self._listener.cancel()
+        if self._writer: self._writer.close()
+        if self._server:
+            self._server.close()
+            try: os.unlink(self.path)
+            except FileNotFoundError: pass
+        if self._lock_file: self._lock_file.close()
+
+    async def _connect(self) -> asyncio.StreamReader:
+        for intento in range(50):
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path, limit=STREAM_LIMIT)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if not await self._try_become_hub():
+                    await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError(f"No se pudo conectar al hub del bus en {self.path}")
+
+        # Presentarse y volver a declarar suscripciones y salas propias (por si el hub se reinició)
+        self._received.clear()
+        self._send({"op": "hello", "worker": self.worker_id})
+        for session_id in self._subs:
+            self._send({"op": "sub", "sid": session_id})
+        for session_id in self._owned:
+            self._send({"op": "own", "sid": session_id})
+        return reader
+
+    async def _try_become_hub(self) -> bool:
+        if self._server: return False
+        lock = open(self.path + ".lock", "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        self._lock_file = lock  # Se mantiene abierto: el lock dura lo que viva el proceso
+        try: os.unlink(self.path)  # Socket huérfano de un hub anterior
+        except FileNotFoundError: pass
+        self._server = await asyncio.start_unix_server(self._serve_worker, path=self.path, limit=STREAM_LIMIT)
+        logger.info(f"--- 🛰️ BUS: {self.worker_id} actúa como hub en {self.path} ---")
+        return True
+
+    def _send(self, msg: dict):
+        if self._writer and not self._writer.is_closing():
+            self._writer.write(dumps(msg) + b"\n")
+
+    async def _listen(self, reader: asyncio.StreamReader):
+        while not self._closing:
+            line = await reader.readline()
+            if not line:
+                # El hub murió: reconectar (o convertirse en hub) y seguir
+                logger.warning("--- 🟠 BUS: Conexión con el hub perdida, reconectando ---")
+                reader = await self._connect()
+                continue
+            msg = loads(line)
+            try:
+                if msg["op"] == "env":
+                    await self.on_envelope(msg["sid"], msg["env"])
+                elif msg["op"] == "cmd":
+                    self._owned.add(msg["sid"])
+                    self._received[msg["sid"]] = self._received.get(msg["sid"], 0) + 1
+                    await self.on_command(msg["sid"], msg["pid"], msg["kind"], msg["raw"])
+            except Exception as e:
+                logger.exception(f"--- 🔴 BUS: Error procesando {msg['op']} ({e}) ---")
+
+    async def subscribe(self, session_id: str):
+        if session_id not in self._subs:
+            self._subs.add(session_id)
+            self._send({"op": "sub", "sid": session_id})
+
+    async def unsubscribe(self, session_id: str):
+        if session_id in self._subs:
+            self._subs.discard(session_id)
+            self._send({"op": "unsub", "sid": session_id})
+
+    async def publish(self, session_id: str, envelope: dict):
+        # Entrega local directa; el hub reparte al resto de suscriptores
+        if session_id in self._subs:
+            await self.on_envelope(session_id, envelope)
+        self._send({"op": "pub", "sid": session_id, "env": envelope})
+
+    async def send_command(self, session_id: str, player_id: str, kind: str, raw: str = ""):
+        if session_id in self._owned:
+            await self.on_command(session_id, player_id, kind, raw)
+        else:
+            self._send({"op": "cmd", "sid": session_id, "pid": player_id, "kind": kind, "raw": raw})
+
+    async def release(self, session_id: str):
+        self._owned.discard(session_id)
+        self._send({"op": "release", "sid": session_id, "seen": self._received.pop(session_id, 0)})
+
+    # --- HUB ---
+    async def _serve_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        wid = None
+        try:
+            while line := await reader.readline():
+                msg = loads(line)
+                op = msg["op"]
+                if op == "hello":
+                    wid = msg["worker"]
+                    self._hub_workers[wid] = writer
+                elif op == "sub":
+                    self._hub_subs.setdefault(msg["sid"], set()).add(wid)
+                elif op == "unsub":
+                    self._hub_subs.get(msg["sid"], set()).discard(wid)
+                elif op == "pub":
+                    salida = dumps({"op": "env", "sid": msg["sid"], "env": msg["env"]}) + b"\n"
+                    for destino in self._hub_subs.get(msg["sid"], ()):
+                        if destino != wid: self._hub_write(destino, salida)
+                elif op == "cmd":
+                    # Fijar la sala a un worker: el primero que la pide (o quien llegue si el dueño murió)
+                    sid = msg["sid"]
+                    dueño = self._hub_owners.get(sid)
+                    if dueño not in self._hub_workers:
+                        dueño = self._hub_owners[sid] = wid
+                        self._hub_pending[sid] = 0
+                    self._hub_pending[sid] = self._hub_pending.get(sid, 0) + 1
+                    self._hub_write(dueño, line)
+                elif op == "own":
+                    self._hub_owners.setdefault(msg["sid"], wid)
+                elif op == "release":
+                    sid = msg["sid"]
+                    if self._hub_owners.get(sid) == wid:
+                        # Comandos reenviados que el dueño aún no había leído al soltar la sala
+                        en_camino = self._hub_pending.get(sid, 0) - msg.get("seen", 0)
+                        if en_camino > 0:
+                            self._hub_pending[sid] = en_camino
+                        else:
+                            del self._hub_owners[sid]
+                            self._hub_pending.pop(sid, None)
+        except (ConnectionError, ValueError, asyncio.CancelledError):
+            pass  # Worker caído, hub cerrándose o línea JSON inválida
+        finally:
+            if wid:
+                self._hub_workers.pop(wid, None)
+                for subs in self._hub_subs.values(): subs.discard(wid)
+                for sid in [s for s, w in self._hub_owners.items() if w == wid]:
+                    del self._hub_owners[sid]
+                    self._hub_pending.pop(sid, None)
+            writer.close()
+
+    def _hub_write(self, wid: str, data: bytes):
+        writer = self._hub_workers.get(wid)
+        if writer and not writer.is_closing():
+            writer.write(data)
+
+
+class MongoChangeStreamBus(BroadcastBus):
+    """
+    Varios nodos compartiendo la base de datos. Los envelopes y comandos se
+    insertan en una colección con TTL y cada nodo los recibe por change stream.
+    La propiedad de cada sala es un lease renovable en 'bus_owners'.
+    Requiere que Mongo sea un replica set (Atlas lo es).
+
+    Solo se ejecutan comandos de salas con lease propio: los que llegan a un
+    nodo que ya no es dueño (soltó la sala o perdió el lease y los demás
+    siguen con el dueño en caché) se vuelven a enrutar, reclamando la sala si
+    quedó libre. Al perder un lease se detiene el actor local (on_lost).
+    """
+
+    EVENTS_TTL_SECONDS = 60
+
+    def __init__(self, lease_seconds: float = BUS_LEASE_SECONDS):
+        super().__init__()
+        self.lease_seconds = lease_seconds
+        self._subs: Set[str] = set()
+        self._owned: Set[str] = set()
+        self._owner_cache: Dict[str, tuple] = {}   # session_id -> (worker_id, válido_hasta)
+        self._tasks = []
+
+    async def start(self, on_envelope: EnvelopeHandler, on_command: CommandHandler, on_lost: Optional[LostHandler] = None):
+        await super().start(on_envelope, on_command, on_lost)
+        from models import Player  # La conexión la abre database.init_db
+        db = Player.get_pymongo_collection().database
+        self._events = db["bus_events"]
+        self._owners = db["bus_owners"]
+        await self._events.create_index("ts", expireAfterSeconds=self.EVENTS_TTL_SECONDS)
+        self._tasks = [asyncio.create_task(self._watch()), asyncio.create_task(self._renew_leases())]
+
+    async def close(self):
+        for task in self._tasks: task.cancel()
+        for session_id in list(self._owned):
+            await self.release(session_id)
+
+    async def _watch(self):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with self._events.watch(pipeline) as stream:
+                    async for change in stream:
+                        await self._dispatch(change["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"--- 🟠 BUS: Change stream interrumpido ({e}), reintentando ---")
+                await asyncio.sleep(1)
+
+    async def _dispatch(self, doc: dict):
+        if doc.get("origin") == self.worker_id: return
+        try:
+            if doc["kind"] == "env" and doc["sid"] in self._subs:
+                await self.on_envelope(doc["sid"], doc["env"])
+            elif doc["kind"] == "cmd" and doc.get("to") == self.worker_id:
+                if doc["sid"] not in self._owned:
+                    # Enrutado con un dueño en caché que ya no somos: se vuelve a resolver
+                    self._owner_cache.pop(doc["sid"], None)
+                await self.send_command(doc["sid"], doc["pid"], doc["cmd"], doc["raw"])
+        except Exception as e:
+            logger.exception(f"--- 🔴 BUS: Error procesando {doc.get('kind')} ({e}) ---")
+
+    async def _renew_leases(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            for session_id in list(self._owned):
+                if not await self._claim(session_id):
+                    self._owned.discard(session_id)
+                    self._owner_cache.pop(session_id, None)
+                    logger.warning(f"--- 🟠 BUS: Se perdió el lease de la sala {session_id} ---")
+                    # Otro nodo ya puede ser autoritativo: el actor local no debe seguir aplicando comandos
+                    if self.on_lost: await self.on_lost(session_id)
+
+    async def _claim(self, session_id: str) -> bool:
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError
+        now = datetime.utcnow()
+        try:
+            await self._owners.find_one_and_update(
+                {"_id": session_id, "$or": [{"owner": self.worker_id}, {"expires": {"$lt": now}}]},
+                {"$set": {"owner": self.worker_id, "expires": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            return False  # Otro nodo tiene un lease vigente
+        self._owned.add(session_id)
+        return True
+
+    async def _owner_of(self, session_id: str) -> str:
+        cache = self._owner_cache.get(session_id)
+        # Si la caché dice "este nodo" pero ya no hay lease propio, se vuelve a reclamar
+        if cache and cache[1] > time.monotonic() and cache[0] != self.worker_id: return cache[0]
+        if await self._claim(session_id):
+            owner = self.worker_id
+        else:
+            doc = await self._owners.find_one({"_id": session_id})
+            owner = doc["owner"] if doc else self.worker_id
+        self._owner_cache[session_id] = (owner, time.monotonic() + self.lease_seconds / 3)
+        return owner
+
+    async def subscribe(self, session_id: str):
+        self._subs.add(session_id)
+
+    async def unsubscribe(self, session_id: str):
+        self._subs.discard(session_id)
+
+    async def publish(self, session_id: str, envelope: dict):
+        if session_id in self._subs:
+            await self.on_envelope(session_id, envelope)
+        await self._events.insert_one({"kind": "env", "sid": session_id, "env": envelope, "origin": self.worker_id, "ts": datetime.utcnow()})
+
+    async def send_command(self, session_id: str, player_id: str, kind: str, raw: str = ""):
+        owner = self.worker_id if session_id in self._owned else await self._owner_of(session_id)
+        if owner == self.worker_id:
+            await self.on_command(session_id, player_id, kind, raw)
+        else:
+            await self._events.insert_one({"kind": "cmd", "sid": session_id, "to": owner, "pid": player_id, "cmd": kind, "raw": raw, "origin": self.worker_id, "ts": datetime.utcnow()})
+
+    async def release(self, session_id: str):
+        self._owned.discard(session_id)
+        self._owner_cache.pop(session_id, None)
+        await self._owners.delete_one({"_id": session_id, "owner": self.worker_id})
+
+
+def create_bus(backend: str = BUS_BACKEND) -> BroadcastBus:
+    if backend == "unix": return UnixSocketBus()
+    if backend == "mongo": return MongoChangeStreamBus()
+    return LocalBus()
+
+
+bus = create_bus()
@@ -1,45 +1,259 @@
 # ==============================================================================
-# 📄 ARCHIVO: connection_manager.py (VERSIÓN 7.0: SAFEHOUSE)
+# 📄 ARCHIVO: connection_manager.py (VERSIÓN 8.0: COLAS POR CONEXIÓN)
 # ==============================================================================
+# Cada socket tiene su propia cola de salida acotada y una tarea escritora.
+# El broadcast solo encola (nunca espera al cliente más lento); si una cola se
+# llena se aplica la política de desborde configurada.
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
 from fastapi import WebSocket
-from typing import List, Dict
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from leaderboard import render_frame
+from messages import loads
+from metrics import REGISTRY, STAGE_LATENCY
+from protocol import PROTO_BIN, BinaryCodec
+
+OUTBOX_SIZE = int(os.getenv("WS_OUTBOX_SIZE", "64"))
+# "drop_oldest": descarta el frame prescindible más antiguo | "evict": expulsa al cliente
+OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", "drop_oldest")
+# Frames que se pueden perder sin romper el estado del cliente (el siguiente los reemplaza)
+DROPPABLE_TYPES = frozenset({"CHAT", "LEADERBOARD"})
+
+CLOSE_GOING_AWAY = 1001        # Sala inactiva: el servidor libera sus recursos
+CLOSE_POLICY_VIOLATION = 1008  # La sala (o el jugador) ya no existe
+CLOSE_TRY_AGAIN_LATER = 1013
+
+logger = logging.getLogger(__name__)
+
+
+class Connection:
+    """Socket + cola de salida acotada + tarea escritora."""
+
+    def __init__(self, websocket: WebSocket, session_id: str, player_id: Optional[str], leaderboard_mode: str, maxsize: int, proto: str):
+        self.websocket = websocket
+        self.token = uuid.uuid4().hex   # Identifica esta conexión en envelopes dirigidos
+        self.session_id = session_id
+        self.player_id = player_id
+        self.leaderboard_mode = leaderboard_mode
+        self.primed = False   # ¿Ya recibió un ranking completo? (requisito para recibir deltas)
+        self.codec = BinaryCodec() if proto == PROTO_BIN else None
+        self.maxsize = maxsize
+        # (tipo, mensaje, nº de frame binario o None)
+        self.queue: Deque[Tuple[Optional[str], Union[str, bytes], Optional[int]]] = deque()
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+
+    def offer(self, message: Union[str, bytes], msg_type: Optional[str], policy: str, frame_no: Optional[int] = None) -> bool:
+        """Encola sin bloquear. Devuelve False si el cliente debe ser expulsado."""
+        if len(self.queue) >= self.maxsize:
+            if policy != "drop_oldest": return False
+            victima = next((item for item in self.queue if item[0] in DROPPABLE_TYPES), None)
+            if victima is not None:
+                self.queue.remove(victima)
+                self._discarded(victima[2])
+            elif msg_type in DROPPABLE_TYPES:
+                self.dropped += 1
+                self._discarded(frame_no)
+                return True  # Se descarta el nuevo: no hay nada prescindible que sacar
+            else:
+                return False
+            self.dropped += 1
+        self.queue.append((msg_type, message, frame_no))
+        self._ready.set()
+        return True
+
+    def _discarded(self, frame_no: Optional[int]):
+        # Un frame binario que no se envía no puede pasar a ser la base de los deltas
+        if frame_no is not None and self.codec: self.codec.discard(frame_no)
+
+    async def run_writer(self, on_error: Callable[["Connection"], None]):
+        try:
+            while not self.closed:
+                if not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                _, message, _ = self.queue.popleft()
+                if isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket roto: fuera de la sala de inmediato
+            on_error(self)
+
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        self._ready.set()
+        if self.writer and self.writer is not asyncio.current_task():
+            self.writer.cancel()
+
 
 class ConnectionManager:
-    def __init__(self):
-        # active_connections: { "session_id": [socket1, socket2] }
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    def __init__(self, outbox_size: int = OUTBOX_SIZE, overflow_policy: str = OVERFLOW_POLICY):
+        self.outbox_size = outbox_size
+        self.overflow_policy = overflow_policy
+        # active_connections: { "session_id": { socket: Connection } }
+        self.active_connections: Dict[str, Dict[WebSocket, Connection]] = {}
+        # session_id -> último envelope entregado (monotonic), para detectar salas inactivas
+        self.last_activity: Dict[str, float] = {}
+        self.evicted_total = 0
+        self.dropped_total = 0
 
-    async def connect(self, websocket: WebSocket, session_id: str):
+    async def connect(self, websocket: WebSocket, session_id: str, player_id: Optional[str] = None, leaderboard_mode: str = "full", proto: str = "json") -> Connection:
         """
         Registra el socket. NO LLAMA A ACCEPT (Main.py lo hace).
         """
-        if session_id not in self.active_connections:
-            self.active_connections[session_id] = []
-        
+        sala = self.active_connections.setdefault(session_id, {})
+        self.last_activity[session_id] = time.monotonic()
+
         # Evitar duplicados exactos
-        if websocket not in self.active_connections[session_id]:
-            self.active_connections[session_id].append(websocket)
-            print(f"--- 🔌 MANAGER: Socket registrado en sala {session_id} ---")
+        if websocket not in sala:
+            conn = Connection(websocket, session_id, player_id, leaderboard_mode, self.outbox_size, proto)
+            conn.writer = asyncio.create_task(conn.run_writer(self._remove))
+            sala[websocket] = conn
+            if conn.codec: self._deliver(conn, conn.codec.hello(), "HELLO")
+            logger.info(f"--- 🔌 MANAGER: Socket registrado en sala {session_id} ---")
+        return sala[websocket]
 
     def disconnect(self, websocket: WebSocket, session_id: str):
-        if session_id in self.active_connections:
-            if websocket in self.active_connections[session_id]:
-                self.active_connections[session_id].remove(websocket)
-                if len(self.active_connections[session_id]) == 0:
-                    del self.active_connections[session_id]
+        sala = self.active_connections.get(session_id)
+        if sala and websocket in sala:
+            self._remove(sala[websocket])
+
+    def _remove(self, conn: Connection):
+        conn.close()
+        sala = self.active_connections.get(conn.session_id)
+        if sala is not None and sala.get(conn.websocket) is conn:
+            del sala[conn.websocket]
+            if len(sala) == 0:
+                del self.active_connections[conn.session_id]
+                self.last_activity.pop(conn.session_id, None)
+
+    def _evict(self, conn: Connection):
+        """Cliente demasiado lento: se cierra su socket y sale de la sala."""
+        self.evicted_total += 1
+        self._remove(conn)
+        logger.warning(f"--- 🐢 MANAGER: Cliente lento expulsado de la sala {conn.session_id} ---")
+        asyncio.create_task(self._close_quietly(conn.websocket))
 
-    async def broadcast(self, message: str, session_id: str):
+    def close_session(self, session_id: str, code: int):
+        """Cierra todos los sockets locales de una sala (cada handler hará su LEAVE)."""
+        for conn in list(self.active_connections.get(session_id, {}).values()):
+            self._remove(conn)
+            asyncio.create_task(self._close_quietly(conn.websocket, code))
+
+    def idle_sessions(self, idle_seconds: float) -> List[str]:
+        """Salas con sockets abiertos pero sin ningún envelope desde hace idle_seconds."""
+        limite = time.monotonic() - idle_seconds
+        return [sid for sid in self.active_connections if self.last_activity.get(sid, 0) < limite]
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, code: int = CLOSE_TRY_AGAIN_LATER):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    def _deliver(self, conn: Connection, message: Union[str, bytes], msg_type: Optional[str], frame_no: Optional[int] = None):
+        descartados = conn.dropped
+        if not conn.offer(message, msg_type, self.overflow_policy, frame_no):
+            self._evict(conn)
+        self.dropped_total += conn.dropped - descartados
+
+    async def send_personal(self, message: str, websocket: WebSocket, session_id: str, msg_type: Optional[str] = None):
+        """Encola un mensaje para un solo socket (respetando el orden de su cola)."""
+        conn = self.active_connections.get(session_id, {}).get(websocket)
+        if conn: self._deliver(conn, message, msg_type)
+
+    async def broadcast(self, message: str, session_id: str, msg_type: Optional[str] = None):
+        """
+        Encola el mensaje para todos. Nunca espera a que un cliente lo reciba.
+        """
+        for conn in list(self.active_connections.get(session_id, {}).values()):
+            self._deliver(conn, message, msg_type)
+
+    async def deliver_envelope(self, session_id: str, envelope: dict):
         """
-        Envía a todos. Si uno falla, lo ignora silenciosamente.
+        Entrega el resultado de un tick del actor (venga de este proceso o del bus)
+        a los sockets locales: un solo frame por cliente, con el ranking al final.
+        envelope = {"frames": [json...], "critical": bool, "ranking": None | {"rows": [...], "delta": json | None}}
         """
         if session_id in self.active_connections:
-            for connection in self.active_connections[session_id][:]:
-                try:
-                    # Propiedad interna de Starlette/FastAPI para saber si está abierto
-                    if connection.client_state.value == 1: # 1 = CONNECTED
-                        await connection.send_text(message)
-                except Exception:
-                    # Si falla, no hacemos nada. El evento 'disconnect' del main se encargará.
-                    pass
-
-manager = ConnectionManager()
\ No newline at end of file
+            self.last_activity[session_id] = time.monotonic()
+        with STAGE_LATENCY.time(stage="broadcast"):
+            self._fan_out(session_id, envelope)
+
+    def _fan_out(self, session_id: str, envelope: dict):
+        compartidos = envelope.get("frames") or []
+        ranking = envelope.get("ranking")
+        if not compartidos and not ranking: return  # Nada para jugadores (p. ej. estado para espectadores)
+        delta = ranking.get("delta") if ranking else None
+        decodificado = None  # Para clientes binarios: se parsea una sola vez por envelope
+
+        destino = envelope.get("conn")  # Envelope dirigido a una sola conexión (resincronización)
+        for conn in list(self.active_connections.get(session_id, {}).values()):
+            if destino and conn.token != destino: continue
+            if conn.codec:
+                if decodificado is None:
+                    decodificado = ([loads(f) for f in compartidos],
+                                    [loads(fila) for _, fila, _ in ranking["rows"]] if ranking else None)
+                # Los deltas binarios toleran frames descartados (codec.discard): solo los críticos se conservan
+                tipo = "BATCH" if envelope.get("critical") else "LEADERBOARD"
+                datos = conn.codec.encode(*decodificado, conn.player_id)
+                self._deliver(conn, datos, tipo, conn.codec.frame_no)
+                continue
+
+            frames = list(compartidos)
+            if ranking:
+                if conn.leaderboard_mode == "delta" and conn.primed:
+                    if delta: frames.append(delta)
+                else:
+                    frames.append(render_frame(ranking["rows"], conn.player_id))
+                    conn.primed = True
+            if not frames: continue
+
+            message = frames[0] if len(frames) == 1 else '{"type":"BATCH","frames":[' + ",".join(frames) + "]}"
+            # Un lote solo con ranking completo/chat sigue siendo prescindible ante desborde
+            # (salvo para clientes en modo delta: perder un frame rompería su ranking)
+            if envelope.get("critical") or conn.leaderboard_mode == "delta":
+                tipo = "BATCH"
+            else:
+                tipo = "CHAT" if compartidos else "LEADERBOARD"
+            self._deliver(conn, message, tipo)
+
+    # --- MONITOREO ---
+    def queue_depths(self, session_id: str) -> Dict[str, int]:
+        """Profundidad de la cola de salida de cada conexión de la sala (por player_id)."""
+        return {str(c.player_id): len(c.queue) for c in self.active_connections.get(session_id, {}).values()}
+
+    def stats(self) -> dict:
+        conexiones = [c for sala in self.active_connections.values() for c in sala.values()]
+        return {
+            "sessions": len(self.active_connections),
+            "connections": len(conexiones),
+            "queued_frames": sum(len(c.queue) for c in conexiones),
+            "max_queue_depth": max((len(c.queue) for c in conexiones), default=0),
+            "dropped_frames": self.dropped_total,
+            "evicted_clients": self.evicted_total,
+        }
+
+manager = ConnectionManager()
+
+REGISTRY.callback("lobos_ws_sockets", "WebSockets abiertos en este proceso", lambda: manager.stats()["connections"])
+REGISTRY.callback("lobos_ws_sessions", "Salas con al menos un socket en este proceso", lambda: len(manager.active_connections))
+REGISTRY.callback("lobos_outbox_frames", "Frames en cola de salida sumando todas las conexiones", lambda: manager.stats()["queued_frames"])
+REGISTRY.callback("lobos_outbox_max_depth", "Cola de salida más larga", lambda: manager.stats()["max_queue_depth"])
+REGISTRY.callback("lobos_frames_dropped_total", "Frames prescindibles descartados por desborde", lambda: manager.dropped_total, kind="counter")
+REGISTRY.callback("lobos_clients_evicted_total", "Clientes lentos expulsados", lambda: manager.evicted_total, kind="counter")
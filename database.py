@@ -3,23 +3,47 @@
 # 🔍 ROL: Inicialización de Motor + Beanie
 # ==============================================================================
 
+import logging
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from dotenv import load_dotenv
-from models import Player, GameSession 
+from pymongo import monitoring
+from models import Player, GameSession, JournalEntry, SessionArchive, BoardDefinition
+from metrics import MONGO_COMMANDS, MONGO_LATENCY
 
 load_dotenv()
 MONGO_URL = os.getenv("MONGO_URI")
 
+# Modelos registrados en Beanie (los usa también benchmarks/ws_load.py)
+DOCUMENT_MODELS = [Player, GameSession, JournalEntry, SessionArchive, BoardDefinition]
+
+logger = logging.getLogger(__name__)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Cuenta cada round-trip a Mongo (y su duración) para /metrics."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMANDS.inc(command=event.command_name, status="ok")
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMANDS.inc(command=event.command_name, status="error")
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
+
+
 async def init_db():
     if not MONGO_URL:
-        print("🔴 ERROR: Falta MONGO_URI")
+        logger.error("🔴 ERROR: Falta MONGO_URI")
         return
 
-    client = AsyncIOMotorClient(MONGO_URL)
+    client = AsyncIOMotorClient(MONGO_URL, event_listeners=[MongoCommandMetrics()])
     database = client.get_default_database()
-    
-    # Registramos ambos modelos
-    await init_beanie(database=database, document_models=[Player, GameSession])
-    print("--- 🟢 BD CONECTADA ---")
\ No newline at end of file
+
+    # Registramos los modelos
+    await init_beanie(database=database, document_models=DOCUMENT_MODELS)
+    logger.info("--- 🟢 BD CONECTADA ---")
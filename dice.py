@@ -0,0 +1,43 @@
+# ==============================================================================
+# 📄 ARCHIVO: dice.py
+# 🔍 ROL: Dados deterministas por sala (semilla + cursor) generados por bloques
+# ==============================================================================
+# Cada GameSession tiene una `seed` y un `dice_cursor` (dados ya usados). La
+# tirada n de la sala es siempre la misma: está en el bloque n // DICE_BLOCK,
+# que se genera de una vez con PCG64 sembrado con (seed, nº de bloque). Así:
+#   - tirar es indexar una lista (el PRNG corre una vez cada DICE_BLOCK dados),
+#   - se puede retomar en cualquier cursor sin regenerar lo anterior (O(1)),
+#   - replay.py reproduce una partida a partir de la semilla y los comandos.
+# DICE_BLOCK forma parte de la secuencia: cambiarlo cambia los dados de todas
+# las salas existentes.
+
+import secrets
+
+import numpy as np
+
+DICE_BLOCK = 1024
+SEED_BITS = 63   # Cabe en un Int64 de Mongo
+
+
+def new_seed() -> int:
+    return secrets.randbits(SEED_BITS)
+
+
+class DiceStream:
+    def __init__(self, seed: int, cursor: int = 0):
+        self.seed = seed
+        self.cursor = cursor
+        self._block = -1
+        self._rolls: list = []
+
+    def roll(self) -> int:
+        bloque, i = divmod(self.cursor, DICE_BLOCK)
+        if bloque != self._block:
+            self._refill(bloque)
+        self.cursor += 1
+        return self._rolls[i]
+
+    def _refill(self, bloque: int):
+        gen = np.random.Generator(np.random.PCG64([self.seed, bloque]))
+        self._rolls = gen.integers(1, 7, size=DICE_BLOCK, dtype=np.int64).tolist()
+        self._block = bloque
@@ -45,8 +45,14 @@ function App() {
   const [jugador, setJugador] = useState(null); 
   const [leaderboard, setLeaderboard] = useState([]); 
   const [globalActivity, setGlobalActivity] = useState([]); 
+  const [boardPlayers, setBoardPlayers] = useState([]); // Fichas de toda la sala (panel del profesor)
+  const [classStats, setClassStats] = useState(null);   // Estadísticas de la clase (panel del profesor)
+  const [connectedCount, setConnectedCount] = useState(0); // Alumnos con el juego abierto (panel del profesor)
   const [configSalary, setConfigSalary] = useState("2500");
   const [configGoal, setConfigGoal] = useState("1000000");
+  const [configBoard, setConfigBoard] = useState("clasico");
+  const [availableBoards, setAvailableBoards] = useState([]); // Tableros de fábrica (GET /boards)
+  const [board, setBoard] = useState(null);                   // Tablero de la sala del alumno
   const [gameTarget, setGameTarget] = useState("1000000"); 
   const [mensaje, setMensaje] = useState("");   
   const [backendStatus, setBackendStatus] = useState("Conectando..."); 
@@ -62,6 +68,7 @@ function App() {
   const [pendingDecision, setPendingDecision] = useState(null); 
 
   const ws = useRef(null);
+  const lastSeqRef = useRef(0); // Último evento recibido (para reanudar tras reconexión)
   const isTeacherRef = useRef(isTeacherDashboard);
   const gameCodeRef = useRef(gameCode);
 
@@ -73,6 +80,7 @@ function App() {
   // Health Check
   useEffect(() => {
     fetch(`${API_URL}/`).then(() => setBackendStatus("En Línea 🟢")).catch(() => setBackendStatus("Offline 🔴"));
+    fetch(`${API_URL}/boards`).then(r => r.json()).then(setAvailableBoards).catch(() => {});
   }, [API_URL]);
 
   // WebSocket
@@ -82,7 +90,8 @@ function App() {
     const idJugador = jugador.id || jugador._id;
     const protocol = API_URL.startsWith("https") ? "wss" : "ws";
     const host = API_URL.replace(/^http(s)?:\/\//, '').replace(/\/$/, "");
-    const url = `${protocol}://${host}/ws/${idJugador}`;
+    const resume = lastSeqRef.current ? `?last_seq=${lastSeqRef.current}` : "";
+    const url = `${protocol}://${host}/ws/${idJugador}${resume}`;
 
     if (ws.current && ws.current.readyState === WebSocket.OPEN) return;
 
@@ -91,10 +100,14 @@ function App() {
 
     socket.onopen = () => setWsStatus("🟢");
     
-    socket.onmessage = (e) => {
-        try {
-            const data = JSON.parse(e.data);
-            
+    // Procesa un frame individual (el servidor puede agrupar varios en un BATCH por tick)
+    const handleFrame = (data) => {
+            // Un evento ya aplicado puede repetirse al reanudar (llegó entre la conexión y el JOIN): se ignora
+            if (data.seq) {
+                if (data.seq <= lastSeqRef.current) return;
+                lastSeqRef.current = data.seq;
+            }
+
             // CASO A: SOLICITUD DE DECISIÓN
             if (data.type === "DECISION_NEEDED") {
                 const payload = data.payload;
@@ -173,7 +186,30 @@ function App() {
                 }
             }
             else if (data.type === "CHAT") addLog(data.message);
+            // El profesor reinició la sala: todos a la salida con cero
+            else if (data.type === "SESSION_RESET") {
+                addLog(data.message);
+                setPendingDecision(null); setCardQueue([]); setWinner(false);
+                setJugador(prev => ({ ...prev, position: 0, financials: { cash: "0.00", netWorth: "0.00", toxicDebt: "0.00", passiveIncome: "0.00" } }));
+            }
+            // Reconexión tras perder demasiados eventos: estado compacto en lugar del historial
+            else if (data.type === "SNAPSHOT") {
+                const p = data.payload?.player;
+                if (p) {
+                    setJugador(prev => ({
+                        ...prev, position: p.new_position,
+                        financials: { cash: p.new_cash, netWorth: p.new_net_worth, toxicDebt: p.new_debt, passiveIncome: p.new_passive_income }
+                    }));
+                    if (p.game_target) setGameTarget(p.game_target);
+                }
+            }
+    };
 
+    socket.onmessage = (e) => {
+        try {
+            const data = JSON.parse(e.data);
+            if (data.type === "BATCH") data.frames.forEach(handleFrame);
+            else handleFrame(data);
         } catch (err) { console.error(err); }
     };
 
@@ -186,6 +222,33 @@ function App() {
     return () => { if (ws.current) ws.current.close(); };
   }, [jugador, API_URL]); 
 
+  // Panel del profesor: espectador de solo lectura (no ocupa un jugador en la sala)
+  useEffect(() => {
+    if (!isTeacherDashboard || !gameCode) return;
+
+    const protocol = API_URL.startsWith("https") ? "wss" : "ws";
+    const host = API_URL.replace(/^http(s)?:\/\//, '').replace(/\/$/, "");
+    setWsStatus("🟡");
+    const socket = new WebSocket(`${protocol}://${host}/ws/watch/${gameCode}`);
+
+    socket.onopen = () => setWsStatus("🟢");
+    // El servidor envía un snapshot completo por tick (tablero + ranking + actividad reciente)
+    socket.onmessage = (e) => {
+        try {
+            const data = JSON.parse(e.data);
+            if (data.type !== "WATCH_SNAPSHOT") return;
+            setBoardPlayers(data.payload.players);
+            setConnectedCount(data.payload.connected ?? 0);
+            setLeaderboard(data.payload.leaderboard);
+            setGlobalActivity(data.payload.recent.filter(r => r.events.length > 0).reverse());
+            if (data.payload.stats?.summary) setClassStats(data.payload.stats);
+        } catch (err) { console.error(err); }
+    };
+    socket.onclose = () => setWsStatus("🔴");
+
+    return () => socket.close();
+  }, [isTeacherDashboard, gameCode, API_URL]);
+
   // --- HANDLERS ---
   const handleRegister = async () => {
       if(!nickname || !gameCode) return setMensaje("Faltan datos");
@@ -195,6 +258,7 @@ function App() {
           const data = await res.json();
           if(!res.ok) throw new Error(data.detail);
           setJugador(data); setIsTeacherDashboard(false); setMensaje("");
+          fetch(`${API_URL}/sessions/${gameCode}/board`).then(r => r.json()).then(setBoard).catch(() => setBoard(null));
       } catch(e) { setMensaje(e.message); }
   };
 
@@ -202,12 +266,10 @@ function App() {
       if(!gameCode) return setMensaje("Falta Código");
       setMensaje("Creando...");
       try {
-          const res1 = await fetch(`${API_URL}/sessions`, { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ code: gameCode, salary: Number(configSalary), winning_score: Number(configGoal) }) });
+          const res1 = await fetch(`${API_URL}/sessions`, { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ code: gameCode, salary: Number(configSalary), winning_score: Number(configGoal), board_id: configBoard }) });
           if(!res1.ok) throw new Error((await res1.json()).detail);
-          const res2 = await fetch(`${API_URL}/players`, { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ nickname: "HOST_PROFESOR", game_code: gameCode }) });
-          const data = await res2.json();
-          if(!res2.ok) throw new Error(data.detail);
-          setJugador(data); setIsTeacherDashboard(true); setMensaje("");
+          setIsTeacherDashboard(true); setMensaje("");
+          fetch(`${API_URL}/sessions/${gameCode}/board`).then(r => r.json()).then(setBoard).catch(() => setBoard(null));
       } catch(e) { setMensaje(e.message); }
   };
 
@@ -231,13 +293,14 @@ function App() {
   };
 
   const resetGame = () => { if(ws.current) ws.current.close(); setJugador(null); setWinner(false); setGlobalActivity([]); setIsTeacherDashboard(false); };
-  const handleGlobalReset = async () => { if(confirm("¿Borrar DB?")) { await fetch(`${API_URL}/reset_game`, {method: 'DELETE'}); window.location.reload(); } };
+  // Reinicia solo esta sala: los alumnos conectados reciben SESSION_RESET y siguen en la partida
+  const handleGlobalReset = async () => { if(confirm("¿Reiniciar la partida de esta sala?")) { await fetch(`${API_URL}/sessions/${gameCode}/reset`, {method: 'POST'}); setGlobalActivity([]); } };
 
   // --- RENDER ---
-  if (jugador && isTeacherDashboard) {
+  if (isTeacherDashboard) {
       return (
         <div className="min-h-screen bg-slate-950 text-white flex flex-col items-center p-6">
-            <TeacherDashboard gameCode={gameCode} playersData={leaderboard} onReset={handleGlobalReset} connectedCount={leaderboard.length - 1} globalActivity={globalActivity} />
+            <TeacherDashboard gameCode={gameCode} playersData={leaderboard} boardPlayers={boardPlayers} board={board} stats={classStats} onReset={handleGlobalReset} connectedCount={connectedCount} globalActivity={globalActivity} />
         </div>
       );
   }
@@ -274,7 +337,7 @@ function App() {
             <div className="lg:col-span-5 flex flex-col gap-4">
                 <div className="bg-slate-800 p-2 rounded-xl min-h-[350px] flex flex-col items-center justify-center relative overflow-hidden">
                     {lastDice && <div className="absolute top-4 right-4 z-10 bg-black/80 px-4 py-2 rounded-lg border border-yellow-500/50 animate-bounce"><span className="text-2xl font-bold text-yellow-400">🎲 {lastDice}</span></div>}
-                    <GameBoard players={leaderboard} />
+                    <GameBoard players={leaderboard} board={board} />
                     <p className="text-slate-500 text-[10px] mt-2 uppercase tracking-widest">Estás en la casilla <span className="text-white font-bold">{jugador.position}</span></p>
                 </div>
                 <button onClick={lanzarDados} disabled={isRolling || pendingDecision || wsStatus.includes("🔴")} className={`w-full bg-lobo-neion-red hover:bg-red-600 py-4 rounded-xl font-black text-xl shadow-lg transition-transform active:scale-95 disabled:opacity-50 disabled:cursor-not-allowed`}>
@@ -314,6 +377,7 @@ function App() {
                     <div className="bg-slate-800 p-3 rounded text-xs text-slate-400 mb-2"><p className="font-bold text-white mb-1">Configuración de la Partida</p>Define las reglas económicas para esta sesión.</div>
                     <input type="text" value={gameCode} onChange={(e) => setGameCode(e.target.value.toUpperCase())} placeholder="NUEVO CÓDIGO DE SALA" className="w-full bg-slate-800 p-3 rounded text-white border border-slate-600 focus:border-lobo-neion-red outline-none uppercase"/>
                     <div className="flex gap-2"><div className="flex-1"><label className="text-[10px] text-slate-400 ml-1">Salario por turno</label><input type="number" value={configSalary} onChange={(e) => setConfigSalary(e.target.value)} className="w-full bg-slate-800 p-2 rounded text-white border border-slate-600 focus:border-lobo-neion-red outline-none"/></div><div className="flex-1"><label className="text-[10px] text-slate-400 ml-1">Meta para ganar (Patrimonio)</label><input type="number" value={configGoal} onChange={(e) => setConfigGoal(e.target.value)} className="w-full bg-slate-800 p-2 rounded text-white border border-slate-600 focus:border-lobo-neion-red outline-none"/></div></div>
+                    <div><label className="text-[10px] text-slate-400 ml-1">Tablero</label><select value={configBoard} onChange={(e) => setConfigBoard(e.target.value)} className="w-full bg-slate-800 p-2 rounded text-white border border-slate-600 focus:border-lobo-neion-red outline-none">{(availableBoards.length ? availableBoards : [{ board_id: "clasico", nombre: "La Senda Clásica", nivel: "secundaria" }]).map(b => <option key={b.board_id} value={b.board_id}>{b.nombre} ({b.nivel})</option>)}</select></div>
                     <button onClick={handleCreateSession} className="w-full bg-lobo-neion-red py-3 rounded font-bold text-white shadow-lg hover:bg-red-600 transition-colors">CREAR SALA</button>
                   </>
               )}
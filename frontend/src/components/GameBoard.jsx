@@ -9,10 +9,13 @@
 // =============================================================================
 
 import React from 'react';
-import { TOTAL_CELLS, getTileColor, BOARD_TILES } from '../utils/boardData';
+import { TOTAL_CELLS, BOARD_TILES, tilesFromBoard, getTileColor } from '../utils/boardData';
 
 // Eliminamos 'myPosition' de las props ya que la lógica usa 'player.is_me' interno
-const GameBoard = ({ players }) => {
+// 'board' = tablero de la sala (GET /sessions/{code}/board); sin él se dibuja el clásico
+const GameBoard = ({ players, board }) => {
+  const totalCells = board?.casillas_totales || TOTAL_CELLS;
+  const boardTiles = board ? tilesFromBoard(board) : BOARD_TILES;
   
   // --- CONFIGURACIÓN GEOMÉTRICA ---
   const RADIUS = 140; // Radio del círculo principal
@@ -22,7 +25,7 @@ const GameBoard = ({ players }) => {
   const getCoordinates = (index, offsetRadius = 0) => {
     // 1. Calcular ángulo: (Indice / Total) * 2PI radianes.
     // Restamos PI/2 para que la casilla 1 empiece arriba (las 12 del reloj).
-    const angle = (index / TOTAL_CELLS) * 2 * Math.PI - Math.PI / 2;
+    const angle = (index / totalCells) * 2 * Math.PI - Math.PI / 2;
     
     // 2. Aplicar radio variable (para efecto de capas)
     const r = RADIUS + offsetRadius;
@@ -35,11 +38,11 @@ const GameBoard = ({ players }) => {
   };
 
   // --- RENDERIZADO DEL TABLERO ESTÁTICO (CASILLAS) ---
-  const tiles = Array.from({ length: TOTAL_CELLS }, (_, i) => {
-    const pos = i + 1; // Casillas 1 a 30
+  const tiles = Array.from({ length: totalCells }, (_, i) => {
+    const pos = i + 1; // Casillas 1 a totalCells
     const { x, y } = getCoordinates(pos);
-    const colorClass = getTileColor(pos);
-    const data = BOARD_TILES[pos];
+    const colorClass = getTileColor(pos, boardTiles);
+    const data = boardTiles[pos];
     
     return (
       <g key={pos}>
@@ -7,7 +7,10 @@ import React from 'react';
 import Leaderboard from './Leaderboard';
 import GameBoard from './GameBoard'; // <--- IMPORTACIÓN NUEVA
 
-const TeacherDashboard = ({ gameCode, playersData, onReset, connectedCount, globalActivity }) => {
+const TeacherDashboard = ({ gameCode, playersData, boardPlayers, board, stats, onReset, connectedCount, globalActivity }) => {
+  // Inversiones (LOBO_BLANCO) con cuántas veces se compraron / dejaron pasar
+  const inversiones = stats ? Object.values(stats.squares).filter(s => s.tipo === "LOBO_BLANCO") : [];
+
   return (
     <div className="w-full max-w-7xl mx-auto animate-fade-in p-4 font-mono">
       
@@ -47,7 +50,7 @@ const TeacherDashboard = ({ gameCode, playersData, onReset, connectedCount, glob
 
           {/* TABLERO SVG GIGANTE */}
           <div className="scale-125 transform origin-center">
-             <GameBoard players={playersData} />
+             <GameBoard players={boardPlayers || playersData} board={board} />
           </div>
 
           {/* BITÁCORA FLOTANTE SOBRE EL TABLERO */}
@@ -73,12 +76,24 @@ const TeacherDashboard = ({ gameCode, playersData, onReset, connectedCount, glob
               ⚠️ Control
             </h3>
             <div className="bg-slate-800/50 p-4 rounded-lg mb-4 text-xs text-slate-400 leading-relaxed border border-slate-700">
-              <p className="mb-2 text-white font-bold">Estado:</p>
-              <ul className="list-disc pl-4 space-y-1">
-                <li>WebSockets: Activos</li>
-                <li>Visualización: 3D SVG</li>
-                <li>Sonido: Habilitado</li>
-              </ul>
+              <p className="mb-2 text-white font-bold">📈 Clase:</p>
+              {stats ? (
+                <ul className="list-disc pl-4 space-y-1">
+                  <li>Endeudados: <span className="text-red-400 font-bold">{stats.summary.in_debt}</span> de {stats.summary.players}</li>
+                  <li>Deuda total: ${stats.summary.totals.toxic_debt}</li>
+                  <li>Ingreso pasivo total: ${stats.summary.totals.passive_income}</li>
+                  <li>Patrimonio promedio: ${stats.summary.averages.net_worth}</li>
+                  <li>Vueltas promedio: {stats.summary.averages.laps}</li>
+                </ul>
+              ) : <p>Esperando jugadas...</p>}
+              {inversiones.length > 0 && (
+                <div className="mt-3">
+                  <p className="mb-1 text-white font-bold">Inversiones (compras / pases):</p>
+                  {inversiones.map(s => (
+                    <p key={s.titulo} className="text-blue-400">{s.titulo}: {s.buys} / {s.passes}</p>
+                  ))}
+                </div>
+              )}
             </div>
           </div>
           
@@ -1,6 +1,7 @@
 // =============================================================================
 // 📄 ARCHIVO: src/utils/boardData.js
-// 📝 DESCRIPCIÓN: Mapeo visual del tablero. Debe coincidir con board.py
+// 📝 DESCRIPCIÓN: Mapeo visual del tablero clásico (board.py). Las salas con
+//                otro tablero lo reciben de GET /sessions/{code}/board.
 // =============================================================================
 
 export const TOTAL_CELLS = 30;
@@ -29,8 +30,13 @@ export const BOARD_TILES = {
     29: { type: 'BLANCO', label: 'Angel' }
 };
 
-export const getTileColor = (index) => {
-    const tile = BOARD_TILES[index];
+// Tablero del servidor -> mismo formato que BOARD_TILES
+export const tilesFromBoard = (board) => Object.fromEntries(board.eventos.map(e => [
+    e.casilla, { type: e.tipo === 'LOBO_NEGRO' ? 'NEGRO' : 'BLANCO', label: e.titulo }
+]));
+
+export const getTileColor = (index, tiles = BOARD_TILES) => {
+    const tile = tiles[index];
     if (!tile) return "stroke-slate-700"; // Neutro
     if (tile.type === 'NEGRO') return "stroke-lobo-neion-red";
     if (tile.type === 'BLANCO') return "stroke-lobo-neon-blue";
@@ -0,0 +1,136 @@
+# ==============================================================================
+# 📄 ARCHIVO: game_engine.py
+# 🔍 ROL: Reglas del turno (ROLL / BUY / PASS / CHAT) sin sockets ni Mongo
+# ==============================================================================
+# Cada función muta el Player en memoria y devuelve la lista de mensajes
+# (dicts con "type") que hay que difundir a la sala. El envío y la
+# persistencia son responsabilidad de quien llama (session_actor.py).
+# El tablero de la sala llega ya compilado (board.CompiledBoard): los eventos
+# y las entradas de event_queue se reutilizan ya codificadas (messages.cached).
+# La forma de cada mensaje está declarada en messages.py.
+
+from typing import List
+
+from board import CompiledBoard, DEFAULT_BOARD
+from messages import Chat, OutboundMessage, PlayerState, PlayerUpdate
+from money import fmt
+
+ASSET_MULTIPLIER = 10  # Valor de activos = ingreso pasivo x 10
+
+
+def parse_command(raw_msg: str) -> str:
+    """Traduce el texto recibido por el socket a ROLL / BUY / PASS / CHAT."""
+    if "lanzado los dados" in raw_msg or raw_msg == "ROLL": return "ROLL"
+    if raw_msg in ("BUY", "PASS"): return raw_msg
+    return "CHAT"
+
+
+def estado_jugador(jugador, meta) -> PlayerState:
+    """Campos públicos del jugador con el formato de UPDATE_PLAYER."""
+    return {
+        "player_id": str(jugador.id),
+        "nickname": jugador.nickname,
+        "new_position": jugador.position,
+        "new_cash": fmt(jugador.financials.cash),
+        "new_debt": fmt(jugador.financials.toxic_debt),
+        "new_net_worth": fmt(jugador.financials.net_worth),
+        "new_passive_income": fmt(jugador.financials.passive_income),
+        "game_target": fmt(meta)
+    }
+
+
+def paquete_actualizacion(jugador, cola_eventos, log_message, meta) -> PlayerUpdate:
+    """Recalcula el patrimonio final y arma UPDATE_PLAYER (o VICTORY si alcanzó la meta)."""
+    val_activos = jugador.financials.passive_income * ASSET_MULTIPLIER
+    jugador.calculate_net_worth(assets_value=val_activos)
+
+    tipo_msg = "VICTORY" if jugador.financials.net_worth >= meta else "UPDATE_PLAYER"
+    return {
+        "type": tipo_msg,
+        "payload": {
+            **estado_jugador(jugador, meta),
+            "event_queue": cola_eventos, # Aquí va la información para el historial
+        },
+        "message": log_message
+    }
+
+
+def resolver_roll(jugador, dado: int, salario, meta, tablero: CompiledBoard = DEFAULT_BOARD) -> List[OutboundMessage]:
+    pos = jugador.position + dado
+    msg_payday = ""
+    cola = []
+
+    # Payday Logic
+    if pos > tablero.size:
+        jugador.position = pos - tablero.size
+        jugador.laps_completed += 1
+        cash_pre = jugador.financials.cash
+        jugador.apply_payday_logic(salary_amount=salario)
+        diff = jugador.financials.cash - cash_pre
+        msg_payday = " 💰 ¡PAYDAY!"
+        cola.append({"tipo": "PAYDAY", "titulo": "¡PAYDAY!", "descripcion": "Salario + Rentas", "monto": f"+${fmt(diff)}"})
+    else:
+        jugador.position = pos
+
+    # Event Logic
+    casilla = tablero.casillas[jugador.position]
+    log_base = f"🎲 {jugador.nickname} sacó {dado} -> Casilla {jugador.position}" + msg_payday
+
+    # CASO A: INVERSIÓN (LOBO BLANCO) -> DETENER Y PREGUNTAR
+    if casilla.inversion:
+        mensajes = []
+        # Si hubo Payday, enviamos actualización visual primero para que se vea el dinero extra
+        if cola:
+            mensajes.append(paquete_actualizacion(jugador, cola, log_base, meta))
+
+        # Señal de Decisión (no se cobra aún)
+        mensajes.append({
+            "type": "DECISION_NEEDED",
+            "payload": {
+                "player_id": str(jugador.id),
+                "event_data": casilla.evento,
+                "dice_value": dado
+            },
+            "message": f"🤔 {jugador.nickname} está evaluando una inversión..."
+        })
+        return mensajes
+
+    # CASO B: GASTO AUTOMÁTICO (LOBO NEGRO)
+    if casilla.gasto:
+        jugador.financials.charge(casilla.costo)
+        cola.append(casilla.cola_gasto)
+
+    # CASO C: NEUTRO -> sin efecto
+
+    # Finalizar turno automático (Si no fue inversión)
+    return [paquete_actualizacion(jugador, cola, log_base, meta)]
+
+
+def resolver_buy(jugador, meta, tablero: CompiledBoard = DEFAULT_BOARD) -> List[OutboundMessage]:
+    casilla = tablero.casillas[jugador.position]
+    cola = []
+    log = ""
+
+    if casilla.inversion:
+        if jugador.financials.cash >= casilla.costo:
+            jugador.financials.cash -= casilla.costo
+            jugador.financials.passive_income += casilla.flujo
+            # Añadimos a la cola para que salga en el historial del profesor y alumnos
+            cola.append(casilla.cola_compra)
+            log = f"📈 {jugador.nickname} compró {casilla.titulo}"
+        else:
+            cola.append(casilla.cola_sin_fondos)
+            log = f"🚫 {jugador.nickname} no pudo comprar (Sin fondos)"
+
+    return [paquete_actualizacion(jugador, cola, log, meta)]
+
+
+def resolver_pass(jugador, meta, tablero: CompiledBoard = DEFAULT_BOARD) -> List[OutboundMessage]:
+    titulo = tablero.casillas[jugador.position].titulo
+    # Enviamos evento informativo al historial
+    log = f"⏭️ {jugador.nickname} dejó pasar {titulo}"
+    return [paquete_actualizacion(jugador, [], log, meta)]
+
+
+def mensaje_chat(jugador, texto: str) -> Chat:
+    return {"type": "CHAT", "message": f"💬 {jugador.nickname}: {texto}"}
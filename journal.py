@@ -0,0 +1,69 @@
+# ==============================================================================
+# 📄 ARCHIVO: journal.py
+# 🔍 ROL: Bitácora numerada de eventos por sala (reconexión rápida y repetición)
+# ==============================================================================
+# Cada evento difundido (UPDATE_PLAYER, DECISION_NEEDED, VICTORY, CHAT...) recibe
+# un "seq" creciente. Los últimos quedan en un buffer circular en memoria para
+# reenviar a quien se reconecta; todos se guardan en Mongo por lotes
+# (insert_many) junto con el volcado write-behind de session_state.
+
+import os
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from messages import encode
+from models import JournalEntry
+
+JOURNAL_RING_SIZE = int(os.getenv("JOURNAL_RING_SIZE", "512"))
+
+
+class SessionJournal:
+    def __init__(self, session_id: str, last_seq: int = 0, ring_size: int = JOURNAL_RING_SIZE):
+        self.session_id = session_id
+        self.last_seq = last_seq
+        self.ring: Deque[Tuple[int, str]] = deque(maxlen=ring_size)
+        self._pending: List[JournalEntry] = []
+
+    @classmethod
+    async def open(cls, session_id: str) -> "SessionJournal":
+        """Continúa la numeración desde el último evento guardado."""
+        ultimo = await JournalEntry.find(JournalEntry.session_id == session_id).sort(-JournalEntry.seq).first_or_none()
+        return cls(session_id, last_seq=ultimo.seq if ultimo else 0)
+
+    def append(self, msg: dict, player_id: Optional[str] = None, command: Optional[str] = None) -> str:
+        """Asigna seq al mensaje, lo guarda en el buffer y devuelve el frame JSON."""
+        # `command` + `player_id` marcan el primer frame de cada comando (para repetirlo con replay.py)
+        self.last_seq += 1
+        msg["seq"] = self.last_seq
+        frame = encode(msg)
+        self.ring.append((self.last_seq, frame))
+        self._pending.append(JournalEntry(session_id=self.session_id, seq=self.last_seq, type=msg.get("type", ""), frame=frame,
+                                          player_id=player_id, command=command))
+        return frame
+
+    def since(self, last_seq: int, upto: Optional[int] = None) -> Optional[List[str]]:
+        """Frames en (last_seq, upto], o None si ya salieron del buffer (hace falta snapshot)."""
+        upto = self.last_seq if upto is None else upto
+        if last_seq >= upto: return []
+        if not self.ring or last_seq < self.ring[0][0] - 1: return None
+        return [frame for seq, frame in self.ring if last_seq < seq <= upto]
+
+    def recent(self, limit: int, upto: Optional[int] = None) -> List[str]:
+        upto = self.last_seq if upto is None else upto
+        return [frame for seq, frame in list(self.ring) if seq <= upto][-limit:]
+
+    def clear(self):
+        """Vacía buffer y pendientes (reinicio de sala). La numeración continúa."""
+        self.ring.clear()
+        self._pending = []
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def take_pending(self) -> List[JournalEntry]:
+        pendientes, self._pending = self._pending, []
+        return pendientes
+
+    def restore_pending(self, entradas: List[JournalEntry]):
+        self._pending[:0] = entradas
@@ -0,0 +1,127 @@
+# ==============================================================================
+# 📄 ARCHIVO: leaderboard.py
+# 🔍 ROL: Ranking por sala mantenido en memoria (sin consultas sort a Mongo)
+# ==============================================================================
+# Las claves de orden viven en un SortedList (sortedcontainers): reubicar a un
+# jugador cuando cambia su patrimonio cuesta O(log n). Sin sortedcontainers se
+# usa una lista con bisect: la búsqueda es O(log n) pero insertar/borrar mueve
+# memoria, O(n) por cambio (irrelevante con decenas de alumnos, no con miles).
+# Las filas se serializan una sola vez por cambio y cada destinatario solo
+# recibe su marca "is_me".
+
+from bisect import bisect_left, insort
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from messages import encode
+from money import fmt
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:  # Dependencia opcional: sin ella se usa _SortedKeys (O(n) por cambio)
+    SortedList = None
+
+LEADERBOARD_LIMIT = 30
+
+# Clave de orden: (-patrimonio en centavos, orden de llegada, id) -> mayor patrimonio primero
+SortKey = Tuple[int, int, str]
+
+
+class _SortedKeys(list):
+    """Respaldo de SortedList con la misma interfaz: lista ordenada con bisect."""
+
+    def add(self, key: SortKey):
+        insort(self, key)
+
+    def remove(self, key: SortKey):
+        del self[bisect_left(self, key)]
+
+
+class Leaderboard:
+    def __init__(self, limit: int = LEADERBOARD_LIMIT):
+        self.limit = limit
+        self._keys = SortedList() if SortedList is not None else _SortedKeys()
+        self._key_by_id: Dict[str, SortKey] = {}
+        self._arrival = count()
+        # player_id -> (fila is_me=false, fila is_me=true) ya serializadas
+        self._rows: Dict[str, Tuple[str, str]] = {}
+        self._row_data: Dict[str, dict] = {}
+        self._top_ids: Optional[List[str]] = None   # caché del top (se invalida con cada cambio)
+        self._last_sent: Dict[str, tuple] = {}      # estado del último frame delta
+
+    # --- MANTENIMIENTO ---
+    def rebuild(self, jugadores: Iterable):
+        """Reconstrucción completa (solo en cold start, al cargar la sala desde Mongo)."""
+        self._keys.clear(); self._key_by_id.clear(); self._rows.clear(); self._row_data.clear()
+        self._last_sent.clear()
+        for jugador in jugadores:
+            self.update(jugador)
+
+    def update(self, jugador) -> bool:
+        """Reubica al jugador si cambió su patrimonio; refresca su fila si cambió algo visible."""
+        pid = str(jugador.id)
+        data = {"id": pid, "nickname": jugador.nickname, "net_worth": fmt(jugador.financials.net_worth), "position": jugador.position}
+        if self._row_data.get(pid) == data:
+            return False
+
+        old_key = self._key_by_id.get(pid)
+        net_worth = jugador.financials.net_worth
+        if old_key is None or old_key[0] != -net_worth:
+            arrival = old_key[1] if old_key else next(self._arrival)
+            if old_key is not None:
+                self._keys.remove(old_key)
+            new_key = (-net_worth, arrival, pid)
+            self._keys.add(new_key)
+            self._key_by_id[pid] = new_key
+
+        self._row_data[pid] = data
+        self._rows[pid] = (encode({**data, "is_me": False}), encode({**data, "is_me": True}))
+        self._top_ids = None
+        return True
+
+    def remove(self, player_id: str):
+        key = self._key_by_id.pop(player_id, None)
+        if key is None: return
+        self._keys.remove(key)
+        self._rows.pop(player_id, None)
+        self._row_data.pop(player_id, None)
+        self._top_ids = None
+
+    # --- LECTURA ---
+    def top_ids(self) -> List[str]:
+        if self._top_ids is None:
+            self._top_ids = [k[2] for k in self._keys[:self.limit]]
+        return self._top_ids
+
+    def rows(self) -> List[dict]:
+        return [self._row_data[pid] for pid in self.top_ids()]
+
+    def snapshot(self) -> List[Tuple[str, str, str]]:
+        """Filas del top ya serializadas: [(player_id, fila, fila_is_me)] (apto para viajar por el bus)."""
+        return [(pid, *self._rows[pid]) for pid in self.top_ids()]
+
+    def frame_for(self, player_id: Optional[str]) -> str:
+        """Frame LEADERBOARD completo con is_me=true solo en la fila del destinatario."""
+        return render_frame(self.snapshot(), player_id)
+
+    def delta_frame(self) -> Optional[str]:
+        """Frame LEADERBOARD_DELTA con los cambios de rango desde el último frame (None si no hay)."""
+        actual = {}
+        cambios = []
+        for rank, pid in enumerate(self.top_ids(), start=1):
+            data = self._row_data[pid]
+            estado = (rank, data["nickname"], data["net_worth"], data["position"])
+            actual[pid] = estado
+            if self._last_sent.get(pid) != estado:
+                cambios.append({**data, "rank": rank})
+        eliminados = [pid for pid in self._last_sent if pid not in actual]
+        self._last_sent = actual
+
+        if not cambios and not eliminados: return None
+        return encode({"type": "LEADERBOARD_DELTA", "payload": {"changed": cambios, "removed": eliminados}})
+
+
+def render_frame(snapshot: Iterable[Tuple[str, str, str]], player_id: Optional[str]) -> str:
+    """Arma el frame LEADERBOARD de un destinatario a partir de filas ya serializadas."""
+    filas = [fila_me if pid == player_id else fila for pid, fila, fila_me in snapshot]
+    return '{"type":"LEADERBOARD","payload":[' + ",".join(filas) + "]}"
@@ -0,0 +1,140 @@
+# ==============================================================================
+# 📄 ARCHIVO: lifecycle.py
+# 🔍 ROL: Ciclo de vida de las salas: inactividad, archivo y limpieza
+# ==============================================================================
+# Un barrido cada LIFECYCLE_INTERVAL segundos (en cada proceso):
+#   1. Memoria: salas sin comandos durante SESSION_IDLE_SECONDS -> se cierran
+#      sus sockets locales (1001) y se vuelca y suelta su estado vivo, aunque
+#      algún LEAVE se haya perdido.
+#   2. is_active=False para las salas sin jugadas desde SESSION_INACTIVE_AFTER.
+#   3. Las salas inactivas desde SESSION_ARCHIVE_AFTER pasan a "session_archive"
+#      (un documento compacto por sala) y se borran sus jugadores, bitácora y
+#      sesión, en lotes de ARCHIVE_BATCH con operaciones masivas.
+# Los índices TTL (models.py) caducan solos la bitácora y el archivo antiguos.
+
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from beanie import PydanticObjectId
+from beanie.operators import In
+from pymongo.errors import BulkWriteError
+
+from connection_manager import manager, CLOSE_GOING_AWAY
+from models import ArchivedPlayer, GameSession, JournalEntry, Player, SessionArchive
+from session_actor import evict_session
+from session_cache import session_codes
+from session_state import DUPLICATE_KEY, state_store
+
+LIFECYCLE_INTERVAL = float(os.getenv("LIFECYCLE_INTERVAL", "60"))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))       # 30 min
+SESSION_INACTIVE_AFTER = float(os.getenv("SESSION_INACTIVE_AFTER", "7200"))   # 2 h
+SESSION_ARCHIVE_AFTER = float(os.getenv("SESSION_ARCHIVE_AFTER", "86400"))    # 24 h
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH", "100"))
+
+logger = logging.getLogger(__name__)
+
+
+def _sin_actividad_desde(corte: datetime) -> dict:
+    # Las salas anteriores a last_activity_at se juzgan por su fecha de creación
+    return {"$or": [
+        {"last_activity_at": {"$lt": corte}},
+        {"last_activity_at": {"$exists": False}, "created_at": {"$lt": corte}},
+    ]}
+
+
+class LifecycleManager:
+    def __init__(self, interval: float = LIFECYCLE_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.exception(f"--- 🔴 LIFECYCLE: Error en el barrido ({e}) ---")
+
+    async def sweep(self) -> dict:
+        resultado = {
+            "released": await self.release_idle(),
+            "deactivated": await self.mark_inactive(),
+            "archived": await self.archive_finished(),
+        }
+        if any(resultado.values()):
+            logger.info(f"--- ♻️ LIFECYCLE: {resultado} ---")
+        return resultado
+
+    # --- 1. MEMORIA ---
+    async def release_idle(self) -> int:
+        for session_id in manager.idle_sessions(SESSION_IDLE_SECONDS):
+            manager.close_session(session_id, CLOSE_GOING_AWAY)
+
+        limite = time.monotonic() - SESSION_IDLE_SECONDS
+        inactivas = [sid for sid, live in state_store.sessions.items() if live.last_activity < limite]
+        for session_id in inactivas:
+            await evict_session(session_id)
+        return len(inactivas)
+
+    # --- 2. is_active ---
+    async def mark_inactive(self) -> int:
+        corte = datetime.now() - timedelta(seconds=SESSION_INACTIVE_AFTER)
+        # Las que viven en este proceso aún pueden tener jugadas sin volcar
+        vivas = [PydanticObjectId(sid) for sid in state_store.sessions]
+        filtro = {"is_active": True, "_id": {"$nin": vivas}, **_sin_actividad_desde(corte)}
+        resultado = await GameSession.find(filtro).update({"$set": {"is_active": False}})
+        return resultado.modified_count if resultado else 0
+
+    # --- 3. ARCHIVO ---
+    async def archive_finished(self) -> int:
+        corte = datetime.now() - timedelta(seconds=SESSION_ARCHIVE_AFTER)
+        sesiones = await GameSession.find({"is_active": False, **_sin_actividad_desde(corte)}).limit(ARCHIVE_BATCH).to_list()
+        sesiones = [s for s in sesiones if str(s.id) not in state_store.sessions]
+        if not sesiones: return 0
+        ids = [str(s.id) for s in sesiones]
+
+        por_sala = defaultdict(list)
+        for jugador in await Player.find(In(Player.session_id, ids)).to_list():
+            f = jugador.financials
+            por_sala[jugador.session_id].append(ArchivedPlayer(
+                nickname=jugador.nickname, cash=f.cash, net_worth=f.net_worth, toxic_debt=f.toxic_debt,
+                passive_income=f.passive_income, laps_completed=jugador.laps_completed))
+
+        archivos = [SessionArchive(
+            session_id=str(s.id), code=s.code, created_at=s.created_at, last_activity_at=s.last_activity_at,
+            salary=s.salary, winning_score=s.winning_score, board_id=s.board_id, square_stats=s.square_stats,
+            players=sorted(por_sala[str(s.id)], key=lambda p: -p.net_worth),
+        ) for s in sesiones]
+        try:
+            await SessionArchive.insert_many(archivos, ordered=False)
+        except BulkWriteError as e:
+            # Otro proceso archivó algunas en el mismo barrido: las repetidas se ignoran
+            if any(err.get("code") != DUPLICATE_KEY for err in e.details.get("writeErrors", [])): raise
+
+        await Player.find(In(Player.session_id, ids)).delete()
+        await JournalEntry.find(In(JournalEntry.session_id, ids)).delete()
+        await GameSession.find(In(GameSession.id, [s.id for s in sesiones])).delete()
+        for s in sesiones:
+            session_codes.invalidate(s.code)
+        return len(sesiones)
+
+
+lifecycle = LifecycleManager()
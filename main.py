@@ -5,240 +5,328 @@
 
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response
 from contextlib import asynccontextmanager
 from decimal import Decimal 
-import random
-import json
+import logging
+import os
+from typing import List
+
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from database import init_db
-from models import Player, GameSession 
-from schemas import PlayerCreate, PlayerRead, SessionCreate, SessionRead
-from connection_manager import manager 
-from board import obtener_evento, CASILLAS_TOTALES
+from messages import encode
+from money import to_cents
+from models import Player, GameSession, JournalEntry
+from schemas import PlayerCreate, PlayerRead, SessionCreate, SessionRead, RosterCreate, RosterRead, BoardCreate, BoardRead
+from connection_manager import manager, CLOSE_POLICY_VIOLATION
+from session_state import state_store, DUPLICATE_KEY
+from session_cache import session_codes
+from board import BUILTIN_BOARDS, DEFAULT_BOARD_ID, boards
+from session_actor import lose_session, route_command, stop_all
+from lifecycle import lifecycle
+from replay import exportar
+from spectators import spectators
+from broadcast_bus import bus
+from protocol import negotiate
+from metrics import REGISTRY, CONTENT_TYPE, WS_CONNECTIONS, WS_ERRORS, profiler
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("lobos")
+
+async def entregar_envelope(session_id: str, envelope: dict):
+    # Resultado de un tick: a los jugadores conectados aquí y a la proyección de espectadores
+    if envelope.get("closed"):
+        # La sala se borró: fuera todos sus sockets de este proceso
+        manager.close_session(session_id, CLOSE_POLICY_VIOLATION)
+        spectators.close_session(session_id, CLOSE_POLICY_VIOLATION)
+        session_codes.forget(session_id)
+        return
+    await manager.deliver_envelope(session_id, envelope)
+    spectators.feed(session_id, envelope)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
-    print("--- 🚀 MOTOR LISTO (v4.0 Interactive) ---")
+    await state_store.start()
+    await bus.start(on_envelope=entregar_envelope, on_command=route_command, on_lost=lose_session)
+    await lifecycle.start()
+    logger.info("--- 🚀 MOTOR LISTO (v4.0 Interactive) ---")
     yield
-    print("--- 🛑 APAGANDO ---")
+    await lifecycle.stop()
+    await stop_all()
+    await spectators.close()
+    await bus.close()
+    await state_store.shutdown()
+    logger.info("--- 🛑 APAGANDO ---")
 
 app = FastAPI(title="La Senda de los Lobos", version="4.0.0", lifespan=lifespan)
 
 origins = ["*"] 
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
-# --- RUTAS HTTP (Sin cambios) ---
+# --- RUTAS HTTP ---
 @app.get("/")
 def bienvenida(): return {"estado": "En Línea 🟢"}
 
 @app.post("/sessions", response_model=SessionRead, status_code=201)
 async def crear_sesion(sesion_entrada: SessionCreate):
-    existente = await GameSession.find_one(GameSession.code == sesion_entrada.code)
-    if existente: raise HTTPException(status_code=400, detail="¡Código en uso!")
-    
     # Valores default seguros
     s = sesion_entrada.salary if sesion_entrada.salary is not None else Decimal("2500.00")
     w = sesion_entrada.winning_score if sesion_entrada.winning_score is not None else Decimal("1000000.00")
-    
-    nueva_sesion = GameSession(code=sesion_entrada.code, salary=s, winning_score=w)
-    await nueva_sesion.create()
+    tablero, tablero_nuevo = await _tablero_para(sesion_entrada)
+
+    nueva_sesion = GameSession(code=sesion_entrada.code, salary=to_cents(s), winning_score=to_cents(w), board_id=tablero.board_id)
+    if sesion_entrada.seed is not None: nueva_sesion.seed = sesion_entrada.seed
+    try:
+        await nueva_sesion.create()
+    except DuplicateKeyError:
+        # El índice único de "code" resuelve la carrera entre dos profesores.
+        # El tablero subido con esta petición no debe quedar huérfano
+        if tablero_nuevo: await boards.discard(tablero.board_id)
+        raise HTTPException(status_code=400, detail="¡Código en uso!")
+    session_codes.put(nueva_sesion)
     return nueva_sesion
 
-@app.post("/players", response_model=PlayerRead, status_code=201)
-async def registrar_jugador(jugador_entrada: PlayerCreate):
-    sesion = await GameSession.find_one(GameSession.code == jugador_entrada.game_code)
+async def _tablero_para(sesion_entrada: SessionCreate):
+    # Un tablero subido junto con la sala, uno ya existente por id, o el clásico -> (tablero, ¿guardado ahora?)
+    if sesion_entrada.board:
+        return await _registrar_tablero(sesion_entrada.board)
+    tablero = await boards.get(sesion_entrada.board_id or DEFAULT_BOARD_ID)
+    if not tablero: raise HTTPException(status_code=404, detail="Tablero no encontrado")
+    return tablero, False
+
+async def _registrar_tablero(entrada: BoardCreate):
+    try:
+        return await boards.register(entrada)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/boards", response_model=List[BoardRead], tags=["Tableros"])
+def tableros_de_fabrica():
+    """Tableros incluidos (uno por nivel). Los subidos se consultan por su id."""
+    return [t.summary() for t in BUILTIN_BOARDS.values()]
+
+@app.post("/boards", response_model=BoardRead, status_code=201, tags=["Tableros"])
+async def subir_tablero(entrada: BoardCreate):
+    """Valida y guarda un tablero; su board_id sirve para crear salas con él."""
+    return (await _registrar_tablero(entrada))[0].summary()
+
+@app.get("/boards/{board_id}", tags=["Tableros"])
+async def ver_tablero(board_id: str):
+    tablero = await boards.get(board_id)
+    if not tablero: raise HTTPException(status_code=404, detail="Tablero no encontrado")
+    return Response(tablero.json, media_type="application/json")
+
+async def _sesion_por_codigo(code: str) -> GameSession:
+    sesion = await session_codes.get(code)
     if not sesion: raise HTTPException(status_code=404, detail="Código de sala no válido")
+    return sesion
 
-    existente = await Player.find_one(Player.nickname == jugador_entrada.nickname, Player.session_id == str(sesion.id))
-    if existente: raise HTTPException(status_code=400, detail="Nombre ocupado en esta sala.")
+@app.post("/players", response_model=PlayerRead, status_code=201)
+async def registrar_jugador(jugador_entrada: PlayerCreate):
+    sesion = await _sesion_por_codigo(jugador_entrada.game_code)
 
+    # Un solo insert: el índice único (session_id, nickname) rechaza los nombres repetidos
     nuevo_jugador = Player(nickname=jugador_entrada.nickname, session_id=str(sesion.id))
-    await nuevo_jugador.create()
+    try:
+        await nuevo_jugador.create()
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Nombre ocupado en esta sala.")
+    state_store.add_player(nuevo_jugador)
     return nuevo_jugador
 
-@app.delete("/reset_game", tags=["Sistema"])
-async def reiniciar_juego():
-    await Player.delete_all()
-    await GameSession.delete_all()
-    return {"mensaje": "💥 Base de datos purgada"}
+@app.post("/sessions/{code}/players", response_model=RosterRead, status_code=201)
+async def registrar_lista(code: str, lista: RosterCreate):
+    """El profesor precarga toda la clase en un solo insert_many."""
+    sesion = await _sesion_por_codigo(code)
+
+    unicos, rechazados = {}, []
+    for nick in lista.nicknames:
+        if nick in unicos: rechazados.append(nick)
+        else: unicos[nick] = None
+    # Ids generados aquí para saber cuáles quedaron insertados si algunos fallan
+    jugadores = [Player(id=PydanticObjectId(), nickname=nick, session_id=str(sesion.id)) for nick in unicos]
+
+    fallidos = set()
+    try:
+        await Player.insert_many(jugadores, ordered=False)
+    except BulkWriteError as e:
+        errores = e.details.get("writeErrors", [])
+        if any(err.get("code") != DUPLICATE_KEY for err in errores): raise
+        fallidos = {err["index"] for err in errores}
+
+    creados = [j for i, j in enumerate(jugadores) if i not in fallidos]
+    for jugador in creados:
+        state_store.add_player(jugador)
+    return {"created": creados, "rejected": rechazados + [jugadores[i].nickname for i in sorted(fallidos)]}
+
+@app.get("/sessions/{code}/board")
+async def tablero_sesion(code: str):
+    """Tablero de la sala (para dibujarlo en el cliente), ya serializado."""
+    tablero = await boards.for_session((await _sesion_por_codigo(code)).board_id)
+    return Response(tablero.json, media_type="application/json")
+
+@app.get("/sessions/{code}/replay")
+async def repeticion_sesion(code: str):
+    """Semilla y comandos de la partida para `python replay.py` (solo con la sala ya inactiva: la semilla predice los dados)."""
+    sesion = await _sesion_por_codigo(code)
+    session_id = str(sesion.id)
+    # La caché de códigos puede tener un is_active viejo: se consulta el documento actual
+    actual = await GameSession.get(sesion.id)
+    if not actual: raise HTTPException(status_code=404, detail="Código de sala no válido")
+    if actual.is_active or session_id in state_store.sessions:
+        raise HTTPException(status_code=409, detail="La partida sigue en curso: la repetición se publica cuando la sala queda inactiva")
+    return await exportar(session_id)
+
+@app.get("/sessions/{code}/journal")
+async def bitacora_sesion(code: str, after: int = 0, limit: int = 500):
+    """Eventos de la sala en orden (para que el profesor repita una partida)."""
+    sesion = await _sesion_por_codigo(code)
+    # Si la sala está viva en este proceso, primero se vuelca lo pendiente
+    await state_store.flush(str(sesion.id))
+    entradas = await JournalEntry.find(JournalEntry.session_id == str(sesion.id), JournalEntry.seq > after).sort(JournalEntry.seq).limit(min(limit, 5000)).to_list()
+    # Los frames ya están codificados: se devuelven tal cual, sin parsearlos otra vez
+    return Response("[" + ",".join(e.frame for e in entradas) + "]", media_type="application/json")
+
+@app.get("/sessions/{code}/stats")
+async def estadisticas_sesion(code: str):
+    """Estadísticas de la clase (deuda, ingreso pasivo, vueltas, caídas/compras por casilla)."""
+    session_id = str((await _sesion_por_codigo(code)).id)
+    # Ya serializadas: las del dueño de la sala, las de la proyección de espectadores o la caché
+    texto = spectators.stats_json(session_id) if session_id not in state_store.sessions else None
+    return Response(texto or await state_store.stats_json(session_id), media_type="application/json")
+
+@app.get("/monitor/connections", tags=["Sistema"])
+def monitor_conexiones():
+    # Profundidad de la cola de salida por conexión (para detectar clientes lentos)
+    return {**manager.stats(), "spectators": spectators.stats(), "queue_depths": {sid: manager.queue_depths(sid) for sid in manager.active_connections}}
+
+@app.get("/metrics", tags=["Sistema"])
+def metricas():
+    # Formato de texto de Prometheus
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+async def _id_sesion(code: str) -> str:
+    return str((await _sesion_por_codigo(code)).id)
+
+@app.post("/monitor/profile/{code}", tags=["Sistema"])
+async def iniciar_perfil(code: str):
+    """Activa el perfilador por muestreo para el actor de una sala."""
+    profiler.enable(await _id_sesion(code))
+    return {"profiling": True}
+
+@app.get("/monitor/profile/{code}", tags=["Sistema"])
+async def ver_perfil(code: str):
+    # Pilas colapsadas ("a;b;c N"), aptas para flamegraph.pl / speedscope
+    return PlainTextResponse(profiler.report(await _id_sesion(code)))
+
+@app.delete("/monitor/profile/{code}", tags=["Sistema"])
+async def detener_perfil(code: str):
+    return PlainTextResponse(profiler.disable(await _id_sesion(code)))
+
+@app.post("/monitor/lifecycle", tags=["Sistema"])
+async def barrido_ciclo_de_vida():
+    """Ejecuta ahora el barrido de salas inactivas (normalmente cada LIFECYCLE_INTERVAL s)."""
+    return await lifecycle.sweep()
+
+@app.post("/sessions/{code}/reset", tags=["Sesiones"])
+async def reiniciar_sala(code: str):
+    """Nueva partida en la misma sala: jugadores a la salida con cero, sin tocar otras salas."""
+    await bus.send_command(await _id_sesion(code), "", "RESET")
+    return {"mensaje": "🔄 Sala reiniciada"}
+
+@app.delete("/sessions/{code}", tags=["Sesiones"])
+async def borrar_sala(code: str):
+    """Borra la sala con sus jugadores y bitácora; sus sockets se cierran en todos los procesos."""
+    session_id = await _id_sesion(code)
+    session_codes.invalidate(code)
+    await bus.send_command(session_id, "", "DELETE")
+    return {"mensaje": "💥 Sala eliminada"}
 
 # --- WEBSOCKET ENGINE ---
 @app.websocket("/ws/{player_id}")
 async def websocket_endpoint(websocket: WebSocket, player_id: str):
     await websocket.accept()
+    WS_CONNECTIONS.inc()
     session_id = None 
+    unido = False
     
     try:
-        jugador_inicial = await Player.get(player_id)
-        if not jugador_inicial:
+        # Solo validamos al jugador: el estado vivo lo carga el proceso dueño de la sala
+        session_id = await state_store.session_of(player_id)
+        if not session_id:
             await websocket.close(code=1008)
             return
-        
-        session_id = jugador_inicial.session_id
-        
-        # Cargar configuración de la sala
-        sesion_actual = await GameSession.get(session_id)
-        SALARIO = sesion_actual.salary if sesion_actual else Decimal("2500.00")
-        META = sesion_actual.winning_score if sesion_actual else Decimal("1000000.00")
-
-        await manager.connect(websocket, session_id)
-        
-        # Función para enviar Ranking y Tablero Visual
-        async def broadcast_ranking():
-            top = await Player.find(Player.session_id == session_id).sort("-financials.net_worth").limit(30).to_list()
-            data = [{"id": str(p.id), "nickname": p.nickname, "net_worth": str(p.financials.net_worth), "position": p.position, "is_me": str(p.id) == player_id} for p in top]
-            await manager.broadcast(json.dumps({"type": "LEADERBOARD", "payload": data}), session_id)
-
-        # Función para enviar Estado del Jugador (Actualización)
-        async def broadcast_player_update(jugador, cola_eventos, log_message):
-            # Recalcular patrimonio final
-            val_activos = jugador.financials.passive_income * Decimal("10")
-            jugador.calculate_net_worth(assets_value=val_activos)
-            
-            # Guardado Forzoso
-            await jugador.set({
-                Player.position: jugador.position,
-                Player.laps_completed: jugador.laps_completed,
-                Player.financials: jugador.financials
-            })
-
-            # Check Victoria
-            tipo_msg = "VICTORY" if jugador.financials.net_worth >= META else "UPDATE_PLAYER"
-            
-            pkg = {
-                "type": tipo_msg,
-                "payload": {
-                    "player_id": str(jugador.id),
-                    "nickname": jugador.nickname,
-                    "new_position": jugador.position,
-                    "new_cash": str(jugador.financials.cash),
-                    "new_debt": str(jugador.financials.toxic_debt),
-                    "new_net_worth": str(jugador.financials.net_worth),
-                    "new_passive_income": str(jugador.financials.passive_income),
-                    "event_queue": cola_eventos, # Aquí va la información para el historial
-                    "game_target": str(META)
-                },
-                "message": log_message
-            }
-            await manager.broadcast(json.dumps(pkg), session_id)
-            await broadcast_ranking()
-
-        # Estado inicial al conectar
-        await broadcast_ranking()
+
+        # ?leaderboard=delta -> el cliente recibe solo los cambios de rango tras el primer frame
+        modo_ranking = "delta" if websocket.query_params.get("leaderboard") == "delta" else "full"
+        # ?proto=bin1 -> frames MessagePack con deltas (si el servidor lo soporta); JSON por defecto
+        proto = negotiate(websocket.query_params.get("proto"))
+        conexion = await manager.connect(websocket, session_id, player_id=player_id, leaderboard_mode=modo_ranking, proto=proto)
+        await bus.subscribe(session_id)
+
+        # Toda la lógica del juego vive en el actor de la sala (quizá en otro worker):
+        # aquí solo se reenvían comandos por el bus
+        # ?last_seq=N -> reconexión: el dueño reenvía solo los eventos perdidos (o un snapshot)
+        last_seq = websocket.query_params.get("last_seq")
+        reanudar = encode({"last_seq": int(last_seq), "conn": conexion.token}) if last_seq and last_seq.isdigit() else ""
+        await bus.send_command(session_id, player_id, "JOIN", reanudar)
+        unido = True
 
         # --- BUCLE DE MENSAJES ---
         while True:
             raw_msg = await websocket.receive_text()
-            
-            # Recargar jugador para asegurar estado fresco
-            jugador_actual = await Player.get(player_id)
-            if not jugador_actual: break
-
-            # 1. MOVIMIENTO (ROLL)
-            if "lanzado los dados" in raw_msg or raw_msg == "ROLL":
-                dado = random.randint(1, 6)
-                pos = jugador_actual.position + dado
-                msg_payday = ""
-                cola = []
-                
-                # Payday Logic
-                if pos > CASILLAS_TOTALES:
-                    jugador_actual.position = pos - CASILLAS_TOTALES
-                    jugador_actual.laps_completed += 1
-                    cash_pre = jugador_actual.financials.cash
-                    jugador_actual.apply_payday_logic(salary_amount=SALARIO)
-                    diff = jugador_actual.financials.cash - cash_pre
-                    msg_payday = " 💰 ¡PAYDAY!"
-                    cola.append({"tipo": "PAYDAY", "titulo": "¡PAYDAY!", "descripcion": "Salario + Rentas", "monto": f"+${diff}"})
-                else:
-                    jugador_actual.position = pos
-                
-                # Event Logic
-                evt = obtener_evento(jugador_actual.position)
-                log_base = f"🎲 {jugador_actual.nickname} sacó {dado} -> Casilla {jugador_actual.position}" + msg_payday
-
-                if evt:
-                    # CASO A: INVERSIÓN (LOBO BLANCO) -> DETENER Y PREGUNTAR
-                    if evt["tipo"] == "LOBO_BLANCO":
-                        # Guardamos posición y posibles cambios de Payday, pero NO cobramos aún
-                        await jugador_actual.set({
-                            Player.position: jugador_actual.position,
-                            Player.laps_completed: jugador_actual.laps_completed,
-                            Player.financials: jugador_actual.financials
-                        })
-                        
-                        # Si hubo Payday, enviamos actualización visual primero para que se vea el dinero extra
-                        if cola:
-                            await broadcast_player_update(jugador_actual, cola, log_base)
-                        
-                        # Enviamos señal de Decisión
-                        pkg_decision = {
-                            "type": "DECISION_NEEDED",
-                            "payload": {
-                                "player_id": str(jugador_actual.id),
-                                "event_data": evt,
-                                "dice_value": dado
-                            },
-                            "message": f"🤔 {jugador_actual.nickname} está evaluando una inversión..."
-                        }
-                        await manager.broadcast(json.dumps(pkg_decision), session_id)
-                        continue # INTERRUMPIR EL FLUJO AQUÍ
-
-                    # CASO B: GASTO AUTOMÁTICO (LOBO NEGRO)
-                    elif evt["tipo"] == "LOBO_NEGRO":
-                        costo = Decimal(evt["costo"])
-                        if jugador_actual.financials.cash >= costo:
-                            jugador_actual.financials.cash -= costo
-                        else:
-                            rem = costo - jugador_actual.financials.cash
-                            jugador_actual.financials.cash = Decimal(0)
-                            jugador_actual.financials.toxic_debt += rem
-                        cola.append({"tipo": "LOBO_NEGRO", "titulo": evt["titulo"], "descripcion": evt["descripcion"], "monto": f"-${costo}"})
-
-                    # CASO C: NEUTRO
-                    elif evt["tipo"] == "NEUTRO":
-                        # Opcional: Agregar evento neutro a la cola si se desea mostrar tarjeta gris
-                        pass
-
-                # Finalizar turno automático (Si no fue inversión)
-                await broadcast_player_update(jugador_actual, cola, log_base)
-
-            # 2. COMPRA CONFIRMADA (BUY)
-            elif raw_msg == "BUY":
-                evt = obtener_evento(jugador_actual.position)
-                cola = []
-                log = ""
-                
-                if evt and evt["tipo"] == "LOBO_BLANCO":
-                    costo = Decimal(evt["costo"])
-                    flujo = Decimal(evt["flujo_extra"])
-                    
-                    if jugador_actual.financials.cash >= costo:
-                        jugador_actual.financials.cash -= costo
-                        jugador_actual.financials.passive_income += flujo
-                        # Añadimos a la cola para que salga en el historial del profesor y alumnos
-                        cola.append({"tipo": "LOBO_BLANCO", "titulo": evt["titulo"], "descripcion": "Inversión Exitosa", "monto": f"-${costo}"})
-                        log = f"📈 {jugador_actual.nickname} compró {evt['titulo']}"
-                    else:
-                        cola.append({"tipo": "LOBO_BLANCO", "titulo": evt["titulo"], "descripcion": "Fondos insuficientes", "monto": None})
-                        log = f"🚫 {jugador_actual.nickname} no pudo comprar (Sin fondos)"
-                
-                await broadcast_player_update(jugador_actual, cola, log)
-
-            # 3. PASAR TURNO (PASS)
-            elif raw_msg == "PASS":
-                evt = obtener_evento(jugador_actual.position)
-                titulo = evt["titulo"] if evt else "Oportunidad"
-                # Enviamos evento informativo al historial
-                log = f"⏭️ {jugador_actual.nickname} dejó pasar {titulo}"
-                await broadcast_player_update(jugador_actual, [], log)
-
-            # 4. CHAT
-            else:
-                await manager.broadcast(json.dumps({"type": "CHAT", "message": f"💬 {jugador_actual.nickname}: {raw_msg}"}), session_id)
+            # Confirmación del protocolo binario: no llega al juego
+            if conexion.codec and raw_msg.startswith("ACK "):
+                if raw_msg[4:].isdigit(): conexion.codec.ack(int(raw_msg[4:]))
+                continue
+            await bus.send_command(session_id, player_id, "MSG", raw_msg)
 
     except WebSocketDisconnect:
         if session_id: manager.disconnect(websocket, session_id)
     except Exception as e:
-        if session_id: manager.disconnect(websocket, session_id)
\ No newline at end of file
+        WS_ERRORS.inc(error=type(e).__name__)
+        logger.exception(f"--- 🔴 WS {player_id}: Error inesperado ({e}) ---")
+        if session_id: manager.disconnect(websocket, session_id)
+
+    # El dueño libera la sala cuando no queda ningún socket en ningún proceso
+    if session_id and session_id not in manager.active_connections and not spectators.watching(session_id):
+        await bus.unsubscribe(session_id)
+    if unido:
+        await bus.send_command(session_id, player_id, "LEAVE")
+
+@app.websocket("/ws/watch/{session_code}")
+async def websocket_espectador(websocket: WebSocket, session_code: str):
+    """Solo lectura (proyector, padres, otras clases): snapshots compartidos cada WATCH_INTERVAL_MS."""
+    await websocket.accept()
+    WS_CONNECTIONS.inc()
+    session_id = None
+
+    try:
+        sesion = await session_codes.get(session_code)
+        if not sesion:
+            await websocket.close(code=1008)
+            return
+        session_id = str(sesion.id)
+
+        # Sin documento Player ni presencia en el actor: solo se escuchan los envelopes de la sala
+        nueva = spectators.add(websocket, session_id)
+        await bus.subscribe(session_id)
+        if nueva: await bus.send_command(session_id, "", "WATCH")
+
+        # Lo que envíe el espectador se ignora; recibir solo sirve para detectar la desconexión
+        while True:
+            await websocket.receive_text()
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        WS_ERRORS.inc(error=type(e).__name__)
+        logger.exception(f"--- 🔴 WS espectador {session_code}: Error inesperado ({e}) ---")
+
+    if session_id:
+        spectators.remove(websocket, session_id)
+        if session_id not in manager.active_connections and not spectators.watching(session_id):
+            await bus.unsubscribe(session_id)
@@ -0,0 +1,161 @@
+# ==============================================================================
+# 📄 ARCHIVO: messages.py
+# 🔍 ROL: Mensajes salientes tipados + codificación JSON rápida (orjson) con fragmentos cacheados
+# ==============================================================================
+# Única capa de salida del juego: todo frame que llega a un cliente (WebSocket
+# de jugador o espectador, bus entre procesos, bitácora) se codifica aquí.
+#   - Los esquemas son TypedDict: game_engine sigue devolviendo dicts (cero
+#     costo por frame) pero con forma declarada. validate_frame() los comprueba
+#     con pydantic (lo usa benchmarks/serialize.py, no el camino del turno).
+#   - dumps() usa orjson (≈13x más rápido que json.dumps con emojis); sin
+#     orjson cae a pydantic_core.to_json, que produce exactamente los mismos bytes.
+#   - cached() codifica una sola vez un sub-payload que no cambia (event_data y
+#     entradas de event_queue de cada casilla, filas del ranking) y lo incrusta
+#     tal cual en cada frame (orjson.Fragment).
+# El dinero sale con money.fmt, igual que el serializador de `Cents` en la API.
+#
+# Salida compacta (sin espacios) y UTF-8 sin escapar: los clientes parsean JSON,
+# así que el cambio de formato respecto a json.dumps no les afecta.
+
+from typing import List, Optional, Union
+
+from pydantic import TypeAdapter
+from typing_extensions import Literal, NotRequired, TypedDict
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional: pydantic_core hace lo mismo, algo más lento
+    orjson = None
+
+if orjson is not None:
+    dumps = orjson.dumps
+    loads = orjson.loads
+else:
+    import json
+    from pydantic_core import to_json as dumps
+    loads = json.loads
+
+# orjson < 3.9 no tiene Fragment: los sub-payloads se vuelven a codificar en cada frame
+Fragment = getattr(orjson, "Fragment", None)
+
+
+def encode(msg) -> str:
+    """Mensaje -> frame de texto para el WebSocket (se codifica una vez y lo comparten todos los destinatarios)."""
+    return dumps(msg).decode()
+
+
+def cached(obj):
+    """Sub-payload inmutable ya codificado: se incrusta sin volver a serializarlo."""
+    return Fragment(dumps(obj)) if Fragment is not None else obj
+
+
+# --- ESQUEMAS ---
+class QueueEntry(TypedDict):
+    tipo: str
+    titulo: str
+    descripcion: str
+    monto: Optional[str]
+
+
+class EventData(TypedDict):
+    tipo: str
+    titulo: str
+    costo: Union[int, str]          # 1200 o "12.50" (dólares)
+    flujo_extra: NotRequired[Union[int, str]]
+    descripcion: str
+
+
+class PlayerState(TypedDict):
+    player_id: str
+    nickname: str
+    new_position: int
+    new_cash: str
+    new_debt: str
+    new_net_worth: str
+    new_passive_income: str
+    game_target: str
+
+
+class PlayerUpdatePayload(PlayerState):
+    event_queue: List[QueueEntry]
+
+
+class PlayerUpdate(TypedDict):
+    type: Literal["UPDATE_PLAYER", "VICTORY"]
+    payload: PlayerUpdatePayload
+    message: str
+    seq: NotRequired[int]
+
+
+class DecisionPayload(TypedDict):
+    player_id: str
+    event_data: EventData
+    dice_value: int
+
+
+class DecisionNeeded(TypedDict):
+    type: Literal["DECISION_NEEDED"]
+    payload: DecisionPayload
+    message: str
+    seq: NotRequired[int]
+
+
+class Chat(TypedDict):
+    type: Literal["CHAT"]
+    message: str
+    seq: NotRequired[int]
+
+
+class LeaderboardRow(TypedDict):
+    id: str
+    nickname: str
+    net_worth: str
+    position: int
+    is_me: bool
+
+
+class Leaderboard(TypedDict):
+    type: Literal["LEADERBOARD"]
+    payload: List[LeaderboardRow]
+
+
+class RankedRow(TypedDict):
+    id: str
+    nickname: str
+    net_worth: str
+    position: int
+    rank: int
+
+
+class LeaderboardDeltaPayload(TypedDict):
+    changed: List[RankedRow]
+    removed: List[str]
+
+
+class LeaderboardDelta(TypedDict):
+    type: Literal["LEADERBOARD_DELTA"]
+    payload: LeaderboardDeltaPayload
+
+
+class SessionResetPayload(TypedDict):
+    dice_cursor: int
+
+
+class SessionReset(TypedDict):
+    type: Literal["SESSION_RESET"]
+    payload: SessionResetPayload
+    message: str
+    seq: NotRequired[int]
+
+
+OutboundMessage = Union[PlayerUpdate, DecisionNeeded, Chat, Leaderboard, LeaderboardDelta, SessionReset]
+
+_adapter: Optional[TypeAdapter] = None
+
+
+def validate_frame(frame: Union[str, bytes]) -> OutboundMessage:
+    """Comprueba que un frame ya codificado cumple su esquema (ValidationError si no)."""
+    global _adapter
+    if _adapter is None:
+        _adapter = TypeAdapter(OutboundMessage)
+    return _adapter.validate_json(frame, strict=True)
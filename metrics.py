@@ -0,0 +1,252 @@
+# ==============================================================================
+# 📄 ARCHIVO: metrics.py
+# 🔍 ROL: Métricas en formato Prometheus (/metrics) + perfilador por muestreo
+# ==============================================================================
+# Registro mínimo sin dependencias: contadores, gauges e histogramas con
+# etiquetas. Los valores que ya existen en otro objeto (sockets abiertos, colas,
+# salas en memoria) se leen en el momento del scrape con `callback`, así el
+# camino caliente no paga nada extra.
+#
+# El perfilador toma muestras de la pila del hilo del event loop mientras el
+# actor de una sala habilitada está trabajando (ver /monitor/profile/{code}).
+# Salida en formato "collapsed stacks" (flamegraph.pl / speedscope).
+
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import Counter as Tally
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_INTERVAL_MS = float(os.getenv("METRICS_PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_DEPTH = 64
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _key(label_names: Sequence[str], labels: dict) -> Labels:
+    return tuple((name, str(labels.get(name, ""))) for name in label_names)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    partes = [f'{k}="{_escape(v)}"' for k, v in labels]
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _fmt_value(value: float) -> str:
+    if value == float("inf"): return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        # Los listeners de pymongo pueden llamar desde hilos del driver
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        """(nombre, etiquetas, valor) de cada serie, para render()."""
+
+    def render(self) -> str:
+        lineas = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lineas += [f"{nombre}{_fmt_labels(labels)} {_fmt_value(valor)}" for nombre, labels, valor in self.samples()]
+        return "\n".join(lineas)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, k, v) for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[_key(self.label_names, labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> [conteos por bucket (no acumulados), suma, total]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _key(self.label_names, labels)
+        with self._lock:
+            serie = self._series.get(key)
+            if serie is None:
+                serie = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][bisect_left(self.buckets, value)] += 1
+            serie[1] += value
+            serie[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - inicio, **labels)
+
+    def samples(self):
+        salida = []
+        with self._lock:
+            series = [(key, list(conteos), suma, total) for key, (conteos, suma, total) in self._series.items()]
+        for key, conteos, suma, total in series:
+            acumulado = 0
+            for limite, n in zip(self.buckets + (float("inf"),), conteos):
+                acumulado += n
+                salida.append((f"{self.name}_bucket", key + (("le", _fmt_value(limite)),), acumulado))
+            salida.append((f"{self.name}_sum", key, suma))
+            salida.append((f"{self.name}_count", key, total))
+        return salida
+
+
+class CallbackMetric(Metric):
+    """Valor calculado en el scrape: fn() -> número | [(dict de etiquetas, número)]."""
+
+    def __init__(self, name: str, help_text: str, fn: Callable, kind: str = "gauge", label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self):
+        valor = self.fn()
+        if isinstance(valor, (int, float)):
+            return [(self.name, (), valor)]
+        return [(self.name, _key(self.label_names, labels), v) for labels, v in valor]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def callback(self, name: str, help_text: str, fn: Callable, kind: str = "gauge", label_names: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help_text, fn, kind, label_names))
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- MÉTRICAS DEL JUEGO ---
+COMMAND_LATENCY = REGISTRY.histogram(
+    "lobos_command_latency_seconds", "Desde que el comando entra al actor hasta que su tick se difunde", ["command"])
+STAGE_LATENCY = REGISTRY.histogram(
+    "lobos_stage_seconds", "Duración por etapa: db_read, logic, persist, broadcast", ["stage"])
+MONGO_COMMANDS = REGISTRY.counter(
+    "lobos_mongo_commands_total", "Round-trips a Mongo por comando y resultado", ["command", "status"])
+MONGO_LATENCY = REGISTRY.histogram(
+    "lobos_mongo_command_seconds", "Duración de cada round-trip a Mongo", ["command"])
+WS_CONNECTIONS = REGISTRY.counter("lobos_ws_connections_total", "WebSockets aceptados")
+WS_ERRORS = REGISTRY.counter("lobos_ws_errors_total", "Errores inesperados en el handler WebSocket", ["error"])
+ACTOR_ERRORS = REGISTRY.counter("lobos_actor_errors_total", "Comandos que fallaron dentro del actor", ["command"])
+
+
+# --- PERFILADOR POR MUESTREO ---
+class SamplingProfiler:
+    """Muestrea la pila del event loop solo mientras trabaja el actor de una sala habilitada."""
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self._stacks: Dict[str, Tally] = {}       # session_id -> pila colapsada -> muestras
+        self._current: Optional[str] = None        # sala cuyo actor está ejecutando ahora
+        self._loop_thread: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()             # Uno por hilo: el de un hilo viejo nunca se vuelve a limpiar
+
+    def enabled(self, session_id: str) -> bool:
+        return session_id in self._stacks
+
+    def enable(self, session_id: str):
+        self._stacks.setdefault(session_id, Tally())
+        if self._thread is None:
+            self._loop_thread = threading.get_ident()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._sample, args=(self._stop,), name="lobos-profiler", daemon=True)
+            self._thread.start()
+
+    def disable(self, session_id: str) -> str:
+        informe = self.report(session_id)
+        self._stacks.pop(session_id, None)
+        if not self._stacks and self._thread is not None:
+            self._stop.set()
+            self._thread = None
+        return informe
+
+    def report(self, session_id: str) -> str:
+        muestras = self._stacks.get(session_id) or {}
+        return "\n".join(f"{pila} {n}" for pila, n in sorted(muestras.items(), key=lambda x: -x[1]))
+
+    @contextmanager
+    def scope(self, session_id: str):
+        """Marca el código (síncrono) del actor de la sala; fuera de una sala habilitada no cuesta nada."""
+        if session_id not in self._stacks:
+            yield
+            return
+        anterior, self._current = self._current, session_id
+        try:
+            yield
+        finally:
+            self._current = anterior
+
+    def _sample(self, stop: threading.Event):
+        while not stop.wait(self.interval):
+            session_id = self._current
+            if session_id is None: continue
+            frame = sys._current_frames().get(self._loop_thread)
+            muestras = self._stacks.get(session_id)
+            if frame is None or muestras is None: continue
+            pila = []
+            while frame is not None and len(pila) < PROFILE_MAX_DEPTH:
+                codigo = frame.f_code
+                pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                frame = frame.f_back
+            muestras[";".join(reversed(pila))] += 1
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,50 @@
+# ==============================================================================
+# 📄 ARCHIVO: migrate_money.py
+# 🔍 ROL: Migración de montos Decimal128 (dólares) -> Int64 (centavos)
+# ==============================================================================
+# No es obligatoria: los modelos leen ambos formatos y cada jugador se reescribe
+# en centavos en su siguiente volcado. Este script convierte todo de una vez en
+# el servidor (update_many con pipeline, sin traer documentos), para poder
+# consultar/indexar los montos con un solo tipo.
+#
+# Uso:
+#   python migrate_money.py --dry-run   # solo cuenta documentos pendientes
+#   python migrate_money.py
+
+import argparse
+import asyncio
+
+from database import init_db, MONGO_URL
+from models import Player, GameSession
+
+# Campos con dinero, tal como se guardan en Mongo (alias incluidos)
+CAMPOS = {
+    Player: ["financials.cash", "financials.netWorth", "financials.toxicDebt", "financials.passiveIncome"],
+    GameSession: ["salary", "winning_score"],
+}
+
+
+def _a_centavos(campo: str) -> list:
+    # Los Decimal128 guardados ya tienen 2 decimales: x100 es exacto
+    return [{"$set": {campo: {"$toLong": {"$round": [{"$multiply": [f"${campo}", 100]}, 0]}}}}]
+
+
+async def migrar(dry_run: bool = False):
+    if not MONGO_URL: raise SystemExit("🔴 ERROR: Falta MONGO_URI")
+    await init_db()
+    for modelo, campos in CAMPOS.items():
+        coleccion = modelo.get_pymongo_collection()
+        for campo in campos:
+            filtro = {campo: {"$type": "decimal"}}
+            if dry_run:
+                pendientes = await coleccion.count_documents(filtro)
+                print(f"{modelo.Settings.name}.{campo}: {pendientes} documentos con Decimal128")
+                continue
+            resultado = await coleccion.update_many(filtro, _a_centavos(campo))
+            print(f"{modelo.Settings.name}.{campo}: {resultado.modified_count} documentos migrados")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte montos Decimal128 a centavos (Int64)")
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(migrar(parser.parse_args().dry_run))
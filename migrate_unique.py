@@ -0,0 +1,71 @@
+# ==============================================================================
+# 📄 ARCHIVO: migrate_unique.py
+# 🔍 ROL: Migración previa a los índices únicos (código de sala y nickname por sala)
+# ==============================================================================
+# models.py declara índices únicos en game_sessions.code y en
+# players.(session_id, nickname). Si la base ya tiene repetidos (salas creadas
+# antes de los índices, en carrera), init_beanie falla al crearlos y el
+# servidor no arranca. Hay que correr este script UNA VEZ antes de desplegar.
+#
+# No borra nada: de cada grupo repetido se queda con el documento más antiguo
+# (el que devolvía find_one, así que es el que usaban los alumnos) y a los demás
+# les agrega un sufijo con el final de su _id ("ABC" -> "ABC-9f3e21").
+# Usa Motor directo: init_db no sirve aquí porque intentaría crear los índices.
+#
+# Uso:
+#   python migrate_unique.py --dry-run   # solo lista los repetidos
+#   python migrate_unique.py
+
+import argparse
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from database import MONGO_URL
+from models import GameSession, Player
+
+# Colección -> campos que forman la clave única y campo que se renombra
+CLAVES = {
+    GameSession: (["code"], "code"),
+    Player: (["session_id", "nickname"], "nickname"),
+}
+MAX_LARGO = 20  # Igual que schemas.py (code / nickname)
+
+
+def _renombrado(valor: str, _id) -> str:
+    sufijo = "-" + str(_id)[-6:]
+    return valor[:MAX_LARGO - len(sufijo)] + sufijo
+
+
+async def _repetidos(coleccion, campos: list) -> list:
+    # Grupos con más de un documento, con los _id ordenados (ObjectId crece con el tiempo)
+    return await coleccion.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": {c: f"${c}" for c in campos}, "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ], allowDiskUse=True).to_list(None)
+
+
+async def migrar(dry_run: bool = False):
+    if not MONGO_URL: raise SystemExit("🔴 ERROR: Falta MONGO_URI")
+    database = AsyncIOMotorClient(MONGO_URL).get_default_database()
+    for modelo, (campos, campo) in CLAVES.items():
+        coleccion = database[modelo.Settings.name]
+        grupos = await _repetidos(coleccion, campos)
+        renombrados = 0
+        for grupo in grupos:
+            valor = grupo["_id"][campo]
+            for _id in grupo["ids"][1:]:
+                nuevo = _renombrado(valor, _id)
+                print(f"{modelo.Settings.name} {grupo['_id']}: {_id} -> {nuevo!r}")
+                if not dry_run:
+                    await coleccion.update_one({"_id": _id}, {"$set": {campo: nuevo}})
+                renombrados += 1
+        accion = "a renombrar" if dry_run else "renombrados"
+        print(f"{modelo.Settings.name}: {len(grupos)} grupos repetidos, {renombrados} documentos {accion}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Renombra códigos de sala y nicknames repetidos antes de crear los índices únicos")
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(migrar(parser.parse_args().dry_run))
@@ -3,42 +3,96 @@
 # 🔍 ROL: Definición de Esquemas de Base de Datos (Beanie)
 # ==============================================================================
 
+import os
 from beanie import Document
-from pydantic import BaseModel, Field, BeforeValidator
-from decimal import Decimal, ROUND_HALF_UP
+from pymongo import IndexModel, ASCENDING
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Annotated
-from bson import Decimal128
+from typing import Dict, List, Optional
+from money import Cents, percent_half_up
+from dice import new_seed
 
-# Helper para convertir Decimal128 de Mongo a Decimal de Python
-def convert_decimal(v):
-    if isinstance(v, Decimal128): return v.to_decimal()
-    return v
-
-PyDecimal = Annotated[Decimal, BeforeValidator(convert_decimal)]
+# Caducidad automática (índices TTL). Cambiarla en una BD existente requiere collMod.
+JOURNAL_TTL_DAYS = float(os.getenv("JOURNAL_TTL_DAYS", "14"))
+ARCHIVE_TTL_DAYS = float(os.getenv("ARCHIVE_TTL_DAYS", "180"))
+DAY = 86400
 
 # --- MODELO FINANCIERO EMBEBIDO ---
+# Montos en centavos (int). Los documentos viejos con Decimal128 se convierten al leer.
+# Las reglas del turno (charge, Player.apply_payday_logic / calculate_net_worth) escriben
+# en __dict__: sin validate_assignment el __setattr__ de pydantic no valida nada y cuesta
+# ~8 veces más que una asignación en el dict.
 class FinancialState(BaseModel):
-    cash: PyDecimal = Field(default=Decimal("0.00"), max_digits=20, decimal_places=2)
-    net_worth: PyDecimal = Field(default=Decimal("0.00"), alias="netWorth")
-    toxic_debt: PyDecimal = Field(default=Decimal("0.00"), alias="toxicDebt")
-    passive_income: PyDecimal = Field(default=Decimal("0.00"), alias="passiveIncome")
+    cash: Cents = 0
+    net_worth: Cents = Field(default=0, alias="netWorth")
+    toxic_debt: Cents = Field(default=0, alias="toxicDebt")
+    passive_income: Cents = Field(default=0, alias="passiveIncome")
     
     class Config:
         populate_by_name = True
-        json_encoders = {Decimal: str}
+
+    # Gasto obligatorio (centavos): lo que no cubre el efectivo pasa a deuda tóxica
+    def charge(self, costo: int):
+        d = self.__dict__
+        if d["cash"] >= costo:
+            d["cash"] -= costo
+        else:
+            d["toxic_debt"] += costo - d["cash"]
+            d["cash"] = 0
+
+# --- TABLEROS (ver board.py) ---
+class BoardSquare(BaseModel):
+    casilla: int
+    tipo: str
+    titulo: str
+    descripcion: str = ""
+    costo: Cents = 0
+    flujo_extra: Cents = 0
+
+class NeutralMessage(BaseModel):
+    titulo: str
+    descripcion: str = ""
+
+class BoardLayout(BaseModel):
+    nombre: str
+    nivel: str = "general"
+    casillas_totales: int
+    eventos: List[BoardSquare] = Field(default_factory=list)
+    neutros: List[NeutralMessage] = Field(default_factory=list)
+
+# Tableros subidos por profesores (los de fábrica viven en board.py). Inmutables.
+class BoardDefinition(Document):
+    board_id: str
+    layout: BoardLayout
+    created_at: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "boards"
+        indexes = [IndexModel([("board_id", ASCENDING)], unique=True)]
 
 # --- DOCUMENTO: SESIÓN DE JUEGO ---
 class GameSession(Document):
     code: str
     created_at: datetime = Field(default_factory=datetime.now)
-    is_active: bool = True
+    is_active: bool = True  # False tras SESSION_INACTIVE_AFTER sin jugadas (ver lifecycle.py)
+    last_activity_at: datetime = Field(default_factory=datetime.now)
     # Configuración dinámica de la sala
-    salary: PyDecimal = Field(default=Decimal("2500.00"))
-    winning_score: PyDecimal = Field(default=Decimal("1000000.00"))
+    salary: Cents = 250000            # $2,500.00
+    winning_score: Cents = 100000000  # $1,000,000.00
+    board_id: str = "clasico"         # Ver board.py
+    # Dados deterministas (ver dice.py): semilla y nº de tiradas ya usadas
+    seed: int = Field(default_factory=new_seed)
+    dice_cursor: int = 0
+    # Contadores por casilla para las estadísticas: {"5": {"hits": n, "buys": n, "passes": n}}
+    square_stats: Dict[str, Dict[str, int]] = Field(default_factory=dict)
     
     class Settings:
         name = "game_sessions"
+        # Índices únicos: con códigos/nicknames ya repetidos init_beanie falla, correr antes migrate_unique.py
+        indexes = [
+            IndexModel([("code", ASCENDING)], unique=True),
+            IndexModel([("is_active", ASCENDING), ("last_activity_at", ASCENDING)]),
+        ]
 
 # --- DOCUMENTO: JUGADOR ---
 class Player(Document):
@@ -51,21 +105,69 @@ class Player(Document):
 
     class Settings:
         name = "players"
+        # Un nickname por sala (y búsqueda por sala sin escanear la colección)
+        indexes = [IndexModel([("session_id", ASCENDING), ("nickname", ASCENDING)], unique=True)]
 
-    # Método de cálculo de patrimonio
-    def calculate_net_worth(self, assets_value: Decimal = Decimal("0.00")):
-        total_assets = self.financials.cash + assets_value
-        total_liabilities = self.financials.toxic_debt
-        self.financials.net_worth = total_assets - total_liabilities
-        return self.financials.net_worth
-
-    # Método de lógica Payday (recibe salario dinámico)
-    def apply_payday_logic(self, salary_amount: Decimal):
-        INTEREST_RATE = Decimal("0.05") 
-        self.financials.cash += salary_amount + self.financials.passive_income
-        
-        if self.financials.toxic_debt > 0:
-            interest = self.financials.toxic_debt * INTEREST_RATE
-            self.financials.toxic_debt += interest.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    # Método de cálculo de patrimonio (centavos)
+    def calculate_net_worth(self, assets_value: int = 0):
+        f = self.financials.__dict__
+        f["net_worth"] = f["cash"] + assets_value - f["toxic_debt"]
+        return f["net_worth"]
+
+    # Método de lógica Payday (recibe salario dinámico, en centavos)
+    def apply_payday_logic(self, salary_amount: int):
+        INTEREST_PERCENT = 5
+        f = self.financials.__dict__
+        f["cash"] += salary_amount + f["passive_income"]
         
-        self.calculate_net_worth()
\ No newline at end of file
+        if f["toxic_debt"] > 0:
+            # 5% redondeado al centavo con ROUND_HALF_UP (igual que Decimal.quantize)
+            f["toxic_debt"] += percent_half_up(f["toxic_debt"], INTEREST_PERCENT)
+        # El patrimonio (con activos) lo recalcula una sola vez quien cierra el turno (paquete_actualizacion)
+
+# --- DOCUMENTO: BITÁCORA DE EVENTOS DE LA SALA (append-only) ---
+class JournalEntry(Document):
+    session_id: str
+    seq: int
+    type: str
+    frame: str  # Frame JSON tal cual se difundió (incluye "seq")
+    # Solo en el primer frame de cada comando: quién y qué lo produjo (ver replay.py)
+    player_id: Optional[str] = None
+    command: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "session_journal"
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("seq", ASCENDING)], unique=True),
+            IndexModel([("created_at", ASCENDING)], expireAfterSeconds=int(JOURNAL_TTL_DAYS * DAY)),
+        ]
+
+# --- DOCUMENTO: SALA TERMINADA (archivo compacto) ---
+class ArchivedPlayer(BaseModel):
+    nickname: str
+    cash: Cents = 0
+    net_worth: Cents = 0
+    toxic_debt: Cents = 0
+    passive_income: Cents = 0
+    laps_completed: int = 0
+
+class SessionArchive(Document):
+    session_id: str
+    code: str
+    created_at: datetime
+    last_activity_at: Optional[datetime] = None
+    archived_at: datetime = Field(default_factory=datetime.now)
+    salary: Cents
+    winning_score: Cents
+    board_id: str = "clasico"
+    square_stats: Dict[str, Dict[str, int]] = Field(default_factory=dict)
+    players: List[ArchivedPlayer] = Field(default_factory=list)  # Ordenados por patrimonio
+
+    class Settings:
+        name = "session_archive"
+        indexes = [
+            IndexModel([("session_id", ASCENDING)], unique=True),
+            IndexModel([("code", ASCENDING)]),
+            IndexModel([("archived_at", ASCENDING)], expireAfterSeconds=int(ARCHIVE_TTL_DAYS * DAY)),
+        ]
@@ -0,0 +1,62 @@
+# ==============================================================================
+# 📄 ARCHIVO: money.py
+# 🔍 ROL: Dinero como enteros en centavos (estado, Mongo y cables)
+# ==============================================================================
+# Todo el dinero del juego vive como `int` en centavos: la aritmética del turno
+# es aritmética de enteros de C y Mongo guarda Int64 en vez de Decimal128.
+# Solo en los bordes se convierte:
+#   - Entrada en dólares (API, board.py): to_cents()
+#   - Salida a texto "1234.50" (payload JSON, API): fmt()
+#   - Documentos viejos con Decimal128: el validador de `Cents` los acepta y
+#     el siguiente volcado los reescribe en centavos (ver migrate_money.py)
+#
+# Redondeo: percent_half_up() reproduce quantize(0.01, ROUND_HALF_UP) de Decimal.
+
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Annotated
+
+from bson import Decimal128
+from pydantic import BeforeValidator, PlainSerializer
+
+CENT = Decimal("0.01")
+
+
+def to_cents(amount) -> int:
+    """Monto en dólares (int, str, Decimal, Decimal128, float) -> centavos con ROUND_HALF_UP."""
+    if type(amount) is int: return amount * 100
+    if isinstance(amount, Decimal128): amount = amount.to_decimal()
+    valor = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+    return int((valor * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_decimal(cents: int) -> Decimal:
+    return (Decimal(cents) / 100).quantize(CENT)
+
+
+# ".00" ... ".99": evita el formato "%02d" en cada monto (fmt corre varias veces por turno)
+_CENTS_SUFFIX = tuple(f".{c:02d}" for c in range(100))
+
+
+def fmt(cents: int) -> str:
+    """Centavos -> "1234.50" (mismo formato que str() de un Decimal con 2 decimales)."""
+    if cents < 0:
+        dolares, resto = divmod(-cents, 100)
+        return "-" + str(dolares) + _CENTS_SUFFIX[resto]
+    dolares, resto = divmod(cents, 100)
+    return str(dolares) + _CENTS_SUFFIX[resto]
+
+
+def percent_half_up(cents: int, percent: int) -> int:
+    """percent% de un monto, redondeado al centavo alejándose de cero en los empates."""
+    if cents < 0: return -((-cents * percent + 50) // 100)
+    return (cents * percent + 50) // 100
+
+
+def _stored(value) -> int:
+    """Valor guardado -> centavos. Un int ya son centavos; Decimal128/Decimal/str son dólares (formato viejo)."""
+    if type(value) is int: return value
+    return to_cents(value)
+
+
+# Tipo de campo Pydantic: int en centavos en memoria y en Mongo, "1234.50" en JSON
+Cents = Annotated[int, BeforeValidator(_stored), PlainSerializer(fmt, return_type=str, when_used="json")]
@@ -0,0 +1,221 @@
+# ==============================================================================
+# 📄 ARCHIVO: protocol.py
+# 🔍 ROL: Protocolo binario compacto (MessagePack + deltas + strings internados)
+# ==============================================================================
+# Se negocia al conectar con ?proto=bin1. Sin ese parámetro (o si msgpack no
+# está instalado) el cliente sigue recibiendo el JSON de siempre.
+#
+# Cada frame binario es un mapa MessagePack:
+#   {"n": nº de frame, "s": [[id, "texto"], ...] definiciones nuevas, "f": [frames...]}
+# Frames:
+#   U / V  actualización / victoria:  {"t", "id", "f": {campo: valor cambiado}, "q": [[tipo, titulo, desc, monto]], "m"}
+#   D      decisión:                  {"t", "id", "e": [tipo, titulo, desc, costo, flujo], "dv", "m"}
+#   L      ranking:                   {"t", "o": [ids en orden], "r": {id: [nick, patrimonio, pos]} (solo cambios), "me"}
+#   C      chat:                      {"t", "m"}
+#   J      cualquier otro:            {"t", "j": dict original}
+# Los textos repetidos (títulos, descripciones, ids, nicks) viajan como enteros.
+# El dinero viaja en centavos (int). Un campo se omite solo si coincide con el
+# último estado CONFIRMADO por el cliente ("ACK <n>") y con todos los frames
+# enviados después: el cliente puede tener cualquiera de ellos aplicado. Los
+# frames que la cola de salida descarta (discard) nunca llegan, así que no
+# cuentan ni se confirman; perder uno no rompe nada: el siguiente lo repara.
+
+from typing import Dict, List, Optional
+
+from money import fmt, to_cents
+
+try:
+    import msgpack
+except ImportError:  # Dependencia opcional: sin ella solo existe el protocolo JSON
+    msgpack = None
+
+PROTO_JSON = "json"
+PROTO_BIN = "bin1"
+
+# Campos de UPDATE_PLAYER -> clave corta (los de dinero van en centavos)
+PLAYER_FIELDS = {
+    "nickname": "n", "new_position": "p", "new_cash": "c", "new_debt": "d",
+    "new_net_worth": "w", "new_passive_income": "i", "game_target": "g",
+}
+MONEY_FIELDS = frozenset({"new_cash", "new_debt", "new_net_worth", "new_passive_income", "game_target"})
+
+# Pendientes sin ACK que se recuerdan por cliente (luego se asume que no confirmará)
+MAX_UNACKED_FRAMES = 256
+
+
+def negotiate(requested: Optional[str]) -> str:
+    return PROTO_BIN if requested == PROTO_BIN and msgpack is not None else PROTO_JSON
+
+
+def cents(value) -> Optional[int]:
+    """Monto en dólares del payload ("1234.50", 1200...) -> centavos."""
+    if value is None: return None
+    return to_cents(value)
+
+
+class BinaryCodec:
+    """Estado de codificación de UNA conexión (tabla de strings + snapshots confirmados)."""
+
+    def __init__(self):
+        self._frame_no = 0
+        self._string_ids: Dict[str, int] = {}
+        self._strings_acked: set = set()
+        self._acked: Dict[tuple, tuple] = {}          # clave -> valores confirmados
+        self._unacked: Dict[int, tuple] = {}          # nº frame -> (snapshots, ids de strings)
+        # Acumuladores del frame en construcción
+        self._defs: List[list] = []
+        self._sent_defs: set = set()
+        self._snapshots: Dict[tuple, tuple] = {}
+
+    @property
+    def frame_no(self) -> int:
+        """Número del último frame codificado."""
+        return self._frame_no
+
+    def hello(self) -> bytes:
+        return msgpack.packb({"n": 0, "s": [], "f": [{"t": "HELLO", "proto": PROTO_BIN}]})
+
+    # --- CONFIRMACIONES ---
+    def ack(self, frame_no: int):
+        for n in sorted(k for k in self._unacked if k <= frame_no):
+            snapshots, string_ids = self._unacked.pop(n)
+            self._acked.update(snapshots)
+            self._strings_acked.update(string_ids)
+
+    def discard(self, frame_no: int):
+        """La cola de salida descartó el frame: el cliente nunca lo aplicó."""
+        self._unacked.pop(frame_no, None)
+
+    def _forget(self, snapshots: Dict[tuple, tuple]):
+        # Frame sin ACK demasiado viejo: no se sabe si llegó, esas claves vuelven a ir completas
+        for key in snapshots:
+            self._acked.pop(key, None)
+
+    def _candidates(self, key: tuple) -> List[Optional[tuple]]:
+        """Estados que el cliente puede tener aplicados para la clave (confirmado + enviados sin ACK)."""
+        vistos = [self._acked.get(key)]
+        vistos.extend(snapshots[key] for snapshots, _ in self._unacked.values() if key in snapshots)
+        return vistos
+
+    # --- CODIFICACIÓN ---
+    def _ref(self, texto: Optional[str]) -> Optional[int]:
+        if texto is None: return None
+        sid = self._string_ids.get(texto)
+        if sid is None:
+            sid = self._string_ids[texto] = len(self._string_ids)
+        # Se (re)define mientras el cliente no confirme un frame que la contenga
+        if sid not in self._strings_acked and sid not in self._sent_defs:
+            self._defs.append([sid, texto])
+            self._sent_defs.add(sid)
+        return sid
+
+    def encode(self, frames: List[dict], ranking_rows: Optional[List[dict]], player_id: Optional[str]) -> bytes:
+        self._frame_no += 1
+        self._defs, self._sent_defs, self._snapshots = [], set(), {}
+
+        salida = [self._encode_frame(f) for f in frames]
+        if ranking_rows is not None:
+            salida.append(self._encode_ranking(ranking_rows, player_id))
+
+        self._unacked[self._frame_no] = (self._snapshots, self._sent_defs)
+        if len(self._unacked) > MAX_UNACKED_FRAMES:
+            self._forget(self._unacked.pop(min(self._unacked))[0])
+        return msgpack.packb({"n": self._frame_no, "s": self._defs, "f": salida})
+
+    def _encode_frame(self, frame: dict) -> dict:
+        tipo = frame.get("type")
+        payload = frame.get("payload") or {}
+        if tipo in ("UPDATE_PLAYER", "VICTORY"):
+            return self._encode_update(tipo, payload, frame.get("message"))
+        if tipo == "DECISION_NEEDED":
+            evt = payload.get("event_data") or {}
+            return {
+                "t": "D", "id": self._ref(payload.get("player_id")),
+                "e": [self._ref(evt.get("tipo")), self._ref(evt.get("titulo")), self._ref(evt.get("descripcion")),
+                      cents(evt.get("costo")), cents(evt.get("flujo_extra"))],
+                "dv": payload.get("dice_value"), "m": frame.get("message"),
+            }
+        if tipo == "CHAT":
+            return {"t": "C", "m": frame.get("message")}
+        return {"t": "J", "j": frame}
+
+    def _encode_update(self, tipo: str, payload: dict, message: Optional[str]) -> dict:
+        pid = payload.get("player_id")
+        valores = tuple(cents(payload.get(k)) if k in MONEY_FIELDS else payload.get(k) for k in PLAYER_FIELDS)
+        key = ("player", pid)
+        vistos = self._candidates(key)
+        cambios = {}
+        for i, (campo, corto) in enumerate(PLAYER_FIELDS.items()):
+            if any(base is None or base[i] != valores[i] for base in vistos):
+                cambios[corto] = self._ref(valores[i]) if campo == "nickname" else valores[i]
+        self._snapshots[key] = valores
+
+        cola = [[self._ref(e.get("tipo")), self._ref(e.get("titulo")), self._ref(e.get("descripcion")), self._ref(e.get("monto"))]
+                for e in payload.get("event_queue") or []]
+        return {"t": "V" if tipo == "VICTORY" else "U", "id": self._ref(pid), "f": cambios, "q": cola, "m": message}
+
+    def _encode_ranking(self, rows: List[dict], player_id: Optional[str]) -> dict:
+        orden, cambios = [], {}
+        for row in rows:
+            rid = self._ref(row["id"])
+            orden.append(rid)
+            valores = (row["nickname"], cents(row["net_worth"]), row["position"])
+            key = ("rank", row["id"])
+            if any(base != valores for base in self._candidates(key)):
+                cambios[rid] = [self._ref(valores[0]), valores[1], valores[2]]
+            self._snapshots[key] = valores
+        return {"t": "L", "o": orden, "r": cambios, "me": self._ref(player_id) if player_id else None}
+
+
+class BinaryDecoder:
+    """Decodificador de referencia (cliente): reconstruye frames con la forma del JSON clásico."""
+
+    def __init__(self):
+        self.strings: Dict[int, str] = {}
+        self.players: Dict[str, dict] = {}
+        self.ranking: Dict[str, list] = {}
+        self.last_frame = 0
+
+    def decode(self, data: bytes) -> List[dict]:
+        msg = msgpack.unpackb(data, strict_map_key=False)
+        self.last_frame = msg["n"]
+        for sid, texto in msg["s"]:
+            self.strings[sid] = texto
+        return [self._decode_frame(f) for f in msg["f"]]
+
+    def _s(self, sid):
+        return None if sid is None else self.strings[sid]
+
+    def _money(self, value):
+        return None if value is None else fmt(value)
+
+    def _decode_frame(self, f: dict) -> dict:
+        t = f["t"]
+        if t in ("U", "V"):
+            pid = self._s(f["id"])
+            estado = self.players.setdefault(pid, {})
+            for campo, corto in PLAYER_FIELDS.items():
+                if corto in f["f"]:
+                    valor = f["f"][corto]
+                    estado[campo] = self._s(valor) if campo == "nickname" else (self._money(valor) if campo in MONEY_FIELDS else valor)
+            cola = [{"tipo": self._s(a), "titulo": self._s(b), "descripcion": self._s(c), "monto": self._s(d)} for a, b, c, d in f["q"]]
+            return {"type": "VICTORY" if t == "V" else "UPDATE_PLAYER",
+                    "payload": {"player_id": pid, **estado, "event_queue": cola}, "message": f["m"]}
+        if t == "D":
+            tipo, titulo, desc, costo, flujo = f["e"]
+            evt = {"tipo": self._s(tipo), "titulo": self._s(titulo), "descripcion": self._s(desc), "costo": self._money(costo)}
+            if flujo is not None: evt["flujo_extra"] = self._money(flujo)
+            return {"type": "DECISION_NEEDED", "payload": {"player_id": self._s(f["id"]), "event_data": evt, "dice_value": f["dv"]}, "message": f["m"]}
+        if t == "L":
+            for rid, (nick, nw, pos) in f["r"].items():
+                self.ranking[self._s(rid)] = [self._s(nick), self._money(nw), pos]
+            me = self._s(f["me"]) if f["me"] is not None else None
+            filas = []
+            for rid in f["o"]:
+                pid = self._s(rid)
+                nick, nw, pos = self.ranking[pid]
+                filas.append({"id": pid, "nickname": nick, "net_worth": nw, "position": pos, "is_me": pid == me})
+            return {"type": "LEADERBOARD", "payload": filas}
+        if t == "C":
+            return {"type": "CHAT", "message": f["m"]}
+        return f.get("j", f)
@@ -0,0 +1,219 @@
+# ==============================================================================
+# 📄 ARCHIVO: replay.py
+# 🔍 ROL: Repetición offline de una partida (auditoría) + benchmark de CPU del turno
+# ==============================================================================
+# Una partida queda determinada por su tablero, salario, meta, semilla de los
+# dados (dice.py) y la secuencia de comandos marcada en la bitácora
+# (JournalEntry.command). Aquí se vuelve a ejecutar con game_engine, sin
+# sockets ni Mongo:
+#   - verificación: cada comando debe producir exactamente los frames que se
+#     difundieron (byte a byte), así se resuelve cualquier disputa. Las
+#     bitácoras anteriores a messages.py (json.dumps con espacios) se comparan
+#     ya parseadas;
+#   - rendimiento: turnos por segundo del pipeline lógico (dado + reglas +
+#     serialización JSON) sobre una carga estable y repetible.
+#
+# La exportación incluye la semilla, que permite predecir los dados: la API
+# responde 409 mientras la sala siga activa (is_active, ver lifecycle.py) y
+# solo la entrega cuando queda inactiva y hasta que se archiva. --code lee
+# Mongo directamente (uso del profesor). La bitácora caduca a los
+# JOURNAL_TTL_DAYS días.
+#
+# Uso:
+#   curl localhost:8000/sessions/ABC/replay > partida.json
+#   python replay.py partida.json --repeat 20
+#   python replay.py --code ABC                    # exporta desde Mongo (MONGO_URI)
+#   python replay.py --synthetic 30x200 --seed 7   # partida generada: 30 alumnos x 200 tiradas
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Optional, Tuple
+
+from beanie import PydanticObjectId
+
+from board import BUILTIN_BOARDS, CompiledBoard, DEFAULT_BOARD_ID, boards
+from dice import DiceStream
+from game_engine import resolver_buy, resolver_pass, resolver_roll
+from messages import encode, loads
+from models import BoardLayout, FinancialState, GameSession, JournalEntry, Player
+
+COMANDOS_DE_JUEGO = ("ROLL", "BUY", "PASS")   # CHAT no toca el estado ni los dados
+
+
+# --- EXPORTACIÓN ---
+async def exportar(session_id: str) -> Optional[dict]:
+    """Semilla, configuración y comandos (con los frames que produjeron) de una sala guardada."""
+    sesion = await GameSession.get(PydanticObjectId(session_id))
+    if not sesion: return None
+    entradas = await JournalEntry.find(JournalEntry.session_id == session_id).sort(JournalEntry.seq).to_list()
+    jugadores = await Player.find(Player.session_id == session_id).to_list()
+    tablero = await boards.for_session(sesion.board_id)
+
+    comandos = []
+    for e in entradas:
+        if e.command:
+            comandos.append({"seq": e.seq, "player_id": e.player_id, "command": e.command, "frames": [e.frame]})
+        elif comandos:
+            comandos[-1]["frames"].append(e.frame)
+
+    # Tras un reinicio la bitácora empieza en SESSION_RESET, que guarda el cursor de los dados
+    cursor = 0
+    if comandos and comandos[0]["command"] == "RESET":
+        cursor = loads(comandos[0]["frames"][0])["payload"]["dice_cursor"]
+    return {
+        "code": sesion.code, "seed": sesion.seed, "dice_cursor": cursor,
+        "salary": sesion.salary, "winning_score": sesion.winning_score,
+        "board_id": tablero.board_id, "board": tablero.layout.model_dump(),
+        "players": {str(j.id): j.nickname for j in jugadores},
+        # Si la bitácora ya caducó en parte, la repetición no empieza en el estado inicial
+        "complete": not entradas or entradas[0].seq == 1 or bool(comandos) and comandos[0]["command"] == "RESET",
+        "commands": comandos,
+    }
+
+
+# --- REPETICIÓN ---
+class _Jugador:
+    """Jugador en memoria con las reglas de Player (sin Beanie ni Mongo)."""
+    calculate_net_worth = Player.calculate_net_worth
+    apply_payday_logic = Player.apply_payday_logic
+
+    def __init__(self, player_id: str, nickname: str):
+        self.id = player_id
+        self.nickname = nickname
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.position = 0
+        self.laps_completed = 0
+        self.financials = FinancialState()
+
+
+def _tablero(partida: dict) -> CompiledBoard:
+    tablero = BUILTIN_BOARDS.get(partida["board_id"])
+    if tablero and tablero.layout.model_dump() == partida["board"]: return tablero
+    return CompiledBoard(partida["board_id"], BoardLayout.model_validate(partida["board"]))
+
+
+def repetir(partida: dict, tablero: CompiledBoard, verificar: bool = True) -> Tuple[int, List[str]]:
+    """Ejecuta los comandos desde el estado inicial. Devuelve (turnos, diferencias con lo difundido)."""
+    dados = DiceStream(partida["seed"], partida["dice_cursor"])
+    salario, meta, nombres = partida["salary"], partida["winning_score"], partida["players"]
+    jugadores = {}
+    turnos, diferencias = 0, []
+
+    for cmd in partida["commands"]:
+        comando, pid = cmd["command"], cmd["player_id"]
+        if comando == "RESET":
+            for jugador in jugadores.values(): jugador.reiniciar()
+            continue
+        if comando not in COMANDOS_DE_JUEGO: continue
+        jugador = jugadores.get(pid)
+        if jugador is None:
+            jugador = jugadores[pid] = _Jugador(pid, nombres.get(pid, pid))
+
+        if comando == "ROLL":
+            mensajes = resolver_roll(jugador, dados.roll(), salario, meta, tablero)
+        elif comando == "BUY":
+            mensajes = resolver_buy(jugador, meta, tablero)
+        else:
+            mensajes = resolver_pass(jugador, meta, tablero)
+        turnos += 1
+
+        # Mismo orden de claves que journal.append: "seq" al final
+        for i, msg in enumerate(mensajes):
+            msg["seq"] = cmd["seq"] + i
+        frames = [encode(msg) for msg in mensajes]
+        if verificar and frames != cmd["frames"] and [loads(f) for f in frames] != [loads(f) for f in cmd["frames"]]:
+            diferencias.append(f"seq {cmd['seq']} ({comando} de {jugador.nickname}): difundido={cmd['frames']} repetido={frames}")
+    return turnos, diferencias
+
+
+# --- CARGA SINTÉTICA ---
+def sintetica(alumnos: int, tiradas: int, seed: int = 0, board_id: str = DEFAULT_BOARD_ID,
+              salario: int = 250000, meta: int = 100000000) -> dict:
+    """Partida generada con el motor (cada alumno tira por turno y compra si le alcanza), en formato de exportación."""
+    tablero = BUILTIN_BOARDS[board_id]
+    partida = {
+        "code": "SINTETICA", "seed": seed, "dice_cursor": 0, "salary": salario, "winning_score": meta,
+        "board_id": board_id, "board": tablero.layout.model_dump(),
+        "players": {f"p{i}": f"Alumno {i}" for i in range(alumnos)}, "complete": True, "commands": [],
+    }
+    dados = DiceStream(seed)
+    jugadores = [_Jugador(pid, nick) for pid, nick in partida["players"].items()]
+    seq = 1
+
+    def registrar(jugador, comando, mensajes):
+        nonlocal seq
+        frames = []
+        for msg in mensajes:
+            msg["seq"] = seq
+            frames.append(encode(msg))
+            seq += 1
+        partida["commands"].append({"seq": seq - len(frames), "player_id": jugador.id, "command": comando, "frames": frames})
+
+    for _ in range(tiradas):
+        for jugador in jugadores:
+            mensajes = resolver_roll(jugador, dados.roll(), salario, meta, tablero)
+            registrar(jugador, "ROLL", mensajes)
+            if mensajes[-1]["type"] == "DECISION_NEEDED":
+                if jugador.financials.cash >= tablero.casillas[jugador.position].costo:
+                    registrar(jugador, "BUY", resolver_buy(jugador, meta, tablero))
+                else:
+                    registrar(jugador, "PASS", resolver_pass(jugador, meta, tablero))
+    return partida
+
+
+# --- CLI ---
+async def _exportar_de_mongo(code: str) -> dict:
+    from database import init_db, MONGO_URL
+    if not MONGO_URL: raise SystemExit("🔴 ERROR: Falta MONGO_URI")
+    await init_db()
+    sesion = await GameSession.find_one(GameSession.code == code)
+    if not sesion: raise SystemExit(f"🔴 ERROR: No existe la sala {code}")
+    return await exportar(str(sesion.id))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Repite una partida offline y mide turnos por segundo")
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument("archivo", nargs="?", help="JSON de GET /sessions/{code}/replay")
+    origen.add_argument("--code", help="Exportar la sala desde Mongo")
+    origen.add_argument("--synthetic", metavar="ALUMNOSxTIRADAS", help="Generar una partida, p. ej. 30x200")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de la partida sintética")
+    parser.add_argument("--board", choices=sorted(BUILTIN_BOARDS), default=DEFAULT_BOARD_ID, help="Tablero de la partida sintética")
+    parser.add_argument("--repeat", type=int, default=10, help="Repeticiones cronometradas (sin verificar)")
+    parser.add_argument("--save", help="Guardar la partida (útil con --synthetic o --code)")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        alumnos, tiradas = (int(n) for n in args.synthetic.lower().split("x"))
+        partida = sintetica(alumnos, tiradas, args.seed, args.board)
+    elif args.code:
+        partida = asyncio.run(_exportar_de_mongo(args.code))
+    else:
+        with open(args.archivo, encoding="utf-8") as f:
+            partida = json.load(f)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(partida, f)
+
+    tablero = _tablero(partida)
+    turnos, diferencias = repetir(partida, tablero)
+    if not partida.get("complete", True):
+        print("⚠️ La bitácora no empieza en el estado inicial (caducó en parte): las diferencias son esperables")
+    print(f"🎬 Sala {partida['code']}: {len(partida['commands'])} comandos, {turnos} turnos, {len(partida['players'])} jugadores")
+    print("✅ La repetición coincide con lo difundido" if not diferencias else f"❌ {len(diferencias)} diferencias, la primera:\n{diferencias[0]}")
+
+    if args.repeat and turnos:
+        inicio = time.perf_counter()
+        for _ in range(args.repeat):
+            repetir(partida, tablero, verificar=False)
+        segundos = time.perf_counter() - inicio
+        print(f"⏱️ {turnos * args.repeat / segundos:,.0f} turnos/s ({segundos / args.repeat * 1000:.1f} ms por repetición)")
+    if diferencias: raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
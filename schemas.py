@@ -3,9 +3,11 @@
 # 🔍 ROL: Esquemas Pydantic para validación API
 # ==============================================================================
 
-from pydantic import BaseModel, Field, ConfigDict, BeforeValidator
+from pydantic import BaseModel, Field, ConfigDict, BeforeValidator, model_validator
 from decimal import Decimal
-from typing import Optional, Annotated
+from typing import List, Literal, Optional, Annotated
+
+from money import Cents
 
 def stringify_id(v):
     if v is None: return None
@@ -13,26 +15,73 @@ def stringify_id(v):
 
 PyObjectId = Annotated[str, BeforeValidator(stringify_id)]
 
+# Montos en centavos internamente; en JSON salen como "1234.50"
 class FinancialSchema(BaseModel):
-    cash: Decimal
-    net_worth: Decimal = Field(..., alias="netWorth")
-    toxic_debt: Decimal = Field(..., alias="toxicDebt")
-    passive_income: Decimal = Field(..., alias="passiveIncome")
+    cash: Cents
+    net_worth: Cents = Field(..., alias="netWorth")
+    toxic_debt: Cents = Field(..., alias="toxicDebt")
+    passive_income: Cents = Field(..., alias="passiveIncome")
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
+# DTO Casilla con evento de un tablero (montos en dólares, como en board.py)
+class BoardSquareIn(BaseModel):
+    casilla: int = Field(..., ge=1)
+    tipo: Literal["LOBO_NEGRO", "LOBO_BLANCO"]
+    titulo: str = Field(..., min_length=1, max_length=40)
+    descripcion: str = Field(default="", max_length=200)
+    costo: Decimal = Field(..., gt=0, le=1000000000, decimal_places=2)
+    flujo_extra: Optional[Decimal] = Field(default=None, gt=0, le=1000000000, decimal_places=2)
+
+class NeutralIn(BaseModel):
+    titulo: str = Field(..., min_length=1, max_length=40)
+    descripcion: str = Field(default="", max_length=200)
+
+# DTO Crear Tablero (Input Profesor). Se compila en board.CompiledBoard
+class BoardCreate(BaseModel):
+    board_id: Optional[str] = Field(default=None, pattern=r"^[a-z0-9_-]{3,40}$")
+    nombre: str = Field(..., min_length=1, max_length=60)
+    nivel: str = Field(default="general", min_length=1, max_length=30)
+    casillas_totales: int = Field(..., ge=6, le=100)
+    eventos: List[BoardSquareIn] = Field(default_factory=list, max_length=100)
+    neutros: List[NeutralIn] = Field(default_factory=list, max_length=20)  # Vacío = mensajes de board.py
+
+    @model_validator(mode="after")
+    def _coherente(self):
+        vistas = set()
+        for e in self.eventos:
+            if e.casilla > self.casillas_totales: raise ValueError(f"Casilla {e.casilla} fuera del tablero")
+            if e.casilla in vistas: raise ValueError(f"Casilla {e.casilla} repetida")
+            vistas.add(e.casilla)
+            if (e.tipo == "LOBO_BLANCO") != (e.flujo_extra is not None):
+                raise ValueError(f"Casilla {e.casilla}: flujo_extra es obligatorio en LOBO_BLANCO y no aplica a LOBO_NEGRO")
+        return self
+
+# DTO Leer Tablero (resumen)
+class BoardRead(BaseModel):
+    board_id: str
+    nombre: str
+    nivel: str
+    casillas_totales: int
+
 # DTO Crear Sesión (Input Profesor)
 class SessionCreate(BaseModel):
     code: str = Field(..., min_length=3, max_length=20)
     salary: Optional[Decimal] = Field(default=None)
     winning_score: Optional[Decimal] = Field(default=None)
+    # Tablero: uno existente por id (ver GET /boards) o uno nuevo subido junto con la sala
+    board_id: Optional[str] = Field(default=None, max_length=40)
+    board: Optional[BoardCreate] = None
+    # Semilla de los dados (ver dice.py); sin ella se genera una al azar
+    seed: Optional[int] = Field(default=None, ge=0, lt=2**63)
 
 # DTO Leer Sesión (Output)
 class SessionRead(BaseModel):
     id: Optional[PyObjectId] = Field(None, alias="_id")
     code: str
     is_active: bool
-    salary: Decimal 
-    winning_score: Decimal
+    salary: Cents 
+    winning_score: Cents
+    board_id: str
 
 # DTO Crear Jugador (Input Alumno)
 class PlayerCreate(BaseModel):
@@ -46,4 +95,12 @@ class PlayerRead(BaseModel):
     position: int
     session_id: str 
     financials: FinancialSchema 
-    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+# DTO Registro masivo (Input Profesor: lista de la clase)
+class RosterCreate(BaseModel):
+    nicknames: List[Annotated[str, Field(min_length=3, max_length=20)]] = Field(..., min_length=1, max_length=500)
+
+# DTO Resultado del registro masivo
+class RosterRead(BaseModel):
+    created: List[PlayerRead]
+    rejected: List[str]  # Nicknames ya ocupados en la sala (o repetidos en la lista)
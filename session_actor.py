@@ -0,0 +1,352 @@
+# ==============================================================================
+# 📄 ARCHIVO: session_actor.py
+# 🔍 ROL: Un actor asyncio por sala: comandos en orden + difusión agrupada por tick
+# ==============================================================================
+# Los sockets ya no tocan el estado del juego: solo encolan comandos. El actor
+# de la sala los aplica uno por uno (sin carreras ROLL/BUY) y, al cerrar cada
+# tick, publica un único envelope en el bus; cada proceso lo convierte en UN
+# solo frame por cliente (ver ConnectionManager.deliver_envelope).
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from analytics import BUYS, HITS, PASSES, STATS_PUSH_MS
+from broadcast_bus import bus
+from connection_manager import DROPPABLE_TYPES
+from game_engine import parse_command, resolver_roll, resolver_buy, resolver_pass, mensaje_chat, estado_jugador
+from messages import encode, loads
+from metrics import ACTOR_ERRORS, COMMAND_LATENCY, REGISTRY, STAGE_LATENCY, profiler
+from session_state import LiveSession, state_store
+
+TICK_MS = float(os.getenv("ACTOR_TICK_MS", "50"))
+SNAPSHOT_RECENT_EVENTS = 20  # Historial incluido en el snapshot de resincronización
+
+logger = logging.getLogger(__name__)
+
+
+class SessionActor:
+    def __init__(self, sala: LiveSession, tick_ms: float = TICK_MS):
+        self.sala = sala
+        self.session_id = sala.session_id
+        self.tick = tick_ms / 1000
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        self.closed = False   # Ya drenó su cola y salió de `actors`: no acepta más comandos
+        # Salida pendiente del tick actual
+        self._pending: List[str] = []
+        self._pending_critical = False
+        self._ranking_dirty = False
+        self._sent_seq = sala.journal.last_seq   # Último seq ya difundido (lo posterior está en _pending)
+        self._release_due = False   # Sin presencia: soltar la sala al cerrar el tick (ver _run)
+        self._received: List[tuple] = []   # (comando, instante de llegada) para la latencia por comando
+        # Sockets de la sala abiertos en cualquier proceso (JOIN +1 / LEAVE -1)
+        self.presence = 0
+        self._presence_due = False   # Cambió la presencia: los espectadores la reciben con el próximo envelope
+        # Delta de estadísticas: como mucho uno cada STATS_PUSH_MS
+        self._stats_interval = STATS_PUSH_MS / 1000
+        self._stats_timer: Optional[asyncio.TimerHandle] = None
+        self._stats_due = False
+        self._last_stats_push = 0.0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    def submit(self, player_id: str, kind: str, raw_msg: str = ""):
+        """Encola un comando (no bloquea). kind: MSG (texto del socket) | JOIN | LEAVE | WATCH | STATS | RESET | STOP."""
+        self.inbox.put_nowait((player_id, kind, raw_msg, time.perf_counter()))
+
+    async def stop(self):
+        """Pide al actor que termine (después de lo que ya esté en cola) y espera a que drene."""
+        if self.task is None: return
+        if not self.closed: self.submit("", "STOP")
+        # shield: si cancelan a quien espera, el actor termina igual de drenar
+        await asyncio.shield(self.task)
+
+    # --- BUCLE DEL ACTOR ---
+    async def _run(self):
+        # Nunca se cancela: un comando a medias (RESET, resincronización) no se interrumpe
+        try:
+            parar = False
+            while not parar:
+                comando = await self.inbox.get()
+                parar = comando[1] == "STOP"
+                if not parar: await self._apply(*comando)
+
+                # Agrupar todo lo que llegue durante el tick
+                deadline = time.monotonic() + self.tick
+                while not parar and (restante := deadline - time.monotonic()) > 0:
+                    try:
+                        comando = await asyncio.wait_for(self.inbox.get(), timeout=restante)
+                    except asyncio.TimeoutError:
+                        break
+                    parar = comando[1] == "STOP"
+                    if not parar: await self._apply(*comando)
+                await self._flush()
+
+                # La sala se suelta desde aquí, no desde una tarea aparte: el comando
+                # que dejó la presencia en cero (p. ej. un RESET) ya terminó y se difundió
+                if self._release_due and not parar:
+                    self._release_due = False
+                    if self.presence <= 0 and await self._close(liberar=True):
+                        await _soltar(self.session_id)
+                        return
+            await self._close()
+        finally:
+            self._unregister()
+
+    async def _close(self, liberar: bool = False) -> bool:
+        """Drena la cola (también lo que llegue mientras se difunde) y da de baja el actor. liberar=True: se echa atrás si alguien entra."""
+        if self._stats_timer: self._stats_timer.cancel()
+        self._stats_timer = None
+        # Lo último que cambió sale ya, sin esperar al intervalo de estadísticas
+        self._stats_due = self.sala.stats.has_changes
+        while True:
+            while not self.inbox.empty():
+                comando = self.inbox.get_nowait()
+                if comando[1] == "STOP": liberar = False   # Alguien espera en stop(): hay que terminar
+                else: await self._apply(*comando)
+            await self._flush()
+            if liberar and self.presence > 0: return False
+            if self.inbox.empty(): break
+        # Sin await desde la última comprobación: ningún comando quedó en esta cola
+        self._unregister()
+        return True
+
+    def _unregister(self):
+        self.closed = True
+        if actors.get(self.session_id) is self:
+            del actors[self.session_id]
+
+    async def _apply(self, player_id: str, kind: str, raw_msg: str, received: float):
+        try:
+            if kind == "JOIN":
+                # El recién llegado recibe el ranking completo al cerrar el tick
+                self.presence += 1
+                self._ranking_dirty = self._presence_due = True
+                self._schedule_stats()
+                if raw_msg: await self._resync(player_id, loads(raw_msg))
+                return
+            if kind == "WATCH":
+                # Primer espectador en algún proceso: estado completo para su proyección
+                await bus.publish(self.session_id, {"frames": [], "critical": False, "ranking": None, "watch": self._watch_snapshot()})
+                self._release_due = self.presence <= 0
+                return
+            if kind == "RESET":
+                # Nueva partida: los jugadores conectados reciben el aviso y el ranking en cero
+                await state_store.reset(self.sala)
+                # Los dados siguen donde iban: el cursor permite repetir la partida desde aquí
+                self._pending.append(self.sala.journal.append(
+                    {"type": "SESSION_RESET", "payload": {"dice_cursor": self.sala.dice.cursor}, "message": "🔄 El profesor reinició la partida"},
+                    command="RESET"))
+                self._pending_critical = self._ranking_dirty = True
+                await bus.publish(self.session_id, {"frames": [], "critical": False, "ranking": None, "watch": self._watch_snapshot()})
+                self._release_due = self.presence <= 0
+                return
+            if kind == "STATS":
+                # Venció el intervalo: el delta sale con el próximo envelope
+                self._stats_timer = None
+                self._stats_due = True
+                return
+            if kind == "LEAVE":
+                self.presence -= 1
+                self._presence_due = True
+                self._release_due = self.presence <= 0
+                return
+
+            jugador = self.sala.players.get(player_id)
+            if not jugador: return
+
+            comando = parse_command(raw_msg)
+            with profiler.scope(self.session_id), STAGE_LATENCY.time(stage="logic"):
+                stats = self.sala.stats
+                if comando == "ROLL":
+                    mensajes = resolver_roll(jugador, self.sala.dice.roll(), self.sala.salary, self.sala.winning_score, self.sala.board)
+                    stats.record(jugador.position, HITS)
+                elif comando == "BUY":
+                    flujo_antes = jugador.financials.passive_income
+                    mensajes = resolver_buy(jugador, self.sala.winning_score, self.sala.board)
+                    if jugador.financials.passive_income != flujo_antes: stats.record(jugador.position, BUYS)
+                elif comando == "PASS":
+                    mensajes = resolver_pass(jugador, self.sala.winning_score, self.sala.board)
+                    if self.sala.board.casillas[jugador.position].inversion: stats.record(jugador.position, PASSES)
+                else:
+                    mensajes = [mensaje_chat(jugador, raw_msg)]
+
+                if comando != "CHAT":
+                    state_store.mark_dirty(jugador)
+                    self._ranking_dirty = True
+                    self._schedule_stats()
+                journal = self.sala.journal
+                for i, msg in enumerate(mensajes):
+                    self._pending.append(journal.append(msg, player_id, comando) if i == 0 else journal.append(msg))
+                    self._pending_critical |= msg["type"] not in DROPPABLE_TYPES
+            self._received.append((comando, received))
+        except Exception as e:
+            ACTOR_ERRORS.inc(command=kind)
+            logger.exception(f"--- 🔴 ACTOR {self.session_id}: Error procesando '{raw_msg}' ({e}) ---")
+
+    async def _resync(self, player_id: str, datos: dict):
+        """Reconexión: reenviar solo lo perdido desde last_seq, o un snapshot si quedó muy atrás."""
+        last_seq = datos.get("last_seq")
+        if last_seq is None: return
+        journal = self.sala.journal
+        # Solo hasta lo ya difundido: lo pendiente de este tick le llega con el próximo _flush
+        frames = journal.since(int(last_seq), self._sent_seq)
+        if frames is None:
+            jugador = self.sala.players.get(player_id)
+            frames = [encode({
+                "type": "SNAPSHOT",
+                "seq": self._sent_seq,
+                "payload": {
+                    "player": estado_jugador(jugador, self.sala.winning_score) if jugador else None,
+                    "recent": [loads(f) for f in journal.recent(SNAPSHOT_RECENT_EVENTS, self._sent_seq)],
+                }
+            })]
+        if frames:
+            # Envelope dirigido solo a la conexión que se reconectó
+            await bus.publish(self.session_id, {"frames": frames, "critical": True, "ranking": None, "conn": datos.get("conn")})
+
+    def _schedule_stats(self):
+        """Programa el próximo delta de estadísticas (respetando el intervalo mínimo)."""
+        if self._stats_timer or self._stats_due or not self.sala.stats.has_changes: return
+        espera = max(0.0, self._last_stats_push + self._stats_interval - time.monotonic())
+        self._stats_timer = asyncio.get_running_loop().call_later(espera, self.submit, "", "STATS")
+
+    def _watch_snapshot(self) -> dict:
+        """Tablero, ranking y actividad reciente para los espectadores (ver spectators.Projection)."""
+        journal = self.sala.journal
+        return {
+            "players": [{"id": pid, "nickname": j.nickname, "position": j.position} for pid, j in self.sala.players.items()],
+            "rows": [fila for _, fila, _ in self.sala.leaderboard.snapshot()],
+            "recent": journal.recent(SNAPSHOT_RECENT_EVENTS),
+            "seq": journal.last_seq,
+            "stats": self.sala.stats.to_dict(),
+            "presence": self.presence,
+        }
+
+    async def _flush(self):
+        """Un frame por cliente con todos los mensajes del tick (+ ranking al final)."""
+        if not self._pending and not self._ranking_dirty and not self._stats_due and not self._presence_due: return
+
+        with profiler.scope(self.session_id):
+            envelope = {"frames": self._pending, "critical": self._pending_critical, "ranking": None}
+            if self._ranking_dirty:
+                ranking = self.sala.leaderboard
+                envelope["ranking"] = {"rows": ranking.snapshot(), "delta": ranking.delta_frame()}
+            if self._stats_due:
+                # Solo lo usan las proyecciones de espectadores (ver spectators.py)
+                envelope["stats"] = self.sala.stats.delta()
+                self._stats_due, self._last_stats_push = False, time.monotonic()
+            if self._presence_due:
+                envelope["presence"] = self.presence   # Solo para espectadores (alumnos conectados)
+                self._presence_due = False
+            self._pending, self._pending_critical, self._ranking_dirty = [], False, False
+            self._sent_seq = self.sala.journal.last_seq
+        # Fuera del scope: durante el await corren otros actores (profiler.scope es solo para código síncrono)
+        await bus.publish(self.session_id, envelope)
+
+        ahora = time.perf_counter()
+        for comando, received in self._received:
+            COMMAND_LATENCY.observe(ahora - received, command=comando)
+        self._received.clear()
+
+
+# --- REGISTRO DE ACTORES ---
+actors: Dict[str, SessionActor] = {}
+
+REGISTRY.callback("lobos_actors_running", "Actores de sala activos en este proceso", lambda: len(actors))
+REGISTRY.callback("lobos_actor_inbox_depth", "Comandos en espera sumando los inbox de todos los actores",
+                  lambda: sum(a.inbox.qsize() for a in actors.values()))
+REGISTRY.callback("lobos_actor_inbox_max", "Inbox de actor más largo", lambda: max((a.inbox.qsize() for a in actors.values()), default=0))
+
+
+async def get_actor(sala: LiveSession) -> SessionActor:
+    """Actor de la sala (lo crea si hace falta). Sin await si ya existe: encolar a continuación es atómico."""
+    heredada = 0
+    while (actor := actors.get(sala.session_id)) is not None and actor.sala is not sala:
+        # Actor sobre una carga anterior de la sala: se drena antes de reemplazarlo y se hereda su presencia
+        await actor.stop()
+        heredada, actor.presence = heredada + actor.presence, 0
+    if actor is None:
+        actor = SessionActor(sala)
+        actors[sala.session_id] = actor
+        actor.start()
+    actor.presence += heredada
+    return actor
+
+
+async def stop_actor(session_id: str):
+    """Detiene el actor de la sala; sigue recibiendo comandos en su cola hasta terminar de drenarla."""
+    actor = actors.get(session_id)
+    if actor: await actor.stop()
+
+
+async def stop_all():
+    for session_id in list(actors):
+        await stop_actor(session_id)
+
+
+# --- ENRUTAMIENTO (este proceso es el dueño de la sala) ---
+async def route_command(session_id: str, player_id: str, kind: str, raw_msg: str):
+    """Llega un comando para una sala propia: cargar su estado si hace falta y encolarlo."""
+    if kind == "DELETE":
+        await delete_session(session_id)
+        return
+    if kind == "LEAVE" and session_id not in state_store.sessions:
+        return  # La sala ya se liberó (inactiva o borrada): no hace falta cargarla
+    sala = await state_store.load_session(session_id)
+    if kind == "JOIN" and player_id not in sala.players:
+        # Registrado por otro proceso después de cargar la sala
+        await state_store.get_player(player_id)
+        # La sala pudo soltarse (y recargarse) mientras se leía el jugador
+        sala = await state_store.load_session(session_id)
+    sala.last_activity = time.monotonic()
+    # Sin await entre obtener la sala y encolar: release() verá el actor y no la soltará
+    (await get_actor(sala)).submit(player_id, kind, raw_msg)
+
+
+async def release_session(session_id: str):
+    """Sala sin sockets en ningún proceso: detener el actor, volcar a Mongo y soltarla."""
+    actor = actors.get(session_id)
+    if actor is None or actor.presence > 0: return
+    await actor.stop()
+    if actor.presence > 0:
+        # Alguien entró mientras se drenaba la cola: la sala sigue viva con un actor nuevo
+        presencia, actor.presence = actor.presence, 0
+        (await get_actor(actor.sala)).presence += presencia
+        return
+    await _soltar(session_id)
+
+
+async def _soltar(session_id: str):
+    """Vuelca y suelta la sala, salvo que un comando le haya dado actor mientras se volcaba."""
+    if await state_store.release(session_id, in_use=lambda: session_id in actors):
+        await bus.release(session_id)
+
+
+async def evict_session(session_id: str):
+    """Sala inactiva: se suelta aunque la presencia no haya vuelto a cero (LEAVE perdido de un worker caído)."""
+    actor = actors.get(session_id)
+    if actor:
+        actor.presence = 0
+        await release_session(session_id)
+    else:
+        await _soltar(session_id)
+
+
+async def lose_session(session_id: str):
+    """Otro nodo se quedó con la sala (lease vencido): detener el actor, volcar lo aplicado y olvidarla sin soltarla en el bus."""
+    await stop_actor(session_id)
+    await state_store.release(session_id, in_use=lambda: session_id in actors)
+
+
+async def delete_session(session_id: str):
+    """Borra la sala: cierra sus sockets en todos los procesos y elimina sus datos de Mongo."""
+    await stop_actor(session_id)
+    await bus.publish(session_id, {"frames": [], "critical": False, "ranking": None, "closed": True})
+    await state_store.purge(session_id)
+    await bus.release(session_id)
@@ -0,0 +1,63 @@
+# ==============================================================================
+# 📄 ARCHIVO: session_cache.py
+# 🔍 ROL: Caché en proceso código de sala -> GameSession
+# ==============================================================================
+# Cuando toda la clase se une a la vez, cada /players resolvía el código con un
+# find_one. Aquí se resuelve una sola vez por proceso. Solo se guardan aciertos
+# (una sala creada en otro worker se encuentra en la siguiente consulta) y cada
+# entrada caduca a los SESSION_CACHE_TTL segundos por si otro worker la borra.
+
+import asyncio
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from models import GameSession
+
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "60"))
+
+
+class SessionCodeCache:
+    def __init__(self, ttl: float = SESSION_CACHE_TTL):
+        self.ttl = ttl
+        self._by_code: Dict[str, Tuple[GameSession, float]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get(self, code: str) -> Optional[GameSession]:
+        entrada = self._by_code.get(code)
+        if entrada and entrada[1] > time.monotonic():
+            return entrada[0]
+
+        # Una sola consulta aunque lleguen 60 alumnos con el mismo código a la vez
+        pendiente = self._inflight.get(code)
+        if pendiente: return await asyncio.shield(pendiente)
+        pendiente = self._inflight[code] = asyncio.get_running_loop().create_future()
+        try:
+            sesion = await GameSession.find_one(GameSession.code == code)
+            if sesion: self.put(sesion)
+            pendiente.set_result(sesion)
+            return sesion
+        except Exception as e:
+            pendiente.set_exception(e)
+            pendiente.exception()  # Marcada como recuperada si nadie más esperaba
+            raise
+        finally:
+            del self._inflight[code]
+
+    def put(self, sesion: GameSession):
+        self._by_code[sesion.code] = (sesion, time.monotonic() + self.ttl)
+
+    def invalidate(self, code: Optional[str] = None):
+        """Olvida una sala (o todas si no se indica código)."""
+        if code is None:
+            self._by_code.clear()
+        else:
+            self._by_code.pop(code, None)
+
+    def forget(self, session_id: str):
+        """Olvida una sala por su id (cuando se borra desde otro proceso solo se conoce el id)."""
+        for code, (sesion, _) in list(self._by_code.items()):
+            if str(sesion.id) == session_id: del self._by_code[code]
+
+
+session_codes = SessionCodeCache()
@@ -0,0 +1,326 @@
+# ==============================================================================
+# 📄 ARCHIVO: session_state.py
+# 🔍 ROL: Estado en memoria de las salas activas + persistencia diferida (write-behind)
+# ==============================================================================
+# Mientras una sala está viva, los objetos Player/FinancialState en memoria son
+# la fuente de verdad. Mongo se actualiza por lotes (bulk write) cada cierto
+# tiempo, cuando la sala queda inactiva o cuando el servidor se apaga.
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from beanie import PydanticObjectId
+from beanie.odm.bulk import BulkWriter
+from pymongo.errors import BulkWriteError
+
+from models import Player, GameSession, JournalEntry, FinancialState
+from leaderboard import Leaderboard
+from analytics import SessionStats
+from board import CompiledBoard, DEFAULT_BOARD, boards
+from dice import DiceStream, new_seed
+from journal import SessionJournal
+from metrics import REGISTRY, STAGE_LATENCY
+
+# Ventana de seguridad ante caídas (configurable por entorno)
+FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", "2.0"))   # segundos entre volcados
+MAX_DIRTY_AGE = float(os.getenv("STATE_MAX_DIRTY_AGE", "5.0"))     # antigüedad máx. de un cambio sin guardar
+
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "10"))       # segundos (salas que no están en memoria)
+
+DUPLICATE_KEY = 11000
+
+DEFAULT_SALARY = 250000            # centavos ($2,500.00)
+DEFAULT_WINNING_SCORE = 100000000  # centavos ($1,000,000.00)
+
+logger = logging.getLogger(__name__)
+
+
+class LiveSession:
+    """Jugadores y configuración de una sala cargada en memoria."""
+
+    def __init__(self, session_id: str, sesion: Optional[GameSession], tablero: CompiledBoard = DEFAULT_BOARD):
+        self.session_id = session_id
+        self.board = tablero
+        self.salary = sesion.salary if sesion else DEFAULT_SALARY
+        self.winning_score = sesion.winning_score if sesion else DEFAULT_WINNING_SCORE
+        self.dice = DiceStream(sesion.seed, sesion.dice_cursor) if sesion else DiceStream(new_seed())
+        self.players: Dict[str, Player] = {}
+        # player_id -> instante (monotonic) del primer cambio pendiente
+        self.dirty: Dict[str, float] = {}
+        self.leaderboard = Leaderboard()
+        self.stats = SessionStats(sesion.square_stats if sesion else None, tablero)
+        self.journal = SessionJournal(session_id)
+        self.last_activity = time.monotonic()  # Último comando recibido (ver lifecycle.py)
+
+    def add(self, jugador: Player):
+        if str(jugador.id) not in self.players:
+            self.players[str(jugador.id)] = jugador
+            self.leaderboard.update(jugador)
+            self.stats.update(jugador)
+
+
+class SessionStateStore:
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, max_dirty_age: float = MAX_DIRTY_AGE):
+        self.flush_interval = flush_interval
+        self.max_dirty_age = max_dirty_age
+        self.sessions: Dict[str, LiveSession] = {}
+        self._player_index: Dict[str, str] = {}   # player_id -> session_id
+        self._load_locks: Dict[str, asyncio.Lock] = {}
+        self._stats_cache: Dict[str, Tuple[str, float]] = {}   # session_id -> (json, válido_hasta)
+        self._wake = asyncio.Event()
+        # Un volcado a la vez: lo que un volcado ya tomó no puede escribirse después de un reset
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._last_flush = time.monotonic()
+
+    # --- CICLO DE VIDA ---
+    async def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def shutdown(self):
+        """Detiene el volcador y guarda todo lo pendiente."""
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    async def release(self, session_id: str, in_use: Callable[[], bool] = lambda: False) -> bool:
+        """La sala quedó sin sockets: guardar y liberar su memoria. Devuelve True si se soltó."""
+        # Bajo el mismo lock que la carga; in_use() se vuelve a consultar DESPUÉS del volcado
+        # (un JOIN que llegó mientras tanto ya tiene actor sobre esta sala y no se le puede quitar)
+        lock = self._load_locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            live = self.sessions.get(session_id)
+            if not live: return False
+            await self.flush(session_id)
+            if in_use(): return False
+            if live.dirty or live.journal.has_pending or live.stats.has_increments: return False  # El volcado falló; se conserva para el siguiente intento
+            del self.sessions[session_id]
+            self._load_locks.pop(session_id, None)
+            self._stats_cache.pop(session_id, None)
+            for pid in live.players:
+                self._player_index.pop(pid, None)
+            return True
+
+    def discard(self, session_id: str):
+        """Olvida la sala SIN volcarla (se va a borrar)."""
+        live = self.sessions.pop(session_id, None)
+        self._load_locks.pop(session_id, None)
+        self._stats_cache.pop(session_id, None)
+        if live:
+            for pid in live.players:
+                self._player_index.pop(pid, None)
+
+    async def purge(self, session_id: str):
+        """Borra la sala de memoria y de Mongo (jugadores, bitácora y documento de la sesión)."""
+        self.discard(session_id)
+        await Player.find(Player.session_id == session_id).delete()
+        await JournalEntry.find(JournalEntry.session_id == session_id).delete()
+        await GameSession.find_one(GameSession.id == PydanticObjectId(session_id)).delete()
+
+    async def reset(self, live: LiveSession):
+        """Nueva partida en la misma sala: todos a la salida con cero, sin bitácora ni contadores."""
+        inicial = FinancialState()
+        # Bajo el lock de volcado: ningún volcado en curso tiene datos de la partida anterior por escribir,
+        # y los que vengan después ya no encuentran nada de ella (dirty, bitácora y contadores se descartan)
+        async with self._flush_lock:
+            for jugador in live.players.values():
+                jugador.position, jugador.laps_completed, jugador.financials = 0, 0, inicial.model_copy()
+            live.dirty.clear()
+            live.leaderboard.rebuild(live.players.values())
+            live.stats = SessionStats.from_players(live.players.values(), tablero=live.board)
+            live.journal.clear()
+            # Todos los jugadores de la sala, también los registrados en otro proceso y aún no cargados
+            await Player.find(Player.session_id == live.session_id).update({"$set": {
+                "position": 0, "laps_completed": 0, "financials": inicial.model_dump(by_alias=True)}})
+            await JournalEntry.find(JournalEntry.session_id == live.session_id).delete()
+            await GameSession.find_one(GameSession.id == PydanticObjectId(live.session_id)).update({"$set": {
+                "square_stats": {}, "last_activity_at": datetime.now(), "is_active": True}})
+
+    # --- LECTURA ---
+    async def load_session(self, session_id: str) -> LiveSession:
+        while True:
+            live = self.sessions.get(session_id)
+            if live: return live
+
+            lock = self._load_locks.setdefault(session_id, asyncio.Lock())
+            async with lock:
+                if self._load_locks.get(session_id) is not lock: continue  # Se soltó la sala mientras se esperaba el lock
+                live = self.sessions.get(session_id)
+                if live: return live
+
+                with STAGE_LATENCY.time(stage="db_read"):
+                    sesion = await GameSession.get(session_id)
+                    tablero = await boards.for_session(sesion.board_id if sesion else None)
+                    live = LiveSession(session_id, sesion, tablero)
+                    live.journal = await SessionJournal.open(session_id)
+                    jugadores = await Player.find(Player.session_id == session_id).to_list()
+                for jugador in jugadores:
+                    live.add(jugador)
+                self.sessions[session_id] = live
+                for pid in live.players:
+                    self._player_index[pid] = session_id
+                return live
+
+    async def get_player(self, player_id: str) -> Optional[Player]:
+        session_id = self._player_index.get(player_id)
+        if session_id and session_id in self.sessions:
+            return self.sessions[session_id].players.get(player_id)
+
+        # Cold start: el jugador (y su sala) aún no están en memoria
+        with STAGE_LATENCY.time(stage="db_read"):
+            jugador = await Player.get(player_id)
+        if not jugador: return None
+        live = await self.load_session(jugador.session_id)
+        if player_id not in live.players:
+            live.add(jugador)
+            self._player_index[player_id] = jugador.session_id
+        return live.players[player_id]
+
+    async def session_of(self, player_id: str) -> Optional[str]:
+        """Sala de un jugador sin cargarla (puede pertenecer a otro proceso)."""
+        session_id = self._player_index.get(player_id)
+        if session_id: return session_id
+        with STAGE_LATENCY.time(stage="db_read"):
+            jugador = await Player.get(player_id)
+        return jugador.session_id if jugador else None
+
+    async def stats_json(self, session_id: str) -> str:
+        """Estadísticas de la sala: las vivas si está en memoria; si no, calculadas una vez y cacheadas."""
+        live = self.sessions.get(session_id)
+        if live: return live.stats.json()
+
+        cache = self._stats_cache.get(session_id)
+        if cache and cache[1] > time.monotonic(): return cache[0]
+        with STAGE_LATENCY.time(stage="db_read"):
+            sesion = await GameSession.get(session_id)
+            jugadores = await Player.find(Player.session_id == session_id).to_list()
+        tablero = await boards.for_session(sesion.board_id if sesion else None)
+        texto = SessionStats.from_players(jugadores, sesion.square_stats if sesion else None, tablero).json()
+        self._stats_cache[session_id] = (texto, time.monotonic() + STATS_CACHE_TTL)
+        return texto
+
+    def add_player(self, jugador: Player):
+        """Registra un jugador recién creado si su sala ya está en memoria."""
+        live = self.sessions.get(jugador.session_id)
+        if live:
+            live.add(jugador)
+            self._player_index[str(jugador.id)] = jugador.session_id
+
+    # --- ESCRITURA DIFERIDA ---
+    def mark_dirty(self, jugador: Player):
+        live = self.sessions.get(jugador.session_id)
+        if not live: return
+        live.dirty.setdefault(str(jugador.id), time.monotonic())
+        live.leaderboard.update(jugador)
+        live.stats.update(jugador)
+        # Si el volcador duerme más de lo que permite MAX_DIRTY_AGE, lo despertamos a tiempo
+        self._wake.set()
+
+    async def flush(self, session_id: Optional[str] = None):
+        """Vuelca en un único bulk write los jugadores modificados (+ bitácora y contadores por casilla)."""
+        async with self._flush_lock:
+            await self._flush_now(session_id)
+
+    async def _flush_now(self, session_id: Optional[str]):
+        targets = [self.sessions[session_id]] if session_id in self.sessions else (
+            [] if session_id else list(self.sessions.values()))
+
+        pendientes = []
+        for live in targets:
+            for pid, since in live.dirty.items():
+                jugador = live.players.get(pid)
+                if jugador: pendientes.append((live, pid, since, jugador))
+            live.dirty.clear()
+        if not session_id: self._last_flush = time.monotonic()
+
+        # Salas con jugadas desde el último volcado: contadores por casilla + marca de actividad
+        con_jugadas = {live.session_id for live, *_ in pendientes}
+        sesiones = [(live, live.stats.take_increments()) for live in targets]
+        sesiones = [(live, incs) for live, incs in sesiones if incs or live.session_id in con_jugadas]
+        if not pendientes and not sesiones and not any(live.journal.has_pending for live in targets): return
+        with STAGE_LATENCY.time(stage="persist"):
+            await self._flush_journal(targets)
+            if pendientes: await self._flush_players(pendientes)
+            if sesiones: await self._flush_sessions(sesiones)
+
+    async def _flush_players(self, pendientes):
+        try:
+            async with BulkWriter(ordered=False) as bulk_writer:
+                for _, _, _, jugador in pendientes:
+                    await jugador.set({
+                        Player.position: jugador.position,
+                        Player.laps_completed: jugador.laps_completed,
+                        Player.financials: jugador.financials
+                    }, bulk_writer=bulk_writer)
+        except Exception as e:
+            # Reencolar conservando la antigüedad original
+            for live, pid, since, _ in pendientes:
+                live.dirty[pid] = min(since, live.dirty.get(pid, since))
+            logger.error(f"--- 🔴 STATE: Falló el volcado a Mongo ({e}) ---")
+
+    async def _flush_journal(self, targets):
+        lotes = [(live, live.journal.take_pending()) for live in targets]
+        entradas = [e for _, lote in lotes for e in lote]
+        if not entradas: return
+        try:
+            await JournalEntry.insert_many(entradas, ordered=False)
+        except Exception as e:
+            errores = e.details.get("writeErrors", []) if isinstance(e, BulkWriteError) else None
+            if errores and all(err.get("code") == DUPLICATE_KEY for err in errores):
+                return  # Reintento de un lote parcialmente insertado: lo repetido se ignora
+            for live, lote in lotes:
+                live.journal.restore_pending(lote)
+            logger.error(f"--- 🔴 STATE: Falló el volcado de la bitácora ({e}) ---")
+
+    async def _flush_sessions(self, sesiones):
+        ahora = datetime.now()
+        try:
+            async with BulkWriter(ordered=False) as bulk_writer:
+                for live, incs in sesiones:
+                    # $inc: correcto aunque otro proceso haya sido dueño de la sala antes
+                    # La semilla se reescribe por las salas anteriores a dice.py (su seed no estaba guardada)
+                    cambios = {"$set": {"last_activity_at": ahora, "is_active": True, "seed": live.dice.seed, "dice_cursor": live.dice.cursor}}
+                    if incs: cambios["$inc"] = incs
+                    await GameSession.find_one(GameSession.id == PydanticObjectId(live.session_id)).update(cambios, bulk_writer=bulk_writer)
+        except Exception as e:
+            for live, incs in sesiones:
+                live.stats.restore_increments(incs)
+            logger.error(f"--- 🔴 STATE: Falló el volcado de las salas ({e}) ---")
+
+    def _next_deadline(self) -> float:
+        deadline = self._last_flush + self.flush_interval
+        for live in self.sessions.values():
+            if live.dirty:
+                deadline = min(deadline, min(live.dirty.values()) + self.max_dirty_age)
+        return deadline
+
+    async def _run(self):
+        while True:
+            timeout = max(0.0, self._next_deadline() - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                self._wake.clear()
+                continue  # Solo recalcular el plazo con el nuevo cambio pendiente
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception(f"--- 🔴 STATE: Error en el volcador ({e}) ---")
+
+
+state_store = SessionStateStore()
+
+REGISTRY.callback("lobos_sessions_loaded", "Salas con estado vivo en este proceso", lambda: len(state_store.sessions))
+REGISTRY.callback("lobos_players_dirty", "Jugadores con cambios aún no volcados a Mongo",
+                  lambda: sum(len(live.dirty) for live in state_store.sessions.values()))
@@ -0,0 +1,365 @@
+# ==============================================================================
+# 📄 ARCHIVO: simulator.py
+# 🔍 ROL: Simulador Monte Carlo vectorizado (NumPy) para balancear el tablero
+# ==============================================================================
+# Juega miles de partidas a la vez sin servidor ni Mongo: cada columna de las
+# matrices (partidas x jugadores) es un jugador y todo el dinero va en centavos
+# (int64). Las reglas son las del juego real:
+#   - Casillas, costos y flujos: el tablero compilado (board.CompiledBoard)
+#   - Payday e interés 5% ROUND_HALF_UP: Player.apply_payday_logic
+#   - Patrimonio = caja + ingreso pasivo x ASSET_MULTIPLIER - deuda
+# Orden de juego: en cada ronda tiran los jugadores 0..P-1; la partida termina
+# con el primer mensaje VICTORY (igual que lo vería la sala).
+#
+# Paridad: `partidas_en_vivo` repite los MISMOS dados con game_engine y las
+# reglas de models.py; `verificar_paridad` compara ambos resultados.
+#
+# Uso:
+#   python simulator.py --games 100000 --players 4 --strategy siempre --verify 16 --board clasico
+
+import argparse
+import time
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from board import BUILTIN_BOARDS, CompiledBoard, DEFAULT_BOARD
+from game_engine import ASSET_MULTIPLIER, resolver_buy, resolver_pass, resolver_roll
+from models import FinancialState, Player
+from money import to_cents
+
+NEUTRO, LOBO_NEGRO, LOBO_BLANCO = 0, 1, 2
+_TIPOS = {"LOBO_NEGRO": LOBO_NEGRO, "LOBO_BLANCO": LOBO_BLANCO}
+
+
+class Tablas:
+    """Tablero compilado como arrays indexados por casilla (0..size)."""
+
+    def __init__(self, tablero: CompiledBoard):
+        self.tablero = tablero
+        self.size = tablero.size
+        self.tipo = np.array([_TIPOS.get(c.tipo, NEUTRO) for c in tablero.casillas], dtype=np.int8)
+        self.costo = np.array([c.costo for c in tablero.casillas], dtype=np.int64)
+        self.flujo = np.array([c.flujo for c in tablero.casillas], dtype=np.int64)
+        # Inversiones: casilla -> columna de la matriz de tenencias (para ROI por casilla)
+        self.inversiones = np.flatnonzero(self.tipo == LOBO_BLANCO)
+        self.columna_inversion = np.full(self.size + 1, -1, dtype=np.int64)
+        self.columna_inversion[self.inversiones] = np.arange(len(self.inversiones))
+
+MULTIPLICADOR = int(ASSET_MULTIPLIER)
+
+
+# --- ESTRATEGIAS ---
+# Firma: (caja, deuda, pasivo, costo, flujo) en centavos -> máscara bool "quiere comprar".
+# Reciben arrays, así la misma función sirve para miles de partidas o para una sola.
+Estrategia = Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+
+def siempre(caja, deuda, pasivo, costo, flujo):
+    return np.ones(caja.shape, dtype=bool)
+
+
+def nunca(caja, deuda, pasivo, costo, flujo):
+    return np.zeros(caja.shape, dtype=bool)
+
+
+def reserva(minimo: int = 100000) -> Estrategia:
+    """Compra solo si después le quedan al menos `minimo` centavos en caja."""
+    def decidir(caja, deuda, pasivo, costo, flujo):
+        return caja - costo >= minimo
+    return decidir
+
+
+def sin_deuda(caja, deuda, pasivo, costo, flujo):
+    """Compra solo mientras no tenga deuda tóxica."""
+    return deuda == 0
+
+
+def retorno(max_vueltas: int = 5) -> Estrategia:
+    """Compra si la inversión se paga en `max_vueltas` paydays o menos."""
+    def decidir(caja, deuda, pasivo, costo, flujo):
+        return costo <= flujo * max_vueltas
+    return decidir
+
+
+ESTRATEGIAS: Dict[str, Estrategia] = {
+    "siempre": siempre,
+    "nunca": nunca,
+    "reserva": reserva(),
+    "sin_deuda": sin_deuda,
+    "retorno": retorno(),
+}
+
+
+def tirada(rng: np.random.Generator, partidas: int, jugadores: int) -> np.ndarray:
+    """Dados de UNA ronda para todas las partidas (simulación y referencia usan esta misma función)."""
+    return rng.integers(1, 7, size=(partidas, jugadores), dtype=np.int64)
+
+
+def _interes(deuda: np.ndarray) -> np.ndarray:
+    """5% de la deuda redondeado al centavo con ROUND_HALF_UP (deuda >= 0)."""
+    return (deuda * 5 + 50) // 100
+
+
+# --- SIMULACIÓN VECTORIZADA ---
+def simular(partidas: int, jugadores: int = 4, estrategia: Estrategia = siempre, seed: int = 0,
+            salario=Decimal("2500.00"), meta=Decimal("1000000.00"), max_rondas: int = 3000,
+            tablero: CompiledBoard = DEFAULT_BOARD) -> dict:
+    rng = np.random.default_rng(seed)
+    salario_c, meta_c = to_cents(salario), to_cents(meta)
+    t = Tablas(tablero)
+    TIPO, COSTO, FLUJO, INVERSIONES, COLUMNA_INVERSION = t.tipo, t.costo, t.flujo, t.inversiones, t.columna_inversion
+    N = t.size
+    G, P, S = partidas, jugadores, len(INVERSIONES)
+
+    # Estado de trabajo (solo partidas vivas; se compacta a medida que terminan)
+    idx = np.arange(G)
+    caja = np.zeros((G, P), dtype=np.int64)
+    deuda = np.zeros((G, P), dtype=np.int64)
+    pasivo = np.zeros((G, P), dtype=np.int64)
+    posicion = np.zeros((G, P), dtype=np.int64)
+    vueltas = np.zeros((G, P), dtype=np.int64)
+    tenencias = np.zeros((G, P, S), dtype=np.int64)
+
+    # Resultados por partida (en el orden original)
+    fin = {k: np.zeros((G, P), dtype=np.int64) for k in ("cash", "debt", "passive", "position", "laps")}
+    rondas = np.full(G, -1, dtype=np.int64)     # -1 = sin ganador antes de max_rondas
+    ganador = np.full(G, -1, dtype=np.int64)
+
+    # Estadísticas por casilla
+    caidas = np.zeros(N + 1, dtype=np.int64)
+    compras = np.zeros(N + 1, dtype=np.int64)
+    sin_fondos = np.zeros(N + 1, dtype=np.int64)
+    deuda_generada = np.zeros(N + 1, dtype=np.int64)
+    rentas = np.zeros(S, dtype=np.int64)
+    turnos_jugados = 0
+
+    def guardar(filas: np.ndarray):
+        destino = idx[filas]
+        fin["cash"][destino] = caja[filas]; fin["debt"][destino] = deuda[filas]
+        fin["passive"][destino] = pasivo[filas]; fin["position"][destino] = posicion[filas]
+        fin["laps"][destino] = vueltas[filas]
+
+    inicio = time.perf_counter()
+    for ronda in range(max_rondas):
+        if len(idx) == 0: break
+        dados = tirada(rng, G, P)[idx]
+        vivas = np.ones(len(idx), dtype=bool)
+
+        for p in range(P):
+            n_vivas = int(vivas.sum())
+            if n_vivas == 0: break
+            turnos_jugados += n_vivas
+
+            # Movimiento + Payday
+            nueva = posicion[:, p] + np.where(vivas, dados[:, p], 0)
+            payday = nueva > N
+            posicion[:, p] = np.where(payday, nueva - N, nueva)
+            vueltas[:, p] += payday
+            if payday.any():
+                rentas += tenencias[payday, p, :].sum(axis=0) * FLUJO[INVERSIONES]
+                caja[:, p] += np.where(payday, salario_c + pasivo[:, p], 0)
+                deuda[:, p] += np.where(payday, _interes(deuda[:, p]), 0)
+
+            pos = posicion[:, p]
+            tipo = np.where(vivas, TIPO[pos], NEUTRO)
+            costo, flujo = COSTO[pos], FLUJO[pos]
+            caidas += np.bincount(pos[vivas], minlength=N + 1)
+
+            # LOBO NEGRO: se paga con caja y el faltante pasa a deuda
+            negro = tipo == LOBO_NEGRO
+            faltante = np.where(negro, np.maximum(costo - caja[:, p], 0), 0)
+            caja[:, p] = np.where(negro, np.maximum(caja[:, p] - costo, 0), caja[:, p])
+            deuda[:, p] += faltante
+            deuda_generada += np.bincount(pos[negro], weights=faltante[negro], minlength=N + 1).astype(np.int64)
+
+            # LOBO BLANCO: si hubo payday, el UPDATE previo a la decisión ya puede ser VICTORY
+            blanco = tipo == LOBO_BLANCO
+            patrimonio = caja[:, p] + pasivo[:, p] * MULTIPLICADOR - deuda[:, p]
+            gana = blanco & payday & (patrimonio >= meta_c)
+            decide = blanco & ~gana
+            quiere = decide & estrategia(caja[:, p], deuda[:, p], pasivo[:, p], costo, flujo)
+            compra = quiere & (caja[:, p] >= costo)
+            caja[:, p] -= np.where(compra, costo, 0)
+            pasivo[:, p] += np.where(compra, flujo, 0)
+            tenencias[compra, p, COLUMNA_INVERSION[pos[compra]]] += 1
+            compras += np.bincount(pos[compra], minlength=N + 1)
+            sin_fondos += np.bincount(pos[quiere & ~compra], minlength=N + 1)
+
+            # UPDATE final del turno
+            patrimonio = caja[:, p] + pasivo[:, p] * MULTIPLICADOR - deuda[:, p]
+            gana |= vivas & ~gana & (patrimonio >= meta_c)
+            if gana.any():
+                rondas[idx[gana]] = ronda + 1
+                ganador[idx[gana]] = p
+                vivas &= ~gana
+
+        # Compactación: se guardan las partidas terminadas y se quitan del estado
+        terminadas = ~vivas
+        if terminadas.any():
+            guardar(terminadas)
+            idx, caja, deuda, pasivo = idx[vivas], caja[vivas], deuda[vivas], pasivo[vivas]
+            posicion, vueltas, tenencias = posicion[vivas], vueltas[vivas], tenencias[vivas]
+
+    guardar(np.ones(len(idx), dtype=bool))
+    invertido = compras[INVERSIONES] * COSTO[INVERSIONES]
+    return {
+        "partidas": G, "jugadores": P, "seed": seed, "max_rondas": max_rondas, "tablas": t,
+        "salario": salario_c, "meta": meta_c,
+        "segundos": time.perf_counter() - inicio, "turnos_jugados": turnos_jugados,
+        "rondas": rondas, "ganador": ganador, **fin,
+        "casillas": {
+            "caidas": caidas, "compras": compras, "sin_fondos": sin_fondos, "deuda_generada": deuda_generada,
+            "invertido": invertido, "rentas": rentas,
+        },
+    }
+
+
+# --- REFERENCIA: MISMOS DADOS CON EL MOTOR REAL ---
+class _JugadorSimulado:
+    """Jugador en memoria con las reglas de Player (sin Beanie ni Mongo)."""
+    calculate_net_worth = Player.calculate_net_worth
+    apply_payday_logic = Player.apply_payday_logic
+
+    def __init__(self, asiento: int):
+        self.id = f"sim-{asiento}"
+        self.nickname = f"Jugador {asiento}"
+        self.position = 0
+        self.laps_completed = 0
+        self.financials = FinancialState()
+
+
+def partidas_en_vivo(partidas: int, jugadores: int = 4, estrategia: Estrategia = siempre, seed: int = 0,
+                     salario=Decimal("2500.00"), meta=Decimal("1000000.00"), max_rondas: int = 3000,
+                     tablero: CompiledBoard = DEFAULT_BOARD) -> dict:
+    """Juega las partidas turno a turno con game_engine (lento; solo para verificar paridad)."""
+    rng = np.random.default_rng(seed)
+    salario, meta = to_cents(salario), to_cents(meta)
+    salas = [[_JugadorSimulado(p) for p in range(jugadores)] for _ in range(partidas)]
+    rondas = np.full(partidas, -1, dtype=np.int64)
+    ganador = np.full(partidas, -1, dtype=np.int64)
+
+    for ronda in range(max_rondas):
+        if (rondas >= 0).all(): break
+        dados = tirada(rng, partidas, jugadores)
+        for g, sala in enumerate(salas):
+            if rondas[g] >= 0: continue
+            for p, jugador in enumerate(sala):
+                mensajes = resolver_roll(jugador, int(dados[g, p]), salario, meta, tablero)
+                if mensajes[-1]["type"] == "DECISION_NEEDED" and not any(m["type"] == "VICTORY" for m in mensajes):
+                    # event_data viaja ya codificado (messages.cached): los montos se leen de la casilla
+                    casilla = tablero.casillas[jugador.position]
+                    f = jugador.financials
+                    quiere = estrategia(*(np.array([v]) for v in (f.cash, f.toxic_debt, f.passive_income, casilla.costo, casilla.flujo)))
+                    mensajes += resolver_buy(jugador, meta, tablero) if bool(quiere[0]) else resolver_pass(jugador, meta, tablero)
+                if any(m["type"] == "VICTORY" for m in mensajes):
+                    rondas[g], ganador[g] = ronda + 1, p
+                    break
+
+    def matriz(valor) -> np.ndarray:
+        return np.array([[valor(j) for j in sala] for sala in salas], dtype=np.int64)
+
+    return {
+        "rondas": rondas, "ganador": ganador,
+        "cash": matriz(lambda j: j.financials.cash),
+        "debt": matriz(lambda j: j.financials.toxic_debt),
+        "passive": matriz(lambda j: j.financials.passive_income),
+        "position": matriz(lambda j: j.position),
+        "laps": matriz(lambda j: j.laps_completed),
+    }
+
+
+def verificar_paridad(partidas: int = 16, **kwargs) -> List[str]:
+    """Corre simulador y motor real con la misma semilla; devuelve las diferencias (vacío = paridad exacta)."""
+    sim = simular(partidas, **kwargs)
+    ref = partidas_en_vivo(partidas, **kwargs)
+    diferencias = []
+    for campo in ("rondas", "ganador", "cash", "debt", "passive", "position", "laps"):
+        malas = np.flatnonzero((sim[campo] != ref[campo]).reshape(partidas, -1).any(axis=1))
+        diferencias += [f"partida {g}: {campo} sim={sim[campo][g].tolist()} motor={ref[campo][g].tolist()}" for g in malas]
+    return diferencias
+
+
+# --- REPORTE ---
+def resumen(res: dict) -> dict:
+    rondas = res["rondas"]
+    terminadas = rondas[rondas >= 0]
+    patrimonio = res["cash"] + res["passive"] * MULTIPLICADOR - res["debt"]
+    c = res["casillas"]
+    t = res["tablas"]
+    cols = t.columna_inversion[t.inversiones]
+
+    def pct(q):
+        return int(np.percentile(terminadas, q)) if len(terminadas) else None
+
+    por_casilla = []
+    for evt in t.tablero.casillas:
+        if evt.tipo == "NEUTRO": continue
+        casilla = evt.numero
+        fila = {"casilla": casilla, "tipo": evt.tipo, "titulo": evt.titulo, "caidas": int(c["caidas"][casilla])}
+        if evt.inversion:
+            col = cols[np.flatnonzero(t.inversiones == casilla)[0]]
+            invertido, rentas = int(c["invertido"][col]), int(c["rentas"][col])
+            fila.update(compras=int(c["compras"][casilla]), sin_fondos=int(c["sin_fondos"][casilla]),
+                        invertido=invertido / 100, rentas=rentas / 100,
+                        roi=round((rentas - invertido) / invertido, 3) if invertido else None)
+        else:
+            fila.update(deuda_generada=int(c["deuda_generada"][casilla]) / 100)
+        por_casilla.append(fila)
+
+    return {
+        "tablero": t.tablero.board_id, "partidas": res["partidas"], "jugadores": res["jugadores"],
+        "turnos_por_segundo": int(res["turnos_jugados"] / res["segundos"]) if res["segundos"] else None,
+        "rondas_hasta_victoria": {
+            "terminadas": round(len(terminadas) / res["partidas"], 4),
+            "media": round(float(terminadas.mean()), 1) if len(terminadas) else None,
+            "p10": pct(10), "p50": pct(50), "p90": pct(90),
+        },
+        "victorias_por_asiento": np.bincount(res["ganador"][res["ganador"] >= 0], minlength=res["jugadores"]).tolist(),
+        # Espiral de deuda: la deuda (que nunca se amortiza y crece 5% por vuelta) supera todo lo que posee
+        "con_deuda": round(float((res["debt"] > 0).mean()), 4),
+        "espiral_deuda": round(float((patrimonio < 0).mean()), 4),
+        "casillas": por_casilla,
+    }
+
+
+def imprimir(info: dict):
+    r = info["rondas_hasta_victoria"]
+    print(f"🎲 {info['partidas']} partidas x {info['jugadores']} jugadores en '{info['tablero']}' — {info['turnos_por_segundo']:,} turnos/s")
+    print(f"🏁 Terminadas {r['terminadas']:.1%} | rondas media {r['media']} p10 {r['p10']} p50 {r['p50']} p90 {r['p90']}")
+    print(f"🏆 Victorias por asiento: {info['victorias_por_asiento']}")
+    print(f"💸 Con deuda {info['con_deuda']:.1%} | espiral de deuda {info['espiral_deuda']:.1%}")
+    for f in info["casillas"]:
+        if f["tipo"] == "LOBO_BLANCO":
+            print(f"  🟢 {f['casilla']:>2} {f['titulo']:<16} caídas {f['caidas']:>9} compras {f['compras']:>9} "
+                  f"sin fondos {f['sin_fondos']:>8} ROI {f['roi']}")
+        else:
+            print(f"  🔴 {f['casilla']:>2} {f['titulo']:<16} caídas {f['caidas']:>9} deuda generada ${f['deuda_generada']:,.2f}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Simulador Monte Carlo de La Senda de los Lobos")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--strategy", choices=sorted(ESTRATEGIAS), default="siempre")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--salary", type=Decimal, default=Decimal("2500.00"))
+    parser.add_argument("--winning-score", type=Decimal, default=Decimal("1000000.00"))
+    parser.add_argument("--max-rounds", type=int, default=3000)
+    parser.add_argument("--board", choices=sorted(BUILTIN_BOARDS), default="clasico")
+    parser.add_argument("--verify", type=int, default=0, help="Partidas a comparar contra game_engine (0 = no verificar)")
+    args = parser.parse_args(argv)
+
+    config = dict(jugadores=args.players, estrategia=ESTRATEGIAS[args.strategy], seed=args.seed,
+                  salario=args.salary, meta=args.winning_score, max_rondas=args.max_rounds, tablero=BUILTIN_BOARDS[args.board])
+    imprimir(resumen(simular(args.games, **config)))
+
+    if args.verify:
+        diferencias = verificar_paridad(args.verify, **config)
+        print("✅ Paridad exacta con game_engine" if not diferencias else "❌ Diferencias:\n" + "\n".join(diferencias))
+        if diferencias: raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# ==============================================================================
+# 📄 ARCHIVO: spectators.py
+# 🔍 ROL: Espectadores de solo lectura (/ws/watch/{code}): proyector, padres, otras clases
+# ==============================================================================
+# Un espectador no es un jugador: no tiene documento Player, no aparece en el
+# ranking y no cuenta como presencia del actor. Cada proceso con espectadores
+# de una sala mantiene una proyección (tablero, ranking, actividad reciente y
+# estadísticas de la clase) alimentada por los mismos envelopes del bus que
+# reciben los jugadores.
+#
+# Cada WATCH_INTERVAL_MS, si algo cambió, la proyección se serializa UNA vez y
+# el mismo string se entrega a todos sus espectadores. Cada espectador guarda
+# solo el último snapshot pendiente: uno lento se salta los intermedios en vez
+# de acumular cola, así que no hace falta expulsar a nadie.
+
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from fastapi import WebSocket
+
+from analytics import merge_delta
+from messages import encode, loads
+from metrics import REGISTRY
+
+WATCH_INTERVAL_MS = float(os.getenv("WATCH_INTERVAL_MS", "500"))
+WATCH_RECENT_EVENTS = int(os.getenv("WATCH_RECENT_EVENTS", "20"))
+
+logger = logging.getLogger(__name__)
+
+
+class Viewer:
+    """Socket de un espectador con un único hueco de salida (el último snapshot gana)."""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.pending: Optional[str] = None
+        self.closed = False
+        self._ready = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+
+    def offer(self, message: str) -> bool:
+        """Reemplaza lo pendiente. Devuelve True si pisó un snapshot que no llegó a enviarse."""
+        pisado = self.pending is not None
+        self.pending = message
+        self._ready.set()
+        return pisado
+
+    async def run_writer(self, on_error: Callable[["Viewer"], None]):
+        try:
+            while not self.closed:
+                if self.pending is None:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                message, self.pending = self.pending, None
+                await self.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            on_error(self)
+
+    def close(self):
+        self.closed = True
+        self.pending = None
+        self._ready.set()
+        if self.writer and self.writer is not asyncio.current_task():
+            self.writer.cancel()
+
+
+class Projection:
+    """Vista de una sala para espectadores, reconstruida a partir de los envelopes."""
+
+    def __init__(self, session_id: str, recent: int = WATCH_RECENT_EVENTS):
+        self.session_id = session_id
+        self.viewers: Dict[WebSocket, Viewer] = {}
+        self.players: Dict[str, dict] = {}        # player_id -> {"id", "nickname", "position"}
+        self.rows: List[str] = []                 # Filas del ranking tal como las serializó el Leaderboard
+        self.recent: Deque[dict] = deque(maxlen=recent)
+        self.stats: dict = {}                     # Ver analytics.SessionStats.to_dict()
+        self.connected = 0                        # Sockets de alumnos abiertos (presencia del actor)
+        self._stats_json = "{}"
+        self.seq = 0
+        self.dirty = False
+        self.message: Optional[str] = None        # Último snapshot serializado
+        # Lo recibido se parsea en el tick (una vez aunque lleguen varios envelopes)
+        self._frames: List[str] = []
+        self._rows_changed = False
+
+    def feed(self, envelope: dict):
+        if envelope.get("conn"): return  # Resincronización dirigida a un jugador
+        if envelope.get("watch"):
+            self._reset(envelope["watch"])
+        if envelope.get("frames"):
+            self._frames.extend(envelope["frames"])
+            self.dirty = True
+        ranking = envelope.get("ranking")
+        if ranking:
+            self.rows = [fila for _, fila, _ in ranking["rows"]]
+            self._rows_changed = self.dirty = True
+        if envelope.get("stats"):
+            merge_delta(self.stats, envelope["stats"])
+            self._stats_json = None
+            self.dirty = True
+        if "presence" in envelope:
+            self.connected = max(0, envelope["presence"])
+            self.dirty = True
+
+    def _reset(self, watch: dict):
+        """Estado completo enviado por el dueño de la sala (ver SessionActor._watch_snapshot)."""
+        self.recent.clear()
+        self.seq = 0
+        self._frames = list(watch["recent"])
+        self._rows_changed = False
+        self._ingest()
+        self.players = {p["id"]: p for p in watch["players"]}
+        self.rows = watch["rows"]
+        self.seq = max(self.seq, watch["seq"])
+        self.stats = watch["stats"]
+        self.connected = max(0, watch.get("presence", 0))
+        self._stats_json = None
+        self.dirty = True
+
+    def _ingest(self):
+        for frame in self._frames:
+            msg = loads(frame)
+            seq = msg.get("seq", 0)
+            if seq and seq <= self.seq: continue  # Ya incluido en el último estado completo
+            self.seq = max(self.seq, seq)
+            payload = msg.get("payload") or {}
+            if msg.get("type") in ("UPDATE_PLAYER", "VICTORY"):
+                pid = payload["player_id"]
+                self.players[pid] = {"id": pid, "nickname": payload["nickname"], "position": payload["new_position"]}
+            if msg.get("message"):
+                self.recent.append({
+                    "seq": seq, "type": msg.get("type"), "message": msg["message"],
+                    "player": payload.get("nickname"), "position": payload.get("new_position"),
+                    "events": payload.get("event_queue") or [],
+                })
+        self._frames.clear()
+
+        # El ranking trae a los recién llegados que aún no han movido ficha
+        if self._rows_changed:
+            for fila in self.rows:
+                row = loads(fila)
+                self.players[row["id"]] = {"id": row["id"], "nickname": row["nickname"], "position": row["position"]}
+            self._rows_changed = False
+
+    def render(self) -> str:
+        self._ingest()
+        self.dirty = False
+        self.message = (
+            f'{{"type":"WATCH_SNAPSHOT","seq":{self.seq},"payload":{{'
+            f'"players":{encode(list(self.players.values()))},'
+            f'"connected":{self.connected},'
+            f'"leaderboard":[{",".join(self.rows)}],'
+            f'"recent":{encode(list(self.recent))},'
+            f'"stats":{self.stats_json()}}}}}'
+        )
+        return self.message
+
+    def stats_json(self) -> str:
+        if self._stats_json is None:
+            self._stats_json = encode(self.stats)
+        return self._stats_json
+
+
+class SpectatorHub:
+    def __init__(self, interval_ms: float = WATCH_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.rooms: Dict[str, Projection] = {}
+        self.snapshots_total = 0
+        self.coalesced_total = 0
+        self._ticker: Optional[asyncio.Task] = None
+
+    def add(self, websocket: WebSocket, session_id: str) -> bool:
+        """Registra un espectador. Devuelve True si la sala no tenía proyección (hay que pedir el estado)."""
+        nueva = session_id not in self.rooms
+        room = self.rooms.setdefault(session_id, Projection(session_id))
+        viewer = Viewer(websocket)
+        viewer.writer = asyncio.create_task(viewer.run_writer(lambda v: self.remove(v.websocket, session_id)))
+        room.viewers[websocket] = viewer
+        if room.message: viewer.offer(room.message)
+        if self._ticker is None:
+            self._ticker = asyncio.create_task(self._run())
+        return nueva
+
+    def remove(self, websocket: WebSocket, session_id: str):
+        room = self.rooms.get(session_id)
+        if not room: return
+        viewer = room.viewers.pop(websocket, None)
+        if viewer: viewer.close()
+        if not room.viewers:
+            del self.rooms[session_id]
+
+    def close_session(self, session_id: str, code: int):
+        """Cierra los espectadores de una sala (p. ej. porque se borró)."""
+        room = self.rooms.pop(session_id, None)
+        if not room: return
+        for viewer in room.viewers.values():
+            viewer.close()
+            asyncio.create_task(_close_quietly(viewer.websocket, code))
+
+    def watching(self, session_id: str) -> bool:
+        return session_id in self.rooms
+
+    def stats_json(self, session_id: str) -> Optional[str]:
+        """Estadísticas que mantiene la proyección local (None si no hay o aún no llegó el estado)."""
+        room = self.rooms.get(session_id)
+        return room.stats_json() if room and room.stats else None
+
+    def feed(self, session_id: str, envelope: dict):
+        room = self.rooms.get(session_id)
+        if room: room.feed(envelope)
+
+    async def _run(self):
+        try:
+            while self.rooms:
+                await asyncio.sleep(self.interval)
+                for room in list(self.rooms.values()):
+                    if room.dirty: self._publish(room)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"--- 🔴 WATCH: Error generando snapshots ({e}) ---")
+        finally:
+            self._ticker = None
+
+    def _publish(self, room: Projection):
+        message = room.render()
+        self.snapshots_total += 1
+        for viewer in room.viewers.values():
+            if viewer.offer(message): self.coalesced_total += 1
+
+    async def close(self):
+        if self._ticker: self._ticker.cancel()
+        for room in self.rooms.values():
+            for viewer in room.viewers.values(): viewer.close()
+        self.rooms.clear()
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.rooms),
+            "viewers": sum(len(r.viewers) for r in self.rooms.values()),
+            "snapshots": self.snapshots_total,
+            "coalesced": self.coalesced_total,
+        }
+
+
+async def _close_quietly(websocket: WebSocket, code: int):
+    try:
+        await websocket.close(code=code)
+    except Exception:
+        pass
+
+
+spectators = SpectatorHub()
+
+REGISTRY.callback("lobos_watch_viewers", "Espectadores conectados en este proceso", lambda: spectators.stats()["viewers"])
+REGISTRY.callback("lobos_watch_snapshots_total", "Snapshots de espectador serializados (uno por sala y tick)", lambda: spectators.snapshots_total, kind="counter")
+REGISTRY.callback("lobos_watch_coalesced_total", "Snapshots reemplazados antes de llegar a un espectador lento", lambda: spectators.coalesced_total, kind="counter")
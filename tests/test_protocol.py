@@ -0,0 +1,61 @@
+# ==============================================================================
+# 📄 ARCHIVO: tests/test_protocol.py
+# 🔍 ROL: Ida y vuelta BinaryCodec -> BinaryDecoder con ACKs atrasados y frames descartados
+# ==============================================================================
+
+import pytest
+
+from protocol import BinaryCodec, BinaryDecoder, msgpack
+
+pytestmark = pytest.mark.skipif(msgpack is None, reason="msgpack no instalado")
+
+PID = "6ad2df3b56fbc7747ea8df24"
+
+
+def _update(cash: str) -> dict:
+    return {"type": "UPDATE_PLAYER", "message": "", "payload": {
+        "player_id": PID, "nickname": "Loba", "new_position": 3, "new_cash": cash, "new_debt": "0.00",
+        "new_net_worth": cash, "new_passive_income": "0.00", "game_target": "1000000.00", "event_queue": []}}
+
+
+def _fila(pid: str, nick: str, nw: str) -> dict:
+    return {"id": pid, "nickname": nick, "net_worth": nw, "position": 1}
+
+
+def test_valor_que_vuelve_al_confirmado_se_reenvia():
+    codec, cliente = BinaryCodec(), BinaryDecoder()
+    cliente.decode(codec.encode([_update("10.00")], None, PID))
+    codec.ack(cliente.last_frame)
+    cliente.decode(codec.encode([_update("5.00")], None, PID))      # Llega pero aún sin ACK
+    frame = cliente.decode(codec.encode([_update("10.00")], None, PID))[0]
+    assert frame["payload"]["new_cash"] == "10.00"
+
+
+def test_frame_descartado_no_pasa_a_ser_la_base():
+    codec, cliente = BinaryCodec(), BinaryDecoder()
+    uno, dos = _fila("a" * 24, "Ana", "1.00"), _fila("b" * 24, "Beto", "2.00")
+    cliente.decode(codec.encode([], [uno], PID))
+    codec.encode([], [uno, dos], PID)                                # La cola de salida lo descarta
+    codec.discard(codec.frame_no)
+    codec.ack(codec.frame_no)                                        # El ACK de un frame posterior lo abarcaría
+    filas = cliente.decode(codec.encode([], [dos, uno], PID))[0]["payload"]
+    assert [(f["nickname"], f["net_worth"]) for f in filas] == [("Beto", "2.00"), ("Ana", "1.00")]
+
+
+def test_pendiente_olvidado_vuelve_a_ir_completo():
+    codec, cliente = BinaryCodec(), BinaryDecoder()
+    cliente.decode(codec.encode([_update("10.00")], None, PID))
+    codec.ack(cliente.last_frame)
+    for _ in range(300):                                             # El cliente deja de confirmar
+        cliente.decode(codec.encode([_update("5.00")], None, PID))
+    frame = cliente.decode(codec.encode([_update("10.00")], None, PID))[0]
+    assert frame["payload"]["new_cash"] == "10.00"
+
+
+def test_desborde_de_la_cola_descarta_el_frame_en_el_codec():
+    from connection_manager import Connection
+    conn = Connection(None, "s", PID, "full", maxsize=1, proto="bin1")
+    conn.offer(conn.codec.encode([], [_fila("a" * 24, "Ana", "1.00")], PID), "LEADERBOARD", "drop_oldest", conn.codec.frame_no)
+    conn.offer(conn.codec.encode([_update("1.00")], None, PID), "BATCH", "drop_oldest", conn.codec.frame_no)
+    conn.codec.ack(conn.codec.frame_no)
+    assert conn.codec._candidates(("rank", "a" * 24)) == [None]